@@ -0,0 +1,108 @@
+# benchmarks/bench_html_parse.py
+"""
+重いページのHTMLパース（ツリー構築＋抽出）のベンチマーク。保存済みの fixture ページを使う。
+
+比較対象:
+  legacy : BeautifulSoup(html, "html.parser") でページ全体のツリーを構築（変更前）
+  current: utils.html.make_soup（lxml があれば lxml）＋ SoupStrainer で対象サブツリーだけ構築
+
+各ページについて パース時間（best of N）と tracemalloc のピークメモリを出力し、
+両者の抽出結果が一致することも確認する（不一致なら終了コード1）。
+
+実行: python -m benchmarks.bench_html_parse [--repeat N]
+"""
+import io
+import sys
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from utils.html import best_parser  # noqa: E402
+from scrapers import best_denki_stadium, paypay_dome_events, sunpalace  # noqa: E402
+
+PAGES_DIR = Path(__file__).resolve().parent / "fixtures" / "pages"
+
+# (表示名, fixtureファイル, スクレイパーモジュール, パース関数呼び出し)
+CASES = [
+    ("paypay_dome_events", "paypay_dome_events_2026.html", paypay_dome_events,
+     lambda html: paypay_dome_events.parse_year_page(html, 2026)),
+    ("sunpalace", "sunpalace_2026-10.html", sunpalace,
+     lambda html: sunpalace.parse_month_page(html, 2026, 10)),
+    ("best_denki_stadium", "best_denki_stadium_schedule.html", best_denki_stadium,
+     best_denki_stadium.parse_schedule_page),
+]
+
+
+def _legacy_make_soup(html, parse_only=None):
+    """変更前と同じ: 常に html.parser でページ全体を構築"""
+    return BeautifulSoup(html, "html.parser")
+
+
+def _run(parse, html, module, legacy: bool):
+    original = module.make_soup
+    if legacy:
+        module.make_soup = _legacy_make_soup
+    try:
+        with redirect_stdout(io.StringIO()):  # スクレイパーのDEBUG出力を計測から除外
+            return parse(html)
+    finally:
+        module.make_soup = original
+
+
+def _time_best(parse, html, module, legacy: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _run(parse, html, module, legacy)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_kib(parse, html, module, legacy: bool) -> float:
+    tracemalloc.start()
+    try:
+        _run(parse, html, module, legacy)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    print(f"[bench_html_parse] tree builder: {best_parser()}")
+    ok = True
+    for name, filename, module, parse in CASES:
+        html = (PAGES_DIR / filename).read_text(encoding="utf-8")
+        legacy_out = _run(parse, html, module, legacy=True)
+        current_out = _run(parse, html, module, legacy=False)
+        if legacy_out != current_out:
+            print(f"[bench_html_parse][ERROR] {name}: outputs differ")
+            ok = False
+            continue
+
+        t_legacy = _time_best(parse, html, module, True, args.repeat)
+        t_current = _time_best(parse, html, module, False, args.repeat)
+        m_legacy = _peak_kib(parse, html, module, True)
+        m_current = _peak_kib(parse, html, module, False)
+        print(
+            f"[bench_html_parse] {name:<20} size={len(html) // 1024}KiB items={len(current_out)} "
+            f"time {t_legacy * 1000:7.1f}ms -> {t_current * 1000:7.1f}ms (x{t_legacy / t_current:.1f}) "
+            f"peak {m_legacy:8.0f}KiB -> {m_current:8.0f}KiB"
+        )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
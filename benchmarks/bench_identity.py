@@ -0,0 +1,153 @@
+# benchmarks/bench_identity.py
+"""
+イベント hash（正規化＋SHA1）のスループットのベンチマーク。
+
+比較対象:
+  legacy : 変更前の各スクレイパーの実装（呼び出しごとに NFKC＋replace の連鎖＋正規表現、会場名も毎回正規化）
+  current: utils.identity.hash_events（変換表1パス、会場名・タイトルの正規化結果を LRU で再利用）
+
+イベントは実際のスケジュールと同じく、同じタイトルが複数日に並ぶ形で生成する。
+実行: python -m benchmarks.bench_identity [--repeat N]
+全プロファイルで両者の hash が一致することも確認する（不一致なら終了コード1）。
+"""
+import re
+import sys
+import time
+import hashlib
+import argparse
+import unicodedata
+from datetime import date, timedelta
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from utils.identity import hash_events  # noqa: E402
+
+CORPUS_PATH = Path(__file__).resolve().parent / "fixtures" / "title_corpus.txt"
+DAYS = 60                 # 収集期間（当月1日～翌月末日）相当
+TIMES = (None, "13:00", "18:00")
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> list:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [ln for ln in lines if ln.strip() and not ln.startswith("#")]
+
+
+def build_events(titles: list, venue: str) -> list:
+    start = date(2026, 10, 1)
+    events = []
+    for i in range(DAYS):
+        day = (start + timedelta(days=i)).isoformat()
+        for j, title in enumerate(titles[i % 5::5]):
+            events.append({"date": day, "time": TIMES[(i + j) % len(TIMES)], "title": title, "venue": venue})
+    return events
+
+
+# ---- 変更前の実装（比較用に固定） ----------------------------------------------
+def _legacy_sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def legacy_normalize_standard(s):
+    """utils/marinemesse_api の旧 _normalize_for_hash"""
+    if s is None:
+        return ""
+    x = unicodedata.normalize("NFKC", s)
+    x = x.replace("“", '"').replace("”", '"').replace("‟", '"')
+    x = x.replace("〝", '"').replace("〞", '"')
+    x = x.replace("‘", "'").replace("’", "'").replace("＇", "'")
+    x = re.sub(r"\s+", " ", x).strip()
+    return x
+
+
+def legacy_normalize_legacy(s):
+    """paypay_dome / paypay_dome_events / best_denki_stadium の旧 _normalize_for_hash（“ ” ‘ ’ の置換は無効だった）"""
+    if s is None:
+        return ""
+    x = unicodedata.normalize("NFKC", s)
+    x = x.replace("‟", '"').replace("〝", '"').replace("〞", '"')
+    x = x.replace("＇", "'")
+    x = re.sub(r"\s+", " ", x).strip()
+    return x
+
+
+def legacy_normalize_sunpalace(s):
+    """scrapers/sunpalace の旧 _normalize_for_hash"""
+    if s is None:
+        return ""
+    x = unicodedata.normalize("NFKC", s)
+    x = x.replace("“", '"').replace("”", '"').replace("‟", '"')
+    x = x.replace("‘", "'").replace("’", "'")
+    x = x.replace('〜', '～').replace('－', '−').replace('―', '−')
+    x = re.sub(r"\s+", " ", x).strip()
+    return x
+
+
+# プロファイル → (旧正規化, include_time, 会場名)
+CASES = {
+    "standard": (legacy_normalize_standard, True, "マリンメッセA館"),
+    "legacy": (legacy_normalize_legacy, True, "ベスト電器スタジアム"),
+    "legacy-no-time": (legacy_normalize_legacy, False, "みずほPayPayドーム"),
+    "sunpalace": (legacy_normalize_sunpalace, True, "福岡サンパレス"),
+}
+
+
+def run_legacy(events, normalize, include_time):
+    out = []
+    for it in events:
+        title_norm = normalize(it.get("title", ""))
+        venue_norm = normalize(it.get("venue", ""))
+        date_part = it.get("date", "")
+        time_part = it.get("time") or ""
+        if include_time:
+            key = f"{date_part}|{time_part}|{title_norm}|{venue_norm}"
+        else:
+            key = f"{date_part}|{title_norm}|{venue_norm}"
+        out.append(_legacy_sha1(key))
+    return out
+
+
+def run_current(events, profile, include_time):
+    return hash_events(events, profile=profile, include_time=include_time)
+
+
+def _best_of(fn, repeat: int, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    titles = load_corpus()
+    print(f"[bench_identity] titles={len(titles)} days={DAYS} x {args.repeat} repeat")
+    failed = False
+    for name, (normalize, include_time, venue) in CASES.items():
+        profile = name.split("-")[0]
+        events = build_events(titles, venue)
+        if run_legacy(events, normalize, include_time) != run_current(events, profile, include_time):
+            print(f"[bench_identity][ERROR] {name}: legacy and current hashes differ")
+            failed = True
+            continue
+
+        n = len(events) * args.repeat
+        t_legacy = _best_of(lambda: run_legacy(events, normalize, include_time), args.repeat)
+        t_current = _best_of(lambda: run_current(events, profile, include_time), args.repeat)
+        print(
+            f"[bench_identity] {name:15s}: legacy {n / t_legacy:9.0f} ev/s / current {n / t_current:9.0f} ev/s "
+            f"(x{t_legacy / t_current:.2f})"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
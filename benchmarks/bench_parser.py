@@ -0,0 +1,162 @@
+# benchmarks/bench_parser.py
+"""
+日程文字列の前処理＋正規化（preprocess_datetime → split_and_normalize）のマイクロベンチマーク。
+
+比較対象:
+  legacy : 変更前の実装（置換/正規表現を1つずつ適用、呼び出しごとに datetime.now を2回）
+  current: 変換表（str.maketrans）＋事前コンパイル正規表現、「現在」はバッチで1回だけ計算
+  batch  : current の前処理 ＋ parse_many（同じ日程文字列の展開結果を LRU で再利用）
+
+実行: python -m benchmarks.bench_parser [--repeat N]
+両者の出力が一致することも確認する（不一致なら終了コード1）。
+"""
+import re
+import sys
+import time
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from utils.parser import (  # noqa: E402
+    JST, _RANGE_PAT, _TIME_ANY, _date_pat, _expand_dates, _infer_year,
+    parse_context, parse_many, split_and_normalize,
+)
+from utils.marinemesse_api import preprocess_datetime  # noqa: E402
+
+CORPUS_PATH = Path(__file__).resolve().parent / "fixtures" / "datetime_corpus.txt"
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> list:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [ln for ln in lines if ln.strip() and not ln.startswith("#")]
+
+
+# ---- 変更前の実装（比較用に固定） ----------------------------------------------
+def legacy_preprocess_datetime(raw: str) -> str:
+    if not raw:
+        return ""
+    text = raw
+    text = re.sub(r'<br\s*/?>', ' ', text, flags=re.IGNORECASE)
+    text = text.replace('／', ' ')
+    text = text.replace('：', ':')
+    text = re.sub(r'[①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳]', '', text)
+    text = re.sub(r'[★☆●○◆◇■□▲△▼▽]', '', text)
+    text = re.sub(r'※.*', '', text)
+    text = re.sub(r'(\))(\d)', r'\1 \2', text)
+    text = text.replace('〜', '～').replace('－', '-').replace('—', '–')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def legacy_split_and_normalize(dt_text: str, title: str, venue: str, year=None):
+    _auto_infer = (year is None)
+    if year is None:
+        year = datetime.now(JST).year
+    _current_month = datetime.now(JST).month
+
+    out = []
+    left = dt_text.split('|', 1)[0].strip()
+    left = left.replace('〜', '～').replace('－', '-').replace('—', '–')
+
+    rm = _RANGE_PAT.search(left)
+    if rm:
+        m1 = int(rm.group('m1')); d1 = int(rm.group('d1'))
+        m2 = int(rm.group('m2')) if rm.group('m2') else m1
+        d2 = int(rm.group('d2'))
+        times = []
+        for mt in _TIME_ANY.finditer(left):
+            hh = int(mt.group('h')); mi = int(mt.group('mi'))
+            times.append(f"{hh:02d}:{mi:02d}")
+        use_time = times[0] if times else None
+        for d in _expand_dates(year, m1, d1, m2, d2):
+            out.append({"date": d.strftime("%Y-%m-%d"), "time": use_time, "title": title, "venue": venue})
+        return out
+
+    tokens = re.split(r'\s+', left)
+    current_date = None
+    for tok in tokens:
+        dm = _date_pat.fullmatch(tok)
+        if dm:
+            mm = int(dm.group('m')); dd = int(dm.group('d'))
+            try:
+                use_year = _infer_year(year, mm, _current_month) if _auto_infer else year
+                current_date = date(use_year, mm, dd)
+            except ValueError:
+                current_date = None
+            continue
+        if current_date:
+            tm = _TIME_ANY.search(tok)
+            if tm:
+                hh = int(tm.group('h')); mi = int(tm.group('mi'))
+                out.append({"date": current_date.strftime("%Y-%m-%d"), "time": f"{hh:02d}:{mi:02d}",
+                            "title": title, "venue": venue})
+
+    if not out:
+        for dm in _date_pat.finditer(left):
+            mm = int(dm.group('m')); dd = int(dm.group('d'))
+            try:
+                use_year = _infer_year(year, mm, _current_month) if _auto_infer else year
+                out.append({"date": date(use_year, mm, dd).strftime("%Y-%m-%d"), "time": None,
+                            "title": title, "venue": venue})
+            except ValueError:
+                pass
+    return out
+
+
+# ---- 計測 ----------------------------------------------------------------------
+def run_legacy(corpus):
+    out = []
+    for raw in corpus:
+        out.append(legacy_split_and_normalize(legacy_preprocess_datetime(raw), "t", "v"))
+    return out
+
+
+def run_current(corpus):
+    context = parse_context()
+    out = []
+    for raw in corpus:
+        out.append(split_and_normalize(preprocess_datetime(raw), "t", "v", context=context))
+    return out
+
+
+def run_batch(corpus):
+    return parse_many((preprocess_datetime(raw), "t", "v") for raw in corpus)
+
+
+def _best_of(fn, corpus, repeat: int, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(corpus)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    expected = run_legacy(corpus)
+    if expected != run_current(corpus) or expected != run_batch(corpus):
+        print("[bench_parser][ERROR] legacy and current outputs differ")
+        sys.exit(1)
+
+    n = len(corpus) * args.repeat
+    t_legacy = _best_of(run_legacy, corpus, args.repeat)
+    t_current = _best_of(run_current, corpus, args.repeat)
+    t_batch = _best_of(run_batch, corpus, args.repeat)
+    print(f"[bench_parser] corpus={len(corpus)} strings x {args.repeat} repeat")
+    print(f"[bench_parser] legacy : {n / t_legacy:10.0f} strings/s ({t_legacy * 1000:.1f} ms)")
+    print(f"[bench_parser] current: {n / t_current:10.0f} strings/s ({t_current * 1000:.1f} ms)")
+    print(f"[bench_parser] batch  : {n / t_batch:10.0f} strings/s ({t_batch * 1000:.1f} ms)")
+    print(f"[bench_parser] speedup: current x{t_legacy / t_current:.2f} / batch x{t_legacy / t_batch:.2f}")
+
+
+if __name__ == "__main__":
+    main()
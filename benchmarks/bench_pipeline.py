@@ -0,0 +1,151 @@
+# benchmarks/bench_pipeline.py
+"""
+会場別パイプラインと refresh_future_events 全体の段階別ベンチマーク（ネットワーク不要）。
+
+保存済みの fixture（benchmarks/fixtures/api の CMS 応答、pages の各会場HTML）を
+benchmarks.offline のスタブセッションで返し、utils.stages の段階ごとの排他時間を集計する:
+  fetch(スタブ) / parse / normalize / filter / dedupe / sort / serialize
+
+- 会場別: collect_events() → storage.write_snapshot() を実行。各段階は best of N（毎回キャッシュを空にする）
+- 全体  : refresh_future_events.main()（DB同期・通知なし。REFRESH_MAX_WORKERS=1 の逐次実行）
+          storage/ の書き出しは write-behind スレッドで行うため、serialize は会場別の値を見る
+ピークメモリは tracemalloc で別途1回計測する（計測中は遅くなるため時間とは分ける）。
+
+実行: python -m benchmarks.bench_pipeline [--repeat N] [--venue NAME ...] [--skip-refresh]
+例外または出力0件の会場があれば終了コード1。
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from benchmarks.offline import FROZEN_NOW, offline_env  # noqa: E402
+from utils import identity, parser, storage  # noqa: E402
+from utils.stages import STAGES, recording  # noqa: E402
+from scripts import refresh_future_events as refresh  # noqa: E402
+
+TARGET_DATE = FROZEN_NOW.strftime("%Y-%m-%d")
+
+
+def _clear_caches() -> None:
+    """前回の解析結果を再利用しないよう、プロセス内キャッシュを空にする"""
+    parser._expand_slots_cached.cache_clear()
+    identity._normalize_title.cache_clear()
+    identity._normalize_venue.cache_clear()
+
+
+def _run_venue(module):
+    """1会場分（収集→スナップショット書き出し）を計測付きで実行し、(件数, 段階別秒) を返す"""
+    name = refresh._scraper_name(module)
+    _clear_caches()
+    with recording() as rec, redirect_stdout(io.StringIO()):
+        events = module.collect_events()
+        storage.write_snapshot(events, TARGET_DATE, refresh.SCRAPER_CODES[name])
+    return len(events), rec.totals()
+
+
+def _run_refresh():
+    """refresh_future_events.main() を計測付きで実行し、段階別秒を返す"""
+    _clear_caches()
+    with recording() as rec, redirect_stdout(io.StringIO()):
+        refresh.main()
+    return rec.totals()
+
+
+def _peak_kib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def _best(rounds) -> dict:
+    """各段階の最小値（段階ごとに best of N）"""
+    best = {}
+    for totals in rounds:
+        for stage_name, seconds in totals.items():
+            best[stage_name] = min(best.get(stage_name, seconds), seconds)
+    return best
+
+
+def _format_stages(totals: dict) -> str:
+    order = list(STAGES) + sorted(set(totals) - set(STAGES))
+    return " ".join(f"{s}={totals[s] * 1000:.1f}" for s in order if s in totals)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--venue", action="append", help="対象スクレイパー名（複数指定可。省略時は全会場）")
+    ap.add_argument("--skip-refresh", action="store_true", help="refresh 全体の計測を省略")
+    args = ap.parse_args()
+
+    modules = [
+        refresh.marinemesse_a, refresh.marinemesse_b, refresh.kokusai_center, refresh.congress_b,
+        refresh.sunpalace, refresh.paypay_dome, refresh.paypay_dome_events, refresh.best_denki_stadium,
+    ]
+    if args.venue:
+        modules = [m for m in modules if refresh._scraper_name(m) in args.venue]
+
+    ok = True
+    print(f"[bench_pipeline] offline fixtures, now={FROZEN_NOW.isoformat()} repeat={args.repeat} (ms)")
+    with offline_env():
+        for module in modules:
+            name = refresh._scraper_name(module)
+            try:
+                rounds = []
+                walls = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    count, totals = _run_venue(module)
+                    walls.append(time.perf_counter() - t0)
+                    rounds.append(totals)
+                peak = _peak_kib(lambda: _run_venue(module))
+            except Exception as e:
+                print(f"[bench_pipeline][ERROR] {name}: {e}")
+                ok = False
+                continue
+            if count == 0:
+                print(f"[bench_pipeline][ERROR] {name}: no events")
+                ok = False
+            print(
+                f"[bench_pipeline] {name:<20} items={count:<4} wall={min(walls) * 1000:7.1f} "
+                f"peak={peak:7.0f}KiB | {_format_stages(_best(rounds))}"
+            )
+
+        if not args.skip_refresh:
+            os.environ["REFRESH_MAX_WORKERS"] = "1"
+            try:
+                rounds = []
+                walls = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    rounds.append(_run_refresh())
+                    walls.append(time.perf_counter() - t0)
+                peak = _peak_kib(_run_refresh)
+                print(
+                    f"[bench_pipeline] {'refresh_future_events':<20} wall={min(walls) * 1000:7.1f} "
+                    f"peak={peak:7.0f}KiB | {_format_stages(_best(rounds))}"
+                )
+            except (Exception, SystemExit) as e:
+                print(f"[bench_pipeline][ERROR] refresh_future_events: {e!r}")
+                ok = False
+            finally:
+                os.environ.pop("REFRESH_MAX_WORKERS", None)
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
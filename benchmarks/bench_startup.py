@@ -0,0 +1,95 @@
+# benchmarks/bench_startup.py
+"""
+エントリポイントの import 時間（python -X importtime）の計測。
+
+対象モジュールごとに新しいプロセスで import だけを行い、importtime の出力から
+  - モジュール自身の累積 import 時間（複数回の最小値）
+  - 直下で読み込まれた重い依存パッケージ上位（--top 件）
+を表示する。refresh / 単体スクレイパーの起動で重い依存（supabase / bs4）が
+import 時に読み込まれていないことも確認する（読み込まれていたら終了コード1）。
+
+実行: python -m benchmarks.bench_startup [--rounds N] [--top K]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+repo_root = Path(__file__).resolve().parents[1]
+
+# モジュール → import 時に読み込まれてはいけない重い依存（実際に使う処理で遅延 import する）
+TARGETS: Dict[str, Tuple[str, ...]] = {
+    "scripts.refresh_future_events": ("supabase", "bs4"),
+    "notify.html_export": ("supabase", "bs4"),
+    "notify.dispatch": ("supabase",),
+    "scrapers.sunpalace": ("supabase", "bs4", "dotenv"),
+    "scrapers.paypay_dome": ("supabase", "bs4", "dotenv"),
+    "scrapers.paypay_dome_events": ("supabase", "bs4", "dotenv"),
+    "scrapers.best_denki_stadium": ("supabase", "bs4", "dotenv"),
+    "scrapers.marinemesse_a": ("supabase", "bs4", "dotenv"),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module: str) -> List[Tuple[int, int, str]]:
+    """(累積μs, 深さ, モジュール名) のリスト（インタプリタ起動時の import は除く）"""
+    env = dict(os.environ, ENABLE_DB_SAVE="0", PYTHONPATH=str(repo_root))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_root, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        if m.group(4) == "site":
+            rows = []   # ここまではインタプリタ起動時（site / .pth）の import
+            continue
+        rows.append((int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--top", type=int, default=5)
+    args = ap.parse_args()
+
+    failed = False
+    for module, forbidden in TARGETS.items():
+        best = None
+        for _ in range(args.rounds):
+            rows = import_profile(module)
+            total = next(us for us, _, name in reversed(rows) if name == module)
+            if best is None or total < best[0]:
+                best = (total, rows)
+        total, rows = best
+
+        loaded = {name.split(".")[0] for _, _, name in rows}
+        leaked = [dep for dep in forbidden if dep in loaded]
+        # 自リポジトリ以外のトップレベルパッケージのうち重いもの（入れ子は重複して数える）
+        heavy = sorted(
+            ((us, name) for us, _, name in rows
+             if "." not in name and name not in ("utils", "scrapers", "notify", "scripts")),
+            reverse=True,
+        )[:args.top]
+        heavy_str = ", ".join(f"{name} {us / 1000:.1f}ms" for us, name in heavy) or "-"
+        status = "OK" if not leaked else f"LEAK {','.join(leaked)}"
+        print(f"[bench_startup] {module:32s} {total / 1000:7.1f} ms  [{status}]  heavy: {heavy_str}")
+        if leaked:
+            failed = True
+
+    if failed:
+        print("[bench_startup][ERROR] heavy dependencies are imported at module import time")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_yahoo_index.py
+"""
+Yahoo!スポーツ NPB 週別ページの日付ヘッダー検索のベンチマーク（保存済み fixture ページを使用）。
+
+比較対象（どちらもパース済みの同じツリーに対して実行）:
+  legacy : 7日分それぞれ find_date_header（th/h2/h3 の find_all を最大3回）→ 1ページ最大21回の全体走査
+  current: build_date_header_index で1回だけ走査して索引を作り、各日付は索引から引く
+
+実行: python -m benchmarks.bench_yahoo_index [--repeat N]
+両者の抽出結果が一致することも確認する（不一致なら終了コード1）。
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from utils.html import make_soup  # noqa: E402
+from scrapers import paypay_dome  # noqa: E402
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "pages" / "yahoo_npb_week_2026-06-15.html"
+MONDAY = datetime(2026, 6, 15)
+WEEKS_PER_RUN = 9  # fetch_multi_week_baseball の取得週数（今週＋8週）
+
+
+def _week_dates(monday: datetime):
+    return [
+        {"date": d, "japanese": paypay_dome.format_japanese_date(d), "iso": d.strftime("%Y-%m-%d")}
+        for d in (monday + timedelta(days=i) for i in range(7))
+    ]
+
+
+def run_legacy(soup, week_dates):
+    games = []
+    for date_info in week_dates:
+        games.extend(paypay_dome.find_games_for_date(soup, date_info))
+    return games
+
+
+def run_current(soup, week_dates):
+    index = paypay_dome.build_date_header_index(soup)
+    games = []
+    for date_info in week_dates:
+        games.extend(paypay_dome.find_games_for_date(soup, date_info, index))
+    return games
+
+
+def _best_of(fn, soup, week_dates, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(soup, week_dates)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    soup = make_soup(FIXTURE.read_text(encoding="utf-8"))
+    week_dates = _week_dates(MONDAY)
+
+    legacy_out = run_legacy(soup, week_dates)
+    current_out = run_current(soup, week_dates)
+    if legacy_out != current_out:
+        print("[bench_yahoo_index][ERROR] legacy and current outputs differ")
+        sys.exit(1)
+
+    t_legacy = _best_of(run_legacy, soup, week_dates, args.repeat)
+    t_current = _best_of(run_current, soup, week_dates, args.repeat)
+    print(f"[bench_yahoo_index] fixture={FIXTURE.name} games={len(current_out)}")
+    print(f"[bench_yahoo_index] legacy : {t_legacy * 1000:7.2f} ms/page ({t_legacy * WEEKS_PER_RUN * 1000:7.1f} ms/run)")
+    print(f"[bench_yahoo_index] current: {t_current * 1000:7.2f} ms/page ({t_current * WEEKS_PER_RUN * 1000:7.1f} ms/run)")
+    print(f"[bench_yahoo_index] speedup: x{t_legacy / t_current:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/offline.py
+"""
+ベンチマーク用のオフライン実行環境。保存済みの fixture だけでスクレイパーを動かす。
+
+  with offline_env() as tmp:
+      events = sunpalace.collect_events()
+
+- HTTP: utils.http_client の共有セッションを fixture 応答を返すセッションに差し替える
+  （URL → fixture の対応は route()。未知のURLは404）
+- 時刻: 各モジュールの datetime.now() を FROZEN_NOW（fixture 取得時点）に固定
+- time.sleep（paypay_dome の週間アクセス間隔）は待たない
+- 書き出し先（storage/・履歴ストア・変更検知の状態）は一時ディレクトリ。DB・通知は行わない
+"""
+import os
+import sys
+import json
+import time
+import base64
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from utils import http_client, storage  # noqa: E402
+from utils.parser import JST  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PAGES_DIR = FIXTURES_DIR / "pages"
+API_DIR = FIXTURES_DIR / "api"
+
+# fixture を取得した時点（Yahoo 週間ページ・CMS の日程と揃える）
+FROZEN_NOW = datetime(2026, 6, 15, 9, 0, tzinfo=JST)
+
+# ホスト → fixture ページ（週・月・年の違いは問わず同じページを返す）
+PAGE_ROUTES = {
+    "www.f-sunpalace.com": "sunpalace_2026-10.html",
+    "baseball.yahoo.co.jp": "yahoo_npb_week_2026-06-15.html",
+    "www.softbankhawks.co.jp": "paypay_dome_events_2026.html",
+    "www.avispa.co.jp": "best_denki_stadium_schedule.html",
+}
+
+# datetime.now() を固定するモジュール
+FROZEN_MODULES = (
+    "utils.parser",
+    "utils.marinemesse_api",
+    "scrapers.sunpalace",
+    "scrapers.paypay_dome",
+    "scrapers.paypay_dome_events",
+    "scrapers.best_denki_stadium",
+    "scripts.refresh_future_events",
+)
+
+# オフライン実行時の環境変数（None は削除）
+OFFLINE_ENV = {
+    "HTTP_CACHE": "0",
+    "ENABLE_DB_SAVE": "0",
+    "ENABLE_CHANGE_DETECT": "0",
+    "ENABLE_API_SNAPSHOT": "0",
+    "ENABLE_METRICS": "0",
+    "ENABLE_STORAGE_SNAPSHOT": "1",
+    "STORAGE_FORMAT": "json",
+    "DRY_RUN": "1",
+    "SCRAPER_TARGET_DATE": None,
+    "SLACK_WEBHOOK_URL": None,
+    "LINE_CHANNEL_ACCESS_TOKEN": None,
+}
+
+
+class FrozenDatetime(datetime):
+    """now() だけ FROZEN_NOW を返す datetime"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return FROZEN_NOW if tz is None else FROZEN_NOW.astimezone(tz)
+
+
+def _cms_items(url: str) -> list:
+    """CMS API のクエリ（Base64 JSON）を解釈し、会場別 fixture の該当ページを返す"""
+    q = parse_qs(urlparse(url).query)["q"][0]
+    query = json.loads(base64.b64decode(q))
+    filter_id = query["filters"].rsplit("]", 1)[-1]
+    path = API_DIR / f"cms_{filter_id}.json"
+    if not path.exists():
+        return []
+    items = json.loads(path.read_text(encoding="utf-8"))
+    offset, limit = int(query["offset"]), int(query["limit"])
+    return items[offset:offset + limit]
+
+
+def route(url: str):
+    """URL → (ステータス, 本文bytes, Content-Type)"""
+    host = urlparse(url).netloc
+    if host == "api.cms.studiodesignapp.com":
+        body = json.dumps(_cms_items(url), ensure_ascii=False).encode("utf-8")
+        return 200, body, "application/json; charset=utf-8"
+    name = PAGE_ROUTES.get(host)
+    if name is None:
+        return 404, b"", "text/plain"
+    return 200, (PAGES_DIR / name).read_bytes(), "text/html; charset=utf-8"
+
+
+class FixtureSession:
+    """requests.Session の代わりに fixture から応答を組み立てる（request() のみ対応）"""
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+
+    def request(self, method, url, timeout=None, headers=None, **kwargs):
+        status, body, content_type = route(url)
+        self.requests += 1
+        self.bytes += len(body)
+        r = requests.Response()
+        r.status_code = status
+        r._content = body
+        r.encoding = "utf-8"
+        r.headers["Content-Type"] = content_type
+        r.url = url
+        return r
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def offline_env():
+    """fixture だけで動く実行環境に切り替え、一時ディレクトリのパスを返す"""
+    saved_env = {key: os.environ.get(key) for key in (*OFFLINE_ENV, "EVENT_STORE_PATH")}
+    saved_session = http_client._session
+    saved_storage = storage.STORAGE_DIR
+    saved_sleep = time.sleep
+    frozen = []
+
+    with tempfile.TemporaryDirectory(prefix="bench_offline_") as tmp:
+        try:
+            for key, value in OFFLINE_ENV.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            os.environ["EVENT_STORE_PATH"] = str(Path(tmp) / "events.sqlite3")
+
+            http_client._session = FixtureSession()
+            storage.STORAGE_DIR = Path(tmp) / "storage"
+            time.sleep = lambda seconds: None
+            for name in FROZEN_MODULES:
+                module = sys.modules.get(name)
+                if module is not None and getattr(module, "datetime", None) is datetime:
+                    module.datetime = FrozenDatetime
+                    frozen.append(module)
+            yield Path(tmp)
+        finally:
+            for module in frozen:
+                module.datetime = datetime
+            time.sleep = saved_sleep
+            storage.STORAGE_DIR = saved_storage
+            http_client._session = saved_session
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
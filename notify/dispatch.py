@@ -4,7 +4,6 @@ import sys
 import unicodedata
 from datetime import datetime, timezone, timedelta
 from typing import List, Tuple, Dict, Optional
-import requests
 
 # Windows環境でのコンソール出力時のUnicodeEncodeError（cp932エラー）を防止
 if sys.platform.startswith('win'):
@@ -17,8 +16,14 @@ if sys.platform.startswith('win'):
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
+# Slack/LINE 送信は共有HTTPクライアント経由（HTTP_REPLAY の記録・再生対象）
+from utils import http_client, metrics
+from utils.log import get_logger
+
 
 # --- 設定 ---------------------------------------------------------------
+log = get_logger("dispatch")
+
 JST = timezone(timedelta(hours=9))
 VENUES: List[Tuple[str, str]] = [
     ("a", "マリンメッセA館"),
@@ -33,6 +38,12 @@ VENUES: List[Tuple[str, str]] = [
 CODE_INDEX: Dict[str, int] = {c: i for i, (c, _) in enumerate(VENUES)}
 CODE2NAME: Dict[str, str] = {c: n for c, n in VENUES}
 
+# 変更検知セクションに列挙する最大件数（超えた分は「ほかN件」）
+CHANGE_MAX_LINES = 30
+
+# 処理時間セクションに載せる遅い段階の件数
+SLOW_STAGE_LINES = 3
+
 # 表示用: PayPayドーム(野球)とPayPay(イベント)はDB上で同一venue名のため合算表示
 DISPLAY_VENUES: List[Tuple[str, str]] = [(c, n) for c, n in VENUES if c != "f_event"]
 
@@ -40,16 +51,16 @@ DISPLAY_VENUES: List[Tuple[str, str]] = [(c, n) for c, n in VENUES if c != "f_ev
 def get_webhook_urls():
     slack_url = os.getenv("SLACK_WEBHOOK_URL")
     if not slack_url:
-        print("[dispatch][WARN] SLACK_WEBHOOK_URL not set")
+        log.warn("SLACK_WEBHOOK_URL not set")
     return slack_url
 
 def get_line_credentials():
     line_user_id = os.getenv("LINE_USER_ID")
     line_token = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
     if not line_user_id:
-        print("[dispatch][WARN] LINE_USER_ID not set")
+        log.warn("LINE_USER_ID not set")
     if not line_token:
-        print("[dispatch][WARN] LINE_CHANNEL_ACCESS_TOKEN not set")
+        log.warn("LINE_CHANNEL_ACCESS_TOKEN not set")
     return line_user_id, line_token
 
 # --- ユーティリティ ------------------------------------------------------
@@ -80,20 +91,20 @@ def _shorten_venue_name(name: str) -> str:
 # --- 送信 ---------------------------------------------------------------
 def send_to_slack(text: str, webhook_url: str) -> bool:
     if not webhook_url:
-        print("[dispatch][WARN] No Slack URL -> skip Slack")
+        log.warn("No Slack URL -> skip Slack")
         return False
     try:
-        r = requests.post(webhook_url, json={"text": text}, timeout=15)
-        print(f"[dispatch] slack status={r.status_code}")
+        r = http_client.request("POST", webhook_url, json={"text": text}, timeout=15)
+        log.info("slack status=%s", r.status_code)
         r.raise_for_status()
         return True
     except Exception as e:
-        print(f"[dispatch][ERROR] Slack msg=\"{e}\"")
+        log.error("Slack msg=\"%s\"", e)
         return False
 
 def send_to_line(text: str, line_user_id: str, line_token: str) -> bool:
     if not line_user_id or not line_token:
-        print("[dispatch][WARN] Missing LINE credentials -> skip LINE")
+        log.warn("Missing LINE credentials -> skip LINE")
         return False
     try:
         url = "https://api.line.me/v2/bot/message/push"
@@ -110,12 +121,12 @@ def send_to_line(text: str, line_user_id: str, line_token: str) -> bool:
                 }
             ]
         }
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
-        print(f"[dispatch] LINE status={r.status_code}")
+        r = http_client.request("POST", url, headers=headers, json=payload, timeout=15)
+        log.info("LINE status=%s", r.status_code)
         r.raise_for_status()
         return True
     except Exception as e:
-        print(f"[dispatch][ERROR] LINE msg=\"{e}\"")
+        log.error("LINE msg=\"%s\"", e)
         return False
 
 
@@ -124,44 +135,38 @@ def get_db_counts(today: str) -> Optional[dict]:
     """Supabaseから会場ごとの件数を取得。失敗時はNoneを返す。"""
     # ENABLE_DB_SAVE=0 の場合はスキップ
     if os.getenv("ENABLE_DB_SAVE", "0") != "1":
-        print("[dispatch] ENABLE_DB_SAVE=0 -> DB counts skipped")
+        log.info("ENABLE_DB_SAVE=0 -> DB counts skipped")
         return None
 
     try:
-        from supabase import create_client
-        from collections import Counter
-
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
+        from utils import db_counts as db_counts_mod
+        from utils import db_writer
 
-        if not supabase_url or not supabase_key:
-            print("[dispatch][WARN] Missing SUPABASE credentials -> DB counts skipped")
+        if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_KEY"):
+            log.warn("Missing SUPABASE credentials -> DB counts skipped")
             return None
 
-        supabase = create_client(supabase_url, supabase_key)
+        # refresh_future_events の同期と同じクライアントを再利用
+        supabase = db_writer.get_client()
 
-        result = supabase.table('events')\
-            .select('venue')\
-            .eq('event_type', 'auto')\
-            .gte('date', today)\
-            .execute()
+        # 会場ごとの件数はDB側で集計（行データは転送しない）
+        venue_names = list(dict.fromkeys(CODE2NAME.values()))
+        counts_by_name = db_counts_mod.count_future_by_venue(supabase, today, venue_names)
 
         # venue名→コード変換用逆引き辞書
         NAME2CODE = {v: k for k, v in CODE2NAME.items()}
 
-        counter = Counter(row['venue'] for row in result.data)
-
         db_counts = {}
-        for venue_name, count in counter.items():
+        for venue_name, count in counts_by_name.items():
             code = NAME2CODE.get(venue_name)
             if code:
                 db_counts[code] = count
 
-        print(f"[dispatch] DB counts retrieved: {sum(db_counts.values())} total")
+        log.info("DB counts retrieved: %d total", sum(db_counts.values()))
         return db_counts
 
     except Exception as e:
-        print(f"[dispatch][WARN] Failed to get DB counts: {e}")
+        log.warn("Failed to get DB counts: %s", e)
         return None
 
 # --- メッセージ生成 ------------------------------------------------------
@@ -212,7 +217,63 @@ def _build_section(title: str, counts: dict, venues_list=None, compare_counts: O
     lines.append(f"合計: {total}件")
     return lines
 
-def build_log_message(today: str, venue_counts: dict, db_counts: Optional[dict] = None) -> str:
+def _build_sync_section(sync_stats: dict) -> list:
+    """DB差分同期の件数セクションを生成"""
+    return [
+        "\n--- DB差分 ---",
+        f"追加: {sync_stats.get('inserted', 0)}件 / 更新: {sync_stats.get('updated', 0)}件 / "
+        f"削除: {sync_stats.get('deleted', 0)}件 / 変更なし: {sync_stats.get('unchanged', 0)}件",
+    ]
+
+def _build_timing_section(run_report: dict, top: int = SLOW_STAGE_LINES) -> list:
+    """処理時間セクション（合計・フェーズ別・遅い段階・HTTP）を生成。run_report は utils.metrics.build_report() の結果"""
+    phases = " / ".join(f"{name} {ms / 1000:.1f}秒" for name, ms in run_report.get("phases_ms", {}).items())
+    lines = ["\n--- 処理時間 ---", f"合計: {run_report.get('wall_ms', 0) / 1000:.1f}秒" + (f"（{phases}）" if phases else "")]
+    slowest = metrics.slowest_stages(run_report, top)
+    if slowest:
+        lines.append("遅い段階: " + " / ".join(f"{scope} {stage} {ms / 1000:.1f}秒" for scope, stage, ms in slowest))
+    http = run_report.get("http") or {}
+    if http.get("requests"):
+        lines.append(f"HTTP: {http['requests']}件 / {http.get('bytes', 0) / 1024 / 1024:.1f}MB / エラー{http.get('errors', 0)}件")
+    return lines
+
+def _format_change_item(mark: str, item: list) -> str:
+    date, time, title = item[0], item[1], item[2]
+    time_str = f" {str(time)[:5]}" if time else ""
+    return f"{mark} {date}{time_str} {title}"
+
+def _build_change_section(changes, max_lines: int = CHANGE_MAX_LINES) -> list:
+    """前回実行からの変更（追加/変更/削除）セクションを生成。差分が無ければ1行のみ"""
+    lines = ["\n--- 変更検知 ---"]
+    if changes.baseline:
+        lines.append("初回のため基準を保存（差分なし）")
+        return lines
+    counts = changes.counts()
+    lines.append(f"追加: {counts['added']}件 / 変更: {counts['changed']}件 / 削除: {counts['removed']}件")
+    shown = 0
+    for code, _ in VENUES:
+        venue_changes = changes.venues.get(code)
+        if venue_changes is None:
+            continue
+        lines.append(f"[{_shorten_venue_name(CODE2NAME[code])}]")
+        for mark, items in (("＋", venue_changes.added), ("～", venue_changes.changed), ("－", venue_changes.removed)):
+            for item in items:
+                if shown >= max_lines:
+                    lines.append(f"…ほか{changes.total() - shown}件")
+                    return lines
+                lines.append(_format_change_item(mark, item))
+                shown += 1
+    return lines
+
+def build_change_message(changes) -> str:
+    """変更検知の通知メッセージ（LINE用）を生成する純関数"""
+    current_time = datetime.now(JST).strftime("%Y-%m-%d %H:%M JST")
+    lines = [f"【イベント変更】{current_time}"]
+    lines.extend(_build_change_section(changes)[1:])
+    return "\n".join(lines)
+
+def build_log_message(today: str, venue_counts: dict, db_counts: Optional[dict] = None,
+                      sync_stats: Optional[dict] = None, changes=None, run_report: Optional[dict] = None) -> str:
     """件数ログメッセージを生成する純関数"""
     current_time = datetime.now(JST).strftime("%Y-%m-%d %H:%M JST")
     lines = [f"【実行ログ】{current_time}"]
@@ -232,33 +293,59 @@ def build_log_message(today: str, venue_counts: dict, db_counts: Optional[dict]
         lines.append("\n--- DB件数 ---")
         lines.append("⚠️ 取得失敗")
 
+    # DB差分セクション（同期を実行した場合のみ）
+    if sync_stats is not None:
+        lines.extend(_build_sync_section(sync_stats))
+
+    # 変更検知セクション（utils/change_detect の結果がある場合のみ）
+    if changes is not None:
+        lines.extend(_build_change_section(changes))
+
+    # 処理時間セクション（utils.metrics のランレポートがある場合のみ）
+    if run_report is not None:
+        lines.extend(_build_timing_section(run_report))
+
     return "\n".join(lines)
 
 # --- エントリポイント ------------------------------------------------------
-def send_log(venue_counts: dict, errors: List[str] = None, zero_warnings: List[str] = None) -> None:
-    """refresh_future_events.pyから呼び出すエントリポイント"""
+def send_log(venue_counts: dict, errors: List[str] = None, zero_warnings: List[str] = None,
+             sync_stats: Optional[dict] = None, changes=None, run_report: Optional[dict] = None) -> None:
+    """
+    refresh_future_events.pyから呼び出すエントリポイント。
+    changes（utils.change_detect.ChangeSet）があれば、差分のみをSlackログに載せ、
+    CHANGE_NOTIFY_LINE=1 かつ差分がある場合はLINEにも送る。
+    run_report（utils.metrics.build_report()）があれば処理時間・遅い段階も載せる。
+    """
     today = determine_today()
 
     # DB件数を取得（内部で自己完結）
     db_counts = get_db_counts(today)
 
-    body = build_log_message(today, venue_counts, db_counts)
-    print("[dispatch] preview:\n" + body)
+    body = build_log_message(today, venue_counts, db_counts, sync_stats, changes, run_report)
+    log.info("preview:\n" + body)
 
     # DRY_RUN チェック
     if os.getenv("DRY_RUN") == "1":
-        print("[dispatch] DRY_RUN mode - not sending")
+        log.info("DRY_RUN mode - not sending")
         return
 
     slack_url = get_webhook_urls()
 
     # 1. Slackにログ送信（正常・異常にかかわらず全体ログを残す）
     sent = send_to_slack(body, slack_url)
-    print(f"[dispatch] Slack sent={sent}")
+    log.info("Slack sent=%s", sent)
+    metrics.incr("notifications_sent", int(sent), scope="slack")
+
+    # 1.5 変更があった場合のみLINEに差分を送信（任意）
+    if changes is not None and changes.total() > 0 and os.getenv("CHANGE_NOTIFY_LINE", "0") == "1":
+        line_user_id, line_token = get_line_credentials()
+        change_sent = send_to_line(build_change_message(changes), line_user_id, line_token)
+        log.info("LINE change notice sent=%s", change_sent)
+        metrics.incr("notifications_sent", int(change_sent), scope="line")
 
     # 2. 異常検知時のLINEサイレン送信
     if (errors and len(errors) > 0) or (zero_warnings and len(zero_warnings) > 0):
-        print("[dispatch][ALERT] Critical anomaly detected! Preparing LINE Siren alert...")
+        log.warn("Critical anomaly detected! Preparing LINE Siren alert...")
         
         # サイレンメッセージの組み立て
         siren_lines = ["🚨🚨🚨【緊急サイレン】🚨🚨🚨\nスクレイパーで異常が起きたぞ！\n"]
@@ -281,7 +368,7 @@ def send_log(venue_counts: dict, errors: List[str] = None, zero_warnings: List[s
         # LINEにプッシュ送信
         line_user_id, line_token = get_line_credentials()
         line_sent = send_to_line(siren_body, line_user_id, line_token)
-        print(f"[dispatch] LINE Siren alert sent={line_sent}")
+        log.info("LINE Siren alert sent=%s", line_sent)
 
 if __name__ == "__main__":
-    print("[dispatch] 単体実行は非対応。refresh_future_events.py経由で実行してください。")
+    log.info("単体実行は非対応。refresh_future_events.py経由で実行してください。")
@@ -1,22 +1,30 @@
 # notify/html_export.py Ver.3.1.4（天気情報自動更新機能追加版）
 import os
+import re
 import sys
 import json
-from datetime import datetime, timezone, timedelta
+import hashlib
+import importlib.util
+from functools import lru_cache
+from datetime import date, datetime, timezone, timedelta
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, TYPE_CHECKING
 
 # パス解決
 sys.path.append(str(Path(__file__).parent.parent))
 
-# Supabase投入用（オプション）
-try:
-    from supabase import create_client, Client
-    from dotenv import load_dotenv
-    load_dotenv()
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+from utils import metrics
+from utils.env import env_int
+from utils.log import get_logger
+from utils.storage import read_compact, read_snapshot_for_date
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+log = get_logger("html_export")
+
+# Supabase投入用（オプション・import と .env 読み込みは get_supabase_client で実際に使うときだけ）
+SUPABASE_AVAILABLE = importlib.util.find_spec("supabase") is not None
 
 # JST定義
 JST = timezone(timedelta(hours=9))
@@ -47,6 +55,16 @@ VENUE_LINKS = {
 # Google Forms URL
 OPINION_FORM_URL = "https://docs.google.com/forms/d/e/1FAIpQLSfX2EtHu3hZ2FgMfUjSOx1YYQqt2BaB3BGniVPF5TMCtgLByw/viewform"
 
+# index.html テンプレートの差し込み位置（current_time は内容ハッシュから除外）
+TEMPLATE_SLOTS = ("today", "current_time", "data_source", "event_message", "venue_list")
+
+# 日別ページの出力日数（HTML_EXPORT_DAYS=7 で今日から7日分の site/YYYY-MM-DD.html を生成）
+DEFAULT_EXPORT_DAYS = 1
+DB_PAGE_SIZE = 1000
+
+# 前回生成したページの内容ハッシュ（GitHub Actions では site/ と共にキャッシュで引き継ぐ）
+SITE_STATE_DIR = Path(__file__).parent.parent / "storage" / "site_state"
+
 def determine_today_standalone() -> str:
     """今日の日付を取得（単独動作版）"""
     return datetime.now(JST).strftime("%Y-%m-%d")
@@ -61,185 +79,284 @@ def get_storage_dir() -> Path:
         storage_dir.mkdir(exist_ok=True)
         return storage_dir
 
-def get_supabase_client() -> Client:
+def get_supabase_client() -> "Client":
     """Supabaseクライアントを取得（デバッグ強化版）"""
-    print(f"[html_export] DEBUG - SUPABASE_AVAILABLE: {SUPABASE_AVAILABLE}")
+    log.debug("SUPABASE_AVAILABLE: %s", SUPABASE_AVAILABLE)
     
     if not SUPABASE_AVAILABLE:
         raise RuntimeError("Supabase dependencies not available")
+
+    # .env読み込み（SUPABASE_URL / SUPABASE_KEY 用・オプション）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
     
     # 環境変数デバッグ出力
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
     
-    print(f"[html_export] DEBUG - SUPABASE_URL: {url[:30] if url else 'None'}...")
-    print(f"[html_export] DEBUG - SUPABASE_KEY: {key[:20] if key else 'None'}...")
-    print(f"[html_export] DEBUG - URL type: {type(url)}")
-    print(f"[html_export] DEBUG - KEY type: {type(key)}")
+    log.debug(lambda: f"SUPABASE_URL: {url[:30] if url else 'None'}...")
+    log.debug(lambda: f"SUPABASE_KEY: {key[:20] if key else 'None'}...")
+    log.debug("URL type: %s", type(url))
+    log.debug("KEY type: %s", type(key))
     
     if not url or not key:
         error_msg = f"Environment variables missing - URL: {bool(url)}, KEY: {bool(key)}"
-        print(f"[html_export] DEBUG - {error_msg}")
+        log.debug(error_msg)
         raise RuntimeError(f"SUPABASE_URL or SUPABASE_KEY not set in environment. {error_msg}")
     
-    return create_client(url, key)
+    from supabase import create_client
+    from utils import http_replay
+    return create_client(url, key, options=http_replay.supabase_options())
 
 def main():
     """メイン実行関数（デバッグ版）"""
     # 最初に環境変数を表示
-    print(f"[html_export] DEBUG - Environment check:")
-    print(f"[html_export] DEBUG - SUPABASE_URL present: {bool(os.getenv('SUPABASE_URL'))}")
-    print(f"[html_export] DEBUG - SUPABASE_KEY present: {bool(os.getenv('SUPABASE_KEY'))}")
-    print(f"[html_export] DEBUG - ENABLE_DB_SAVE: {os.getenv('ENABLE_DB_SAVE', 'NOT_SET')}")
+    log.debug("Environment check:")
+    log.debug("SUPABASE_URL present: %s", bool(os.getenv('SUPABASE_URL')))
+    log.debug("SUPABASE_KEY present: %s", bool(os.getenv('SUPABASE_KEY')))
+    log.debug("ENABLE_DB_SAVE: %s", os.getenv('ENABLE_DB_SAVE', 'NOT_SET'))
     
     export_html()
 
+def _event_sort_key(event: Dict[str, Any]):
+    """時刻順（時刻未定は末尾）→タイトル→会場"""
+    time_str = event.get("time", "99:99")
+    if not time_str or time_str == "（時刻未定）":
+        return ("99:99", event.get("title", ""), event.get("venue", ""))
+    return (time_str, event.get("title", ""), event.get("venue", ""))
+
+def _convert_db_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Supabaseのレコードを標準形式に変換（時刻の秒削除・PayPayドームのnotes展開）"""
+    events = []
+    log.debug("Starting data conversion for %d records", len(records))
+    # レコード単位のデバッグ出力は DEBUG 時のみ（通常実行ではループ内で文字列を組み立てない）
+    debug = log.debug_enabled()
+    
+    for i, db_record in enumerate(records):
+        if debug:
+            log.debug("Processing record %d: %s", i + 1, type(db_record))
+            # デバッグ: レコード内容確認
+            log.debug("Record keys: %s", list(db_record.keys()) if db_record else 'None record')
+        
+        # 時刻データの正規化処理
+        time_value = db_record.get("time")
+        if debug:
+            log.debug("time_value: %s (type: %s)", time_value, type(time_value))
+        
+        if time_value:
+            # PostgreSQLのTIME型から文字列への変換対応
+            time_str = str(time_value)
+            if debug:
+                log.debug("time_str: %s", time_str)
+            # HH:MM:SS → HH:MM に変換（秒を削除）
+            if len(time_str) >= 5:
+                time_value = time_str[:5]  # "18:00:00" → "18:00"
+        else:
+            time_value = None  # None維持（後で（時刻未定）に変換）
+        
+        event = {
+            "date": db_record.get("date"),
+            "time": time_value,  # 正規化済み時刻
+            "title": db_record.get("title", ""),
+            "venue": db_record.get("venue", ""),
+            "source": db_record.get("source_url", ""),
+            "hash": db_record.get("data_hash", ""),
+            "event_type": db_record.get("event_type", "auto"),
+            "notes": db_record.get("notes", "")
+        }
+        
+        # PayPayドーム用の追加情報をnotesから抽出
+        notes = event.get("notes", "")
+        if debug:
+            log.debug("notes value: %s (type: %s)", notes, type(notes))
+        
+        # None チェックを追加
+        if notes is not None and "game_status:" in notes:
+            try:
+                # "game_status: 試合前, score: None" のような形式から抽出
+                game_status_match = re.search(r'game_status:\s*([^,]+)', notes)
+                score_match = re.search(r'score:\s*([^,\n]+)', notes)
+                
+                if game_status_match:
+                    event["game_status"] = game_status_match.group(1).strip()
+                if score_match:
+                    score_value = score_match.group(1).strip()
+                    event["score"] = None if score_value in ["None", "null"] else score_value
+            except Exception as e:
+                log.warn("Error parsing notes: %s", e)
+        events.append(event)
+    return events
+
 def load_events_from_database(today: str) -> Tuple[List[Dict[str, Any]], List[str]]:
     """Ver.2.5: Supabaseから当日のイベントを取得（時刻表示正規化対応）"""
     try:
-        print(f"[html_export] Attempting database connection...")
+        log.debug("Attempting database connection...")
         supabase = get_supabase_client()
-        print(f"[html_export] Supabase client created successfully")
+        log.debug("Supabase client created successfully")
         
         # 当日のイベントを取得
-        print(f"[html_export] Querying events for date: {today}")
+        log.debug("Querying events for date: %s", today)
         result = supabase.table('events').select('*').eq('date', today).execute()
         
-        print(f"[html_export] DEBUG - Query result type: {type(result)}")
-        print(f"[html_export] DEBUG - Result.data type: {type(result.data) if hasattr(result, 'data') else 'No data attribute'}")
-        print(f"[html_export] DEBUG - Result.data length: {len(result.data) if hasattr(result, 'data') and result.data is not None else 'No data or None'}")
+        log.debug("Query result type: %s", type(result))
+        log.debug(lambda: f"Result.data type: {type(result.data) if hasattr(result, 'data') else 'No data attribute'}")
+        log.debug(lambda: f"Result.data length: {len(result.data) if hasattr(result, 'data') and result.data is not None else 'No data or None'}")
         
         if not hasattr(result, 'data') or result.data is None:
-            print(f"[html_export] No data attribute or data is None")
+            log.warn("No data attribute or data is None")
             return [], []
         
         if not result.data:
-            print(f"[html_export] No events found in database for {today}")
+            log.info("No events found in database for %s", today)
             return [], []
         
         # Supabaseデータを標準形式に変換
-        events = []
-        print(f"[html_export] DEBUG - Starting data conversion for {len(result.data)} records")
-        
-        for i, db_record in enumerate(result.data):
-            print(f"[html_export] DEBUG - Processing record {i+1}: {type(db_record)}")
-            
-            # デバッグ: レコード内容確認
-            print(f"[html_export] DEBUG - Record keys: {list(db_record.keys()) if db_record else 'None record'}")
-            
-            # 時刻データの正規化処理
-            time_value = db_record.get("time")
-            print(f"[html_export] DEBUG - time_value: {time_value} (type: {type(time_value)})")
-            
-            if time_value:
-                # PostgreSQLのTIME型から文字列への変換対応
-                time_str = str(time_value)
-                print(f"[html_export] DEBUG - time_str: {time_str}")
-                # HH:MM:SS → HH:MM に変換（秒を削除）
-                if len(time_str) >= 5:
-                    time_value = time_str[:5]  # "18:00:00" → "18:00"
-            else:
-                time_value = None  # None維持（後で（時刻未定）に変換）
-            
-            event = {
-                "date": db_record.get("date"),
-                "time": time_value,  # 正規化済み時刻
-                "title": db_record.get("title", ""),
-                "venue": db_record.get("venue", ""),
-                "source": db_record.get("source_url", ""),
-                "hash": db_record.get("data_hash", ""),
-                "event_type": db_record.get("event_type", "auto"),
-                "notes": db_record.get("notes", "")
-            }
-            
-            # PayPayドーム用の追加情報をnotesから抽出
-            notes = event.get("notes", "")
-            print(f"[html_export] DEBUG - notes value: {notes} (type: {type(notes)})")
-            
-            # None チェックを追加
-            if notes is not None and "game_status:" in notes:
-                try:
-                    # "game_status: 試合前, score: None" のような形式から抽出
-                    import re
-                    game_status_match = re.search(r'game_status:\s*([^,]+)', notes)
-                    score_match = re.search(r'score:\s*([^,\n]+)', notes)
-                    
-                    if game_status_match:
-                        event["game_status"] = game_status_match.group(1).strip()
-                    if score_match:
-                        score_value = score_match.group(1).strip()
-                        event["score"] = None if score_value in ["None", "null"] else score_value
-                except Exception as e:
-                    print(f"[html_export] Error parsing notes: {e}")
-            events.append(event)
+        events = _convert_db_records(result.data)
         
         # 時刻順ソート
-        def sort_key(event):
-            time_str = event.get("time", "99:99")
-            if not time_str or time_str == "（時刻未定）":
-                return ("99:99", event.get("title", ""), event.get("venue", ""))
-            return (time_str, event.get("title", ""), event.get("venue", ""))
-        
-        events.sort(key=sort_key)
+        events.sort(key=_event_sort_key)
         
-        print(f"[html_export] Successfully loaded {len(events)} events from database")
+        log.info("Successfully loaded %d events from database", len(events))
         
         # Ver.2.5: missingは空（DB直結のため会場別の失敗概念なし）
         return events, []
         
     except Exception as e:
-        print(f"[html_export] Database connection failed: {e}")
+        log.warn("Database connection failed: %s", e)
         raise
 
-def load_events_standalone(today: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-    """イベントデータを読み込み（従来のJSONファイル版・フォールバック用）"""
+def load_event_range_from_database(start: str, end: str) -> Dict[str, List[Dict[str, Any]]]:
+    """期間内（start〜end）のイベントを1回の範囲クエリで取得し、日付 → 時刻順リスト で返す"""
+    log.debug("Attempting database connection...")
+    supabase = get_supabase_client()
+    
+    log.debug("Querying events for range: %s ~ %s", start, end)
+    records = []
+    offset = 0
+    while True:
+        result = (
+            supabase.table('events').select('*')
+            .gte('date', start).lte('date', end)
+            .order('date').order('id')
+            .range(offset, offset + DB_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = result.data or []
+        records.extend(page)
+        if len(page) < DB_PAGE_SIZE:
+            break
+        offset += DB_PAGE_SIZE
+    
+    by_date = group_events_by_date(_convert_db_records(records), start, end)
+    log.info("Successfully loaded %d events from database (%d days)", len(records), len(by_date))
+    return by_date
+
+def group_events_by_date(events: List[Dict[str, Any]], start: str, end: str) -> Dict[str, List[Dict[str, Any]]]:
+    """期間内のイベントを 日付 → 時刻順リスト にまとめる（ISO日付文字列の大小で比較）"""
+    by_date: Dict[str, List[Dict[str, Any]]] = {}
+    for ev in events:
+        day = ev.get("date") or ""
+        if start <= day <= end:
+            by_date.setdefault(day, []).append(ev)
+    for day_events in by_date.values():
+        day_events.sort(key=_event_sort_key)
+    return by_date
+
+def _load_compact_standalone(storage_dir: Path, today: str, event_date: str = None):
+    """
+    1日1ファイルのコンパクト形式（STORAGE_FORMAT=ndjson/both）を読む。無ければ None
+    event_date 指定時はその日付の行だけ（None なら全件）
+    """
+    compact_path = storage_dir / f"{today}_events.ndjson"
+    if not compact_path.exists():
+        return None
+    try:
+        events, counts = read_compact(compact_path, event_date)
+    except Exception as e:
+        log.warn("Error loading %s: %s, falling back to per-venue files", compact_path.name, e)
+        return None
+    missing = [code for code, _ in VENUES if code not in counts]
+    target = event_date or "all dates"
+    log.info("Loaded %d events for %s from %s (indexed)", len(events), target, compact_path.name)
+    return events, missing
+
+def _load_storage_events(today: str, event_date: str = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    storage/ の {today} スナップショットからイベントを読み込む（日付の絞り込み前）
+    event_date 指定時は日付インデックスがあればその日付のレコードだけを読む
+    """
     storage_dir = get_storage_dir()
     events = []
     missing = []
     
-    print(f"[html_export] Loading events from storage: {storage_dir}")
+    log.info("Loading events from storage: %s", storage_dir)
+    
+    compact = _load_compact_standalone(storage_dir, today, event_date)
+    if compact is not None:
+        events, missing = compact
     
-    for code, venue_name in VENUES:
+    for code, venue_name in (VENUES if compact is None else []):
         json_path = storage_dir / f"{today}_{code}.json"
         
         try:
             if json_path.exists():
+                # 日付インデックス（{date}_{code}.idx.json）があれば当日分のレコードだけ読む
+                indexed = read_snapshot_for_date(json_path, event_date) if event_date else None
+                if indexed is not None:
+                    events.extend(indexed)
+                    log.debug("Loaded %d events from %s (indexed)", len(indexed), code)
+                    continue
+                
                 with open(json_path, "r", encoding="utf-8") as f:
                     data = json.load(f)
                     
                 # リスト形式の場合
                 if isinstance(data, list):
                     events.extend(data)
-                    print(f"[html_export] Loaded {len(data)} events from {code}")
+                    log.debug("Loaded %d events from %s", len(data), code)
                 # 単一オブジェクトの場合
                 elif isinstance(data, dict):
                     events.append(data)
-                    print(f"[html_export] Loaded 1 event from {code}")
+                    log.debug("Loaded 1 event from %s", code)
                 else:
-                    print(f"[html_export] Unexpected data format in {code}: {type(data)}")
+                    log.warn("Unexpected data format in %s: %s", code, type(data))
             else:
                 missing.append(code)
-                print(f"[html_export] Missing file: {json_path}")
+                log.warn("Missing file: %s", json_path)
                 
         except Exception as e:
             missing.append(code)
-            print(f"[html_export] Error loading {code}: {e}")
+            log.warn("Error loading %s: %s", code, e)
+    
+    return events, missing
+
+def load_events_standalone(today: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    イベントデータを読み込み（JSONファイル版・フォールバック用）
+    日付インデックスがあれば当日分のレコードだけを読む（約2か月分の全件はパースしない）
+    """
+    events, missing = _load_storage_events(today, today)
     
     # 今日のイベントのみフィルタ
     today_events = [ev for ev in events if ev.get("date") == today]
     
     # 時刻順ソート
-    def sort_key(event):
-        time_str = event.get("time", "99:99")
-        if not time_str or time_str == "（時刻未定）":
-            return ("99:99", event.get("title", ""), event.get("venue", ""))
-        return (time_str, event.get("title", ""), event.get("venue", ""))
+    today_events.sort(key=_event_sort_key)
     
-    today_events.sort(key=sort_key)
-    
-    print(f"[html_export] Filtered to {len(today_events)} events for {today}")
+    log.info("Filtered to %d events for %s", len(today_events), today)
     return today_events, missing
 
+def load_event_range_standalone(today: str, start: str, end: str) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+    """JSONファイル版の期間読み込み（{today} のスナップショットを1回だけ読み、日付ごとに振り分け）"""
+    events, missing = _load_storage_events(today)
+    by_date = group_events_by_date(events, start, end)
+    log.info("Grouped %d events into %d days (%s ~ %s)",
+             sum(len(v) for v in by_date.values()), len(by_date), start, end)
+    return by_date, missing
+
 def build_message_standalone(today: str, events: List[Dict[str, Any]], missing: List[str]) -> str:
     """Ver.1.6: Slack通知と同じメッセージを生成（スマホファースト・2行表示対応）"""
     lines = [f"【本日のイベント】{today}"]
@@ -270,12 +387,12 @@ def build_message_standalone(today: str, events: List[Dict[str, Any]], missing:
     return "\n".join(lines)
 
 
-def build_clean_cards_standalone(today: str, events: List[Dict[str, Any]], missing: List[str]) -> str:
-    """Ver.4.0: シンプル＆クリーンUI用のHTMLカードを生成"""
-    lines = [f'<div class="event-header">【本日のイベント】{today}</div>']
+def build_clean_cards_standalone(today: str, events: List[Dict[str, Any]], missing: List[str], label: str = "本日") -> str:
+    """Ver.4.0: シンプル＆クリーンUI用のHTMLカードを生成（label: 見出しの「本日」部分）"""
+    lines = [f'<div class="event-header">【{label}のイベント】{today}</div>']
     
     if not events:
-        lines.append('<div class="empty-event">本日の掲載イベントは見つかりませんでした。</div>')
+        lines.append(f'<div class="empty-event">{label}の掲載イベントは見つかりませんでした。</div>')
     else:
         for ev in events:
             time_value = ev.get("time")
@@ -331,10 +448,8 @@ def generate_venue_list() -> str:
     
     return "\n".join(lines)
 
-def create_html_content(today: str, event_message: str, venue_list: str, data_source: str) -> str:
-    """Ver.3.2.2: キャッシュ無効化＋天気情報自動更新機能版HTML生成"""
-    current_time = datetime.now(JST).strftime("%Y-%m-%d %H:%M JST")
-    
+def _page_template(today: str, current_time: str, data_source: str, event_message: str, venue_list: str) -> str:
+    """Ver.3.2.2: キャッシュ無効化＋天気情報自動更新機能版HTMLテンプレート（_compiled_template から1度だけ呼ばれる）"""
     html = f"""<!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -710,6 +825,85 @@ def create_html_content(today: str, event_message: str, venue_list: str, data_so
 </html>"""
     return html
 
+@lru_cache(maxsize=1)
+def _compiled_template() -> Tuple[str, ...]:
+    """
+    テンプレートの静的部分を一度だけ組み立て、差し込み位置で分割して保持する。
+    偶数番目が静的HTML、奇数番目がスロット名（TEMPLATE_SLOTS）。
+    """
+    rendered = _page_template(**{name: f"\x00{name}\x00" for name in TEMPLATE_SLOTS})
+    return tuple(re.split(r"\x00(\w+)\x00", rendered))
+
+def render_page(values: Dict[str, str]) -> str:
+    """コンパイル済みテンプレートにスロットの値を差し込む"""
+    return "".join(
+        part if i % 2 == 0 else values[part]
+        for i, part in enumerate(_compiled_template())
+    )
+
+def content_hash(values: Dict[str, str]) -> str:
+    """最終更新時刻を除いたページ内容のハッシュ（日時以外が同じなら同じ値）"""
+    return hashlib.sha256(render_page({**values, "current_time": ""}).encode("utf-8")).hexdigest()
+
+def create_html_content(today: str, event_message: str, venue_list: str, data_source: str) -> str:
+    """index.html 全体を生成（最終更新時刻は現在時刻）"""
+    current_time = datetime.now(JST).strftime("%Y-%m-%d %H:%M JST")
+    return render_page({
+        "today": today,
+        "current_time": current_time,
+        "data_source": data_source,
+        "event_message": event_message,
+        "venue_list": venue_list,
+    })
+
+def write_if_changed(output_path: Path, html_content: str, digest: str) -> bool:
+    """
+    内容ハッシュが前回と異なる場合だけ書き込み、書き込んだかを返す。
+    HTML_EXPORT_FORCE=1 で常に書き込む。
+    """
+    hash_path = SITE_STATE_DIR / f"{output_path.name}.sha256"
+    force = os.getenv("HTML_EXPORT_FORCE", "0") == "1"
+    if not force and output_path.exists() and hash_path.exists():
+        if hash_path.read_text(encoding="utf-8").strip() == digest:
+            return False
+    
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    SITE_STATE_DIR.mkdir(parents=True, exist_ok=True)
+    hash_path.write_text(digest, encoding="utf-8")
+    return True
+
+def export_day_pages(site_dir: Path, start: str, days: int, by_date: Dict[str, List[Dict[str, Any]]],
+                     missing: List[str], base_values: Dict[str, str]) -> bool:
+    """
+    start から days 日分の site/YYYY-MM-DD.html を生成し、いずれかを書き込んだかを返す。
+    データは呼び出し側で1回だけ読み込んだ by_date（日付 → イベント）を使う（日ごとのDB問い合わせなし）。
+    """
+    first = date.fromisoformat(start)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(days)]
+    
+    def _render_day(day: str) -> bool:
+        label = "本日" if day == start else "この日"
+        values = {
+            **base_values,
+            "today": day,
+            "event_message": build_clean_cards_standalone(day, by_date.get(day, []), missing, label=label),
+        }
+        return write_if_changed(site_dir / f"{day}.html", render_page(values), content_hash(values))
+    
+    # 描画は GIL 下の文字列処理のみでスレッド並列の効果がないため、日ごとに順に生成する
+    written = [_render_day(day) for day in dates]
+    
+    log.info("Day pages: %s ~ %s (%d days) updated=%d", dates[0], dates[-1], days, sum(written))
+    return any(written)
+
+def set_github_output(name: str, value: str) -> None:
+    """GitHub Actions のステップ出力を設定（GITHUB_OUTPUT 未設定のローカル実行では何もしない）"""
+    output_file = os.getenv("GITHUB_OUTPUT")
+    if output_file:
+        with open(output_file, "a", encoding="utf-8") as f:
+            f.write(f"{name}={value}\n")
+
 # create_manual_html() は Ver.3.4.3 で廃止
 # アーカイブ: notify/old/html_export_v3.4.2_with_manual.py
 # 管理画面は Vercel (calendar/src/app/admin/) に移行済み
@@ -718,72 +912,121 @@ def create_html_content(today: str, event_message: str, venue_list: str, data_so
 
 def export_html():
     """Ver.3.1.4: データベース優先・フォールバック対応版HTMLファイル生成"""
+    metrics.start("html_export")
     try:
-        print("[html_export] Starting Ver.3.1.4 HTML generation (with auto-updating weather)...")
+        log.info("Starting Ver.3.1.4 HTML generation (with auto-updating weather)...")
         
         # 今日の日付を取得
         today = determine_today_standalone()
-        print(f"[html_export] Target date: {today}")
+        log.info("Target date: %s", today)
+        
+        # 日別ページの出力日数（1なら従来通り index.html のみ）
+        days = env_int("HTML_EXPORT_DAYS", DEFAULT_EXPORT_DAYS)
+        end = (date.fromisoformat(today) + timedelta(days=days - 1)).isoformat()
+        by_date = None
         
         # データソース・イベント取得（優先度制御）
         data_source = "データベース"
         events = []
         missing = []
         
-        try:
-            # 1. データベース接続を試行（最優先）
-            events, missing = load_events_from_database(today)
-            print(f"[html_export] Database success: {len(events)} events loaded")
+        with metrics.phase("load"):
+            try:
+                # 1. データベース接続を試行（最優先）— 複数日は1回の範囲クエリで取得
+                if days > 1:
+                    by_date = load_event_range_from_database(today, end)
+                    events = by_date.get(today, [])
+                else:
+                    events, missing = load_events_from_database(today)
+                log.info("Database success: %d events loaded", len(events))
             
-        except Exception as db_error:
-            print(f"[html_export] Database failed, falling back to storage: {db_error}")
-            data_source = "ストレージファイル（フォールバック）"
+            except Exception as db_error:
+                log.warn("Database failed, falling back to storage: %s", db_error)
+                data_source = "ストレージファイル（フォールバック）"
             
-            try:
-                # 2. フォールバック：JSONファイル読み込み
-                events, missing = load_events_standalone(today)
-                print(f"[html_export] Storage fallback success: {len(events)} events loaded")
+                try:
+                    # 2. フォールバック：JSONファイル読み込み
+                    if days > 1:
+                        by_date, missing = load_event_range_standalone(today, today, end)
+                        events = by_date.get(today, [])
+                    else:
+                        events, missing = load_events_standalone(today)
+                    log.info("Storage fallback success: %d events loaded", len(events))
                 
-            except Exception as storage_error:
-                print(f"[html_export] Storage fallback also failed: {storage_error}")
-                data_source = "データ取得失敗"
-                events, missing = [], []
-        
-        # メッセージ生成（Ver.1.6: 2行表示対応）
-        event_message = build_clean_cards_standalone(today, events, missing)
-        print(f"[html_export] Generated message: {len(event_message)} characters")
-        
-        # 会場一覧を生成（リンク化・統合処理）
-        venue_list = generate_venue_list()
-        print(f"[html_export] Generated venue list with links")
-        
-        # index.html全体を構築（データソース表示追加）
-        html_content = create_html_content(today, event_message, venue_list, data_source)
-        
-        # site/index.html に保存
-        site_dir = Path(__file__).parent.parent / "site"
-        site_dir.mkdir(exist_ok=True)
-        output_path = site_dir / "index.html"
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        print(f"[html_export] Successfully generated: {output_path}")
-        print(f"[html_export] File size: {len(html_content)} bytes")
-        print(f"[html_export] Events included: {len(events)}")
-        print(f"[html_export] Missing venues: {missing}")
-        print(f"[html_export] Data source: {data_source}")
-        print(f"[html_export] Ver.3.1.4 - Auto-updating weather feature added")
-        print(f"[html_export] Weather updates: Every 30 minutes + on tab activation")
+                except Exception as storage_error:
+                    log.error("Storage fallback also failed: %s", storage_error)
+                    data_source = "データ取得失敗"
+                    events, missing = [], []
+                    by_date = {} if days > 1 else None
+        
+        with metrics.phase("render"):
+            # メッセージ生成（Ver.1.6: 2行表示対応）
+            event_message = build_clean_cards_standalone(today, events, missing)
+            log.info("Generated message: %d characters", len(event_message))
+        
+            # 会場一覧を生成（リンク化・統合処理）
+            venue_list = generate_venue_list()
+            log.debug("Generated venue list with links")
+        
+            # index.html全体を構築（データソース表示追加）
+            values = {
+                "today": today,
+                "current_time": datetime.now(JST).strftime("%Y-%m-%d %H:%M JST"),
+                "data_source": data_source,
+                "event_message": event_message,
+                "venue_list": venue_list,
+            }
+            html_content = render_page(values)
+        
+        with metrics.phase("write"):
+            # site/index.html に保存（最終更新時刻以外が前回と同じなら書き込まない）
+            site_dir = Path(__file__).parent.parent / "site"
+            site_dir.mkdir(exist_ok=True)
+            output_path = site_dir / "index.html"
+        
+            changed = write_if_changed(output_path, html_content, content_hash(values))
+        
+            if changed:
+                log.info("Successfully generated: %s", output_path)
+            else:
+                log.info("Content unchanged, skipped writing: %s", output_path)
+        
+            # site/YYYY-MM-DD.html（HTML_EXPORT_DAYS > 1 の場合・読み込み済みデータから並列生成）
+            if by_date is not None:
+                if export_day_pages(site_dir, today, days, by_date, missing, values):
+                    changed = True
+        
+        set_github_output("changed", "true" if changed else "false")
+        metrics.incr("events_loaded", len(events))
+        metrics.incr("pages_changed", int(changed))
+        log.info("File size: %d bytes", len(html_content))
+        log.info("Events included: %d", len(events))
+        log.info("Missing venues: %s", missing)
+        log.info("Data source: %s", data_source)
+        log.info("Ver.3.1.4 - Auto-updating weather feature added")
+        log.info("Weather updates: Every 30 minutes + on tab activation")
         
         # Ver.3.4.3: manual.html は廃止（Vercel adminに移行済み）
-        print("[html_export] manual.html generation skipped (moved to Vercel)")
+        log.info("manual.html generation skipped (moved to Vercel)")
         
     except Exception as e:
-        print(f"[html_export][ERROR] Critical failure in HTML generation: {e}")
+        log.error("Critical failure in HTML generation: %s", e)
         import traceback
-        traceback.print_exc()
+        log.error(traceback.format_exc().rstrip())
         raise
+    finally:
+        _write_run_report()
+
+def _write_run_report():
+    """utils.metrics のランレポートを書き出す（失敗しても生成結果には影響させない）"""
+    try:
+        report = metrics.build_report()
+        log.info("wall_ms=%s phases=%s", report['wall_ms'], report['phases_ms'])
+        paths = metrics.write_report(report)
+        if paths:
+            log.info("Run report saved: %s %s", paths[0], paths[1])
+    except Exception as e:
+        log.warn("Failed to write run report: %s", e)
 
 def main():
     """メイン実行関数"""
@@ -1,27 +1,23 @@
 # scrapers/best_denki_stadium.py Ver.2.0 + DB投入機能
 import os
-import json
 import time
 import re
-import unicodedata
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from typing import List, Dict
-from pathlib import Path
+from typing import List, Dict, TYPE_CHECKING
 
 import requests
-from bs4 import BeautifulSoup
 
-from utils.parser import split_and_normalize, JST
+from utils.parser import parse_many, JST
+from utils import db_writer, http_cache
+from utils.storage import save_snapshot
+from utils.html import SoupStrainer, make_soup
+from utils.identity import hash_events
+from utils.stages import stage
+from utils.log import get_logger
 
-# Supabase投入用（オプション）
-try:
-    from supabase import create_client, Client
-    from dotenv import load_dotenv
-    load_dotenv()
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 # ---- META / SELECTORS -------------------------------------------------------
 META = {
@@ -35,6 +31,8 @@ URL = META["url"]
 VENUE = META["venue"]
 SCHEMA_VERSION = META["schema_version"]
 
+log = get_logger(META["name"])
+
 SELECTORS = {
     # J1リーグテーブルの行
     "primary": "#j1league table tbody tr",
@@ -46,27 +44,11 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; EventBot/1.0; +https://github.com/your-repo/event_notify)"
 }
 
+# 解析結果キャッシュのキー（parse_schedule_page の出力形式を変えたらバージョンを上げる）
+PARSER_KEY = "best_denki_stadium.schedule.v2"
+
 # ---- UTILS ------------------------------------------------------------------
-def _storage_path(date_str: str, code: str) -> Path:
-    """storage パス生成 - プロジェクト統一方式"""
-    root = Path(__file__).resolve().parents[1]  # repo root (= event_notify/)
-    storage = root / "storage"
-    storage.mkdir(parents=True, exist_ok=True)
-    return storage / f"{date_str}_{code}.json"
-
-def sha1(s: str) -> str:
-    import hashlib
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-def _normalize_for_hash(s: str) -> str:
-    """ハッシュ用正規化: NFKC→引用符統一→空白圧縮→trim"""
-    if s is None:
-        return ""
-    x = unicodedata.normalize("NFKC", s)
-    x = x.replace(""", '"').replace(""", '"').replace("‟", '"').replace("〝", '"').replace("〞", '"')
-    x = x.replace("'", "'").replace("'", "'").replace("＇", "'")
-    x = re.sub(r"\s+", " ", x).strip()
-    return x
+
 
 def resolve_target_date() -> str:
     """環境変数でターゲット日付を上書き可能（YYYY-MM-DD）。未指定ならJST今日"""
@@ -92,56 +74,6 @@ def filter_date_range(items: List[Dict], start_date: str, end_date: str) -> List
     """指定期間内のイベントのみ抽出"""
     return [e for e in items if start_date <= e.get("date", "") <= end_date]
 
-# ---- SUPABASE FUNCTIONS -----------------------------------------------------
-def get_supabase_client() -> Client:
-    """Supabaseクライアントを取得"""
-    if not SUPABASE_AVAILABLE:
-        raise RuntimeError("Supabase依存関係が不足: pip install supabase python-dotenv")
-    
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise RuntimeError("環境変数 SUPABASE_URL, SUPABASE_KEY が設定されていません")
-    
-    return create_client(url, key)
-
-def save_to_supabase(events: List[Dict]) -> None:
-    """イベントデータをSupabaseに保存"""
-    if not events:
-        print(f"[{META['name']}] DB投入: データなし")
-        return
-    
-    try:
-        supabase = get_supabase_client()
-        
-        # JSONからSupabase形式に変換
-        db_records = []
-        for event in events:
-            record = {
-                "date": event.get("date"),
-                "time": event.get("time"),  # NULLも許可
-                "title": event.get("title", ""),
-                "venue": event.get("venue", ""),
-                "source_url": event.get("source", ""),
-                "data_hash": event.get("hash", ""),
-                "event_type": "auto",
-                "notes": event.get("notes")  # NULLも許可
-            }
-            db_records.append(record)
-        
-        # バッチ挿入（重複は無視）
-        result = supabase.table('events').upsert(
-            db_records,
-            on_conflict="data_hash"  # 重複時は無視
-        ).execute()
-        
-        print(f"[{META['name']}] DB投入成功: {len(result.data)}件")
-        
-    except Exception as e:
-        print(f"[{META['name']}][ERROR] DB投入失敗: {e}")
-        # JSON保存は継続（DB失敗は致命的ではない）
-
 # ---- SCRAPING ---------------------------------------------------------------
 
 # スクレイピング対象セクションIDとその大会名
@@ -151,6 +83,9 @@ TARGET_SECTIONS = [
     ("emperorscup", "プレーオフ/天皇杯"),
 ]
 
+# 大会ごとの section 要素だけを部分パースする（id 変更に備えて section はすべて対象）
+SECTION_STRAINER = SoupStrainer("section")
+
 def parse_section_table(section_elem, section_name: str) -> List[Dict]:
     """
     指定セクション要素内のテーブルからベススタ・ホームゲームを抽出する汎用パーサー。
@@ -158,7 +93,7 @@ def parse_section_table(section_elem, section_name: str) -> List[Dict]:
     """
     events = []
     rows = section_elem.select('table tbody tr')
-    print(f"[DEBUG] [{section_name}] Found {len(rows)} rows")
+    log.debug("[%s] Found %d rows", section_name, len(rows))
 
     for i, row in enumerate(rows):
         cells = row.find_all('td')
@@ -195,7 +130,7 @@ def parse_section_table(section_elem, section_name: str) -> List[Dict]:
                     break
 
             if not date_time_text:
-                print(f"[DEBUG] [{section_name}] Row {i+1}: date not found, skip")
+                log.debug("[%s] Row %d: date not found, skip", section_name, i + 1)
                 continue
 
             # --- 対戦相手列 ---
@@ -219,7 +154,7 @@ def parse_section_table(section_elem, section_name: str) -> List[Dict]:
             date_time_clean = re.sub(r'\([^)]*\)', '', date_time_text).strip()
 
             stadium_text = stadium_cell.get_text(strip=True)
-            print(f"[DEBUG] [{section_name}] Hit: {round_label} | {date_time_clean} | vs {opponent} | {stadium_text}")
+            log.debug("[%s] Hit: %s | %s | vs %s | %s", section_name, round_label, date_time_clean, opponent, stadium_text)
 
             events.append({
                 "datetime": date_time_clean,
@@ -230,13 +165,13 @@ def parse_section_table(section_elem, section_name: str) -> List[Dict]:
             })
 
         except Exception as e:
-            print(f"[DEBUG] [{section_name}] Error row {i+1}: {e}")
+            log.debug("[%s] Error row %d: %s", section_name, i + 1, e)
             continue
 
     return events
 
 
-def parse_avispa_all_sections(soup: BeautifulSoup) -> List[Dict]:
+def parse_avispa_all_sections(soup: "BeautifulSoup") -> List[Dict]:
     """
     全大会セクション（J1・ルヴァン・プレーオフ/天皇杯）からベススタ・ホームゲームを収集する。
     """
@@ -245,7 +180,7 @@ def parse_avispa_all_sections(soup: BeautifulSoup) -> List[Dict]:
     for section_id, section_name in TARGET_SECTIONS:
         section_elem = soup.find('section', id=section_id)
         if not section_elem:
-            print(f"[DEBUG] Section '{section_id}' not found, skipping")
+            log.debug("Section '%s' not found, skipping", section_id)
             continue
         found = parse_section_table(section_elem, section_name)
         all_events.extend(found)
@@ -258,107 +193,108 @@ def parse_avispa_all_sections(soup: BeautifulSoup) -> List[Dict]:
             # 新規セクションは念のため全取得（プレーオフラウンドなど id 変更があっても対応）
             found = parse_section_table(section_elem, sid)
             if found:
-                print(f"[DEBUG] Extra section '{sid}': found {len(found)} home games")
+                log.debug("Extra section '%s': found %d home games", sid, len(found))
                 all_events.extend(found)
             seen_ids.add(sid)
 
-    print(f"[DEBUG] Total home games across all sections: {len(all_events)}")
+    log.debug("Total home games across all sections: %d", len(all_events))
     return all_events
 
 
 def fetch_raw_events() -> List[Dict]:
-    """アビスパ福岡公式サイトから全大会の試合情報を取得（全セクション対応版）"""
+    """アビスパ福岡公式サイトから全大会の試合情報を取得（ページ不変なら前回の解析結果を再利用）"""
     try:
-        print(f"[DEBUG] Fetching URL: {URL}")
-        r = requests.get(URL, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        print(f"[DEBUG] HTTP Status: {r.status_code}")
-        print(f"[DEBUG] Content length: {len(r.text)} characters")
-
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        # 全セクション解析（J1・ルヴァン・プレーオフ/天皇杯）
-        events = parse_avispa_all_sections(soup)
-
-        # フォールバック: 全セクションで0件だった場合のみ広範囲検索
-        if not events:
-            print("[DEBUG] Trying fallback table parsing")
-            for table in soup.find_all('table'):
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    row_text = ' '.join([cell.get_text(strip=True) for cell in cells])
-                    if ('ベススタ' in row_text or 'べススタ' in row_text) and \
-                            re.search(r'\d{1,2}/\d{1,2}', row_text) and 'home' in row_text:
-                        date_match = re.search(r'(\d{1,2}/\d{1,2})', row_text)
-                        time_match = re.search(r'(\d{1,2}:\d{2})', row_text)
-                        if date_match and time_match:
-                            events.append({
-                                "datetime": f"{date_match.group(1)} {time_match.group(1)}",
-                                "title": "アビスパ福岡 ホームゲーム",
-                                "raw_text": row_text
-                            })
-
-        return events
+        log.debug("Fetching URL: %s", URL)
+        return http_cache.fetch_parsed(
+            URL,
+            parse_schedule_page,
+            PARSER_KEY,
+            headers=HEADERS,
+            timeout=15,
+            name=META['name'],
+        )
 
     except requests.RequestException as e:
         raise Exception(f"HTTP request failed: {e}")
     except Exception as e:
         raise Exception(f"Parsing failed: {e}")
 
+
+def parse_schedule_page(html: str) -> List[Dict]:
+    """試合日程ページのHTMLから全大会のベススタ・ホームゲームを抽出（全セクション対応版）"""
+    log.debug("Content length: %d characters", len(html))
+
+    # 全セクション解析（J1・ルヴァン・プレーオフ/天皇杯）— section 要素だけを部分パース
+    soup = make_soup(html, parse_only=SECTION_STRAINER)
+    events = parse_avispa_all_sections(soup)
+
+    # フォールバック: 全セクションで0件だった場合のみページ全体をパースして広範囲検索
+    if not events:
+        log.debug("Trying fallback table parsing")
+        soup = make_soup(html)
+        for table in soup.find_all('table'):
+            rows = table.find_all('tr')
+            for row in rows:
+                cells = row.find_all(['td', 'th'])
+                row_text = ' '.join([cell.get_text(strip=True) for cell in cells])
+                if ('ベススタ' in row_text or 'べススタ' in row_text) and \
+                        re.search(r'\d{1,2}/\d{1,2}', row_text) and 'home' in row_text:
+                    date_match = re.search(r'(\d{1,2}/\d{1,2})', row_text)
+                    time_match = re.search(r'(\d{1,2}:\d{2})', row_text)
+                    if date_match and time_match:
+                        events.append({
+                            "datetime": f"{date_match.group(1)} {time_match.group(1)}",
+                            "title": "アビスパ福岡 ホームゲーム",
+                            "raw_text": row_text
+                        })
+
+    return events
+
 # ---- MAIN -------------------------------------------------------------------
-def main():
-    t0 = time.time()
-    
-    target_date = resolve_target_date()
-    
-    print(f"[DEBUG] Starting best_denki_stadium scraper")
-    print(f"[DEBUG] Target date: {target_date}")
-    
-    try:
-        # 1) 全期間データ取得
-        raw = fetch_raw_events()
-        print(f"[DEBUG] Raw events: {len(raw)}")
+def collect_events() -> List[Dict]:
+    """全期間を取得し、重複排除・ソート済みのイベントリストを返す（保存はしない）"""
+    # 1) 全期間データ取得
+    raw = fetch_raw_events()
+    log.debug("Raw events: %d", len(raw))
+    if log.debug_enabled():
         for event in raw:
-            print(f"[DEBUG] Raw: {event}")
-        
-        # 2) 正規化（parser.py を使用）
+            log.debug("Raw: %s", event)
+            log.debug("Normalizing: %s | %s", event['datetime'], event['title'])
+    
+    # 2) 正規化（parser.py を使用）
+    with stage("normalize"):
         normalized: List[Dict] = []
-        for e in raw:
-            print(f"[DEBUG] Normalizing: {e['datetime']} | {e['title']}")
-            # parser.pyのsplit_and_normalizeを使用して日付・時刻を正規化
-            normalized.extend(split_and_normalize(e["datetime"], e["title"], VENUE))
-        
-        print(f"[DEBUG] Normalized events: {len(normalized)}")
+        # parser.pyのparse_manyでまとめて日付・時刻を正規化（同じ日程文字列は1回だけ展開）
+        for parsed in parse_many((e["datetime"], e["title"], VENUE) for e in raw):
+            normalized.extend(parsed)
+    
+    log.debug("Normalized events: %d", len(normalized))
+    if log.debug_enabled():
         for norm_event in normalized:
-            print(f"[DEBUG] Normalized: {norm_event}")
-        
-        # 期間範囲計算（当月1日～翌月末日）
-        start_date, end_date = get_target_date_range()
-        print(f"[{META['name']}] Target range: {start_date} ~ {end_date}")
+            log.debug("Normalized: %s", norm_event)
+    
+    # 期間範囲計算（当月1日～翌月末日）
+    start_date, end_date = get_target_date_range()
+    log.debug("Target range: %s ~ %s", start_date, end_date)
 
-        # 3) 期間フィルタリング（当月1日～翌月末日）
+    # 3) 期間フィルタリング（当月1日～翌月末日）
+    with stage("filter"):
         all_events = filter_date_range(normalized, start_date, end_date)
-        print(f"[DEBUG] After date filtering: {len(all_events)} events")
-        
-        # 4) 重複排除＆メタ付与（全期間データ - Ver.2.0用）
+    log.debug("After date filtering: %d events", len(all_events))
+    
+    # 4) 重複排除＆メタ付与（全期間データ - Ver.2.0用）
+    with stage("dedupe"):
         seen = set()
         out: List[Dict] = []
         extracted_at = datetime.now(JST).isoformat()
-        
-        for it in all_events:
-            title_norm = _normalize_for_hash(it.get("title", ""))
-            venue_norm = _normalize_for_hash(it.get("venue", ""))
-            date_part = it.get("date", "")
-            time_part = it.get("time") or ""
-            
-            key = f"{date_part}|{time_part}|{title_norm}|{venue_norm}"
-            h = sha1(key)
+
+        hashes = hash_events(all_events, profile="legacy")
+        for it, h in zip(all_events, hashes):
             if h in seen:
-                print(f"[DEBUG] Duplicate found, skipping: {key}")
+                log.debug("Duplicate found, skipping: %s %s", it.get("date"), it.get("title"))
                 continue
             seen.add(h)
-            
+
             out.append({
                 "schema_version": SCHEMA_VERSION,
                 **it,
@@ -366,34 +302,54 @@ def main():
                 "hash": h,
                 "extracted_at": extracted_at,
             })
-        
-        # 5) 並び替え（date, time, title）
+    
+    # 5) 並び替え（date, time, title）
+    with stage("sort"):
         def _sort_key(ev: Dict):
             t = ev.get("time")
             tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
             return (ev.get("date", ""), tkey, ev.get("title", ""))
-        
+
         out.sort(key=_sort_key)
+    return out
+
+def main():
+    t0 = time.time()
+    
+    target_date = resolve_target_date()
+    
+    log.debug("Starting best_denki_stadium scraper")
+    log.debug("Target date: %s", target_date)
+    
+    try:
+        out = collect_events()
+        start_date, end_date = get_target_date_range()
         
         # 6) JSON保存（storage/{target_date}_g.json）— Ver.2.0: 全期間データを保存
-        path = _storage_path(target_date, "g")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(out, f, ensure_ascii=False, indent=2)
+        path = save_snapshot(out, target_date, "g")
         
-        # 7) Supabase投入（Ver.2.0用・新機能）
+        # 7) Supabase投入（共有クライアントの書き込みキュー経由）
         db_enabled = os.getenv("ENABLE_DB_SAVE", "0") == "1"
-        if db_enabled and SUPABASE_AVAILABLE:
-            save_to_supabase(out)
+        if db_enabled and db_writer.is_available():
+            db_writer.enqueue(out, META['name'])
+            db_writer.flush(META['name'])
         elif db_enabled:
-            print(f"[{META['name']}] DB投入スキップ: Supabase依存関係不足")
+            log.info("DB投入スキップ: Supabase依存関係不足")
         
         ms = int((time.time() - t0) * 1000)
-        print(f"[{META['name']}] date={target_date} items={len(out)} range={start_date}~{end_date} ms={ms} → {path}")
+        log.info("date=%s items=%d range=%s~%s ms=%s → %s", target_date, len(out), start_date, end_date, ms, path)
         
     except Exception as e:
         msg = str(e).replace("\n", " ").strip()
-        print(f"[{META['name']}][ERROR] msg=\"{msg}\" url=\"{URL}\"")
+        log.error("msg=\"%s\" url=\"%s\"", msg, URL)
         time.sleep(2)
 
 if __name__ == "__main__":
+    # .env読み込み（単体実行時の SUPABASE_URL / SUPABASE_KEY 用・オプション）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
     main()
@@ -1,7 +1,7 @@
 # scrapers/congress_b.py Ver.3.0 — Studio Design CMS API対応
 # 福岡国際会議場（思い出ネーム: コングレスB）
 # 出力：storage/{date}_d.json（schema_version=1.0）
-from utils.marinemesse_api import run_venue_scraper
+from utils.marinemesse_api import collect_venue_events, run_venue_scraper
 
 META = {
     "name": "congress_b",
@@ -13,6 +13,10 @@ META = {
 }
 
 
+def collect_events():
+    return collect_venue_events(META)
+
+
 def main():
     run_venue_scraper(META)
 
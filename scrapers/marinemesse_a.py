@@ -1,6 +1,6 @@
 # scrapers/marinemesse_a.py Ver.3.0 — Studio Design CMS API対応
 # 出力：storage/{date}_a.json（schema_version=1.0）
-from utils.marinemesse_api import run_venue_scraper
+from utils.marinemesse_api import collect_venue_events, run_venue_scraper
 
 META = {
     "name": "marinemesse_a",
@@ -12,6 +12,10 @@ META = {
 }
 
 
+def collect_events():
+    return collect_venue_events(META)
+
+
 def main():
     run_venue_scraper(META)
 
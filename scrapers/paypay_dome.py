@@ -8,27 +8,23 @@ PayPayドーム（野球）スクレイパー Ver.2.0
 """
 
 import os
-import json
 import time
 import re
-import unicodedata
 from datetime import datetime, timedelta
-from typing import List, Dict
-from pathlib import Path
+from typing import List, Dict, TYPE_CHECKING
 
 import requests
-from bs4 import BeautifulSoup
 
 from utils.parser import JST
+from utils import db_writer, http_cache
+from utils.storage import save_snapshot
+from utils.html import make_soup
+from utils.identity import hash_events
+from utils.stages import stage
+from utils.log import get_logger
 
-# Supabase投入用（オプション）
-try:
-    from supabase import create_client, Client
-    from dotenv import load_dotenv
-    load_dotenv()
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 # ---- META / SELECTORS -------------------------------------------------------
 META = {
@@ -43,31 +39,16 @@ BASE_URL = META["url_base"]
 VENUE = META["venue"]
 SCHEMA_VERSION = META["schema_version"]
 
+log = get_logger(META["name"])
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# 解析結果キャッシュのキー（parse_week_page の出力形式を変えたらバージョンを上げる）
+PARSER_KEY = "paypay_dome.week.v2"
+
 # ---- UTILS ------------------------------------------------------------------
-def _storage_path(date_str: str, code: str) -> Path:
-    """Ver.2.0統一ストレージパス"""
-    root = Path(__file__).resolve().parents[1]  # repo root (= event_notify/)
-    storage = root / "storage"
-    storage.mkdir(parents=True, exist_ok=True)
-    return storage / f"{date_str}_{code}.json"
-
-def sha1(s: str) -> str:
-    import hashlib
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-def _normalize_for_hash(s: str) -> str:
-    """ハッシュ用の軽量正規化"""
-    if s is None:
-        return ""
-    x = unicodedata.normalize("NFKC", s)
-    x = x.replace(""", '"').replace(""", '"').replace("‟", '"').replace("〝", '"').replace("〞", '"')
-    x = x.replace("'", "'").replace("'", "'").replace("＇", "'")
-    x = re.sub(r"\s+", " ", x).strip()
-    return x
 
 def resolve_target_date() -> str:
     """環境変数でターゲット日付を上書き可能。未指定ならJST今日"""
@@ -100,55 +81,6 @@ def filter_date_range(items: List[Dict], start_date: str, end_date: str) -> List
     """指定期間内のイベントのみ抽出"""
     return [e for e in items if start_date <= e.get("date", "") <= end_date]
 
-# ---- SUPABASE FUNCTIONS -----------------------------------------------------
-def get_supabase_client() -> Client:
-    """Supabaseクライアントを取得"""
-    if not SUPABASE_AVAILABLE:
-        raise RuntimeError("Supabase依存関係が不足: pip install supabase python-dotenv")
-    
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise RuntimeError("環境変数 SUPABASE_URL, SUPABASE_KEY が設定されていません")
-    
-    return create_client(url, key)
-
-def save_to_supabase(events: List[Dict]) -> None:
-    """イベントデータをSupabaseに保存"""
-    if not events:
-        print(f"[{META['name']}] DB投入: データなし")
-        return
-    
-    try:
-        supabase = get_supabase_client()
-        
-        # JSONからSupabase形式に変換
-        db_records = []
-        for event in events:
-            record = {
-                "date": event.get("date"),
-                "time": event.get("time"),  # NULLも許可
-                "title": event.get("title", ""),
-                "venue": event.get("venue", ""),
-                "source_url": event.get("source", ""),
-                "data_hash": event.get("hash", ""),
-                "event_type": "auto",
-                "notes": f"game_status: {event.get('game_status', '')}, score: {event.get('score', '')}"
-            }
-            db_records.append(record)
-        
-        # バッチ挿入（重複は無視）
-        result = supabase.table('events').upsert(
-            db_records,
-            on_conflict="data_hash"
-        ).execute()
-        
-        print(f"[{META['name']}] DB投入成功: {len(result.data)}件")
-        
-    except Exception as e:
-        print(f"[{META['name']}][ERROR] DB投入失敗: {e}")
-
 # ---- WEEKLY BASEBALL SCRAPING -----------------------------------------------
 def get_monday_of_week(target_date: datetime) -> datetime:
     """指定日を含む週の月曜日を取得"""
@@ -161,7 +93,7 @@ def fetch_multi_week_baseball(weeks_ahead: int = 8) -> List[Dict]:
     all_games = []
     base_date = datetime.now(JST)
     
-    print(f"[{META['name']}] Fetching {weeks_ahead + 1} weeks of baseball games...")
+    log.info("Fetching %s weeks of baseball games...", weeks_ahead + 1)
     
     # 今週の月曜日を起点として計算
     base_monday = get_monday_of_week(base_date)
@@ -171,7 +103,7 @@ def fetch_multi_week_baseball(weeks_ahead: int = 8) -> List[Dict]:
         url = f"{BASE_URL}?date={target_monday.strftime('%Y-%m-%d')}"
         
         try:
-            print(f"[{META['name']}] Week {week}: {target_monday.strftime('%Y-%m-%d')} (Monday) -> {url}")
+            log.info("Week %s: %s (Monday) -> %s", week, target_monday.strftime('%Y-%m-%d'), url)
             week_games = scrape_week_games(url, target_monday)
             all_games.extend(week_games)
             
@@ -180,54 +112,69 @@ def fetch_multi_week_baseball(weeks_ahead: int = 8) -> List[Dict]:
                 time.sleep(1)
                 
         except Exception as e:
-            print(f"[{META['name']}] Failed week {week} ({target_monday.strftime('%Y-%m-%d')}): {e}")
+            log.warn("Failed week %s (%s): %s", week, target_monday.strftime('%Y-%m-%d'), e)
             continue
     
     return all_games
 
 def scrape_week_games(url: str, monday_date: datetime) -> List[Dict]:
-    """指定URLから1週間分の試合データを取得"""
+    """指定URLから1週間分の試合データを取得（ページ不変なら前回の解析結果を再利用）"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        
-        games = []
-        
-        # その週の全ての日付を生成（月曜～日曜）
-        week_dates = []
-        for i in range(7):
-            date = monday_date + timedelta(days=i)
-            week_dates.append({
-                "date": date,
-                "japanese": format_japanese_date(date),
-                "iso": date.strftime("%Y-%m-%d")
-            })
-        
-        # 各日付について試合を検索
-        for date_info in week_dates:
-            daily_games = find_games_for_date(soup, date_info)
-            games.extend(daily_games)
-        
-        print(f"[{META['name']}] Week {monday_date.strftime('%Y-%m-%d')}: found {len(games)} Hawks games")
+        games = http_cache.fetch_parsed(
+            url,
+            lambda html: parse_week_page(html, monday_date),
+            PARSER_KEY,
+            headers=HEADERS,
+            timeout=15,
+            name=META['name'],
+        )
+        log.info("Week %s: found %d Hawks games", monday_date.strftime('%Y-%m-%d'), len(games))
         return games
         
     except Exception as e:
-        print(f"[{META['name']}] Error scraping {url}: {e}")
+        log.warn("Error scraping %s: %s", url, e)
         return []
 
+def parse_week_page(html: str, monday_date: datetime) -> List[Dict]:
+    """週別スケジュールページのHTMLから1週間分のホークス主催試合を抽出"""
+    # 日付ヘッダーの兄弟要素をたどるためページ全体が必要（部分パースはしない）
+    soup = make_soup(html)
+    
+    games = []
+    
+    # その週の全ての日付を生成（月曜～日曜）
+    week_dates = []
+    for i in range(7):
+        date = monday_date + timedelta(days=i)
+        week_dates.append({
+            "date": date,
+            "japanese": format_japanese_date(date),
+            "iso": date.strftime("%Y-%m-%d")
+        })
+    
+    # 日付ヘッダーの索引をページ1回の走査で作り、各日付はそこから引く
+    header_index = build_date_header_index(soup)
+    for date_info in week_dates:
+        daily_games = find_games_for_date(soup, date_info, header_index)
+        games.extend(daily_games)
+    
+    return games
+
 def format_japanese_date(dt: datetime) -> str:
     """datetime を日本語日付形式に変換 2025-09-18 -> 9月18日"""
     return f"{dt.month}月{dt.day}日"
 
-def find_games_for_date(soup: BeautifulSoup, date_info: dict) -> List[Dict]:
-    """指定日付のソフトバンク戦を検索"""
+def find_games_for_date(soup: "BeautifulSoup", date_info: dict, header_index: Dict = None) -> List[Dict]:
+    """指定日付のソフトバンク戦を検索（header_index があれば索引から、なければページを走査）"""
     games = []
     japanese_date = date_info["japanese"]
     iso_date = date_info["iso"]
     
     # 日付ヘッダーを探す（thまたはh2）
-    date_header = find_date_header(soup, japanese_date)
+    if header_index is not None:
+        date_header = header_index.get(japanese_date)
+    else:
+        date_header = find_date_header(soup, japanese_date)
     if not date_header:
         return games
     
@@ -239,7 +186,28 @@ def find_games_for_date(soup: BeautifulSoup, date_info: dict) -> List[Dict]:
     
     return games
 
-def find_date_header(soup: BeautifulSoup, japanese_date: str):
+_JP_DATE_RE = re.compile(r'(\d{1,2})月(\d{1,2})日')
+
+def build_date_header_index(soup: "BeautifulSoup") -> Dict[str, object]:
+    """
+    th / h2 / h3 を1回だけ走査し、「M月D日」→ 日付ヘッダー要素 の索引を作る。
+    find_date_header と同じく th > h2 > h3 の優先順で、同じタグ内では文書順で最初の要素を採用。
+    """
+    by_tag = {"th": {}, "h2": {}, "h3": {}}
+    for el in soup.find_all(["th", "h2", "h3"]):
+        text = el.string
+        if not text:
+            continue
+        found = by_tag[el.name]
+        for m in _JP_DATE_RE.finditer(text):
+            found.setdefault(f"{int(m.group(1))}月{int(m.group(2))}日", el)
+    
+    index = {}
+    for tag in ("h3", "h2", "th"):  # 優先度の高いタグで上書き
+        index.update(by_tag[tag])
+    return index
+
+def find_date_header(soup: "BeautifulSoup", japanese_date: str):
     """指定日付のヘッダーを探す"""
     # th要素で探す（テーブル内のヘッダー）
     th_headers = soup.find_all('th', string=lambda text: text and japanese_date in text)
@@ -381,41 +349,31 @@ def parse_game_row(row, iso_date: str) -> Dict:
     }
 
 # ---- MAIN -------------------------------------------------------------------
-def main():
-    t0 = time.time()
+def collect_events() -> List[Dict]:
+    """8週分を取得し、重複排除・ソート済みのイベントリストを返す（保存はしない）"""
+    # 1) 8週分の野球試合取得（全期間データ）
+    all_games = fetch_multi_week_baseball()
     
-    target_date = resolve_target_date()
+    # 2) 期間範囲計算（当月1日～翌月末日）
+    start_date, end_date = get_target_date_range()
+    log.debug("Target range: %s ~ %s", start_date, end_date)
     
-    try:
-        print(f"[{META['name']}] target_date={target_date}")
-        
-        # 1) 8週分の野球試合取得（全期間データ）
-        all_games = fetch_multi_week_baseball()
-        
-        # 2) 期間範囲計算（当月1日～翌月末日）
-        start_date, end_date = get_target_date_range()
-        print(f"[{META['name']}] Target range: {start_date} ~ {end_date}")
-        
-        # 3) 期間フィルタリング（Ver.2.0用）
+    # 3) 期間フィルタリング（Ver.2.0用）
+    with stage("filter"):
         filtered_games = filter_date_range(all_games, start_date, end_date)
-        
-        # 4) 重複排除＆メタ付与
+    
+    # 4) 重複排除＆メタ付与
+    with stage("dedupe"):
         seen = set()
         out: List[Dict] = []
         extracted_at = datetime.now(JST).isoformat()
-        
-        for it in filtered_games:
-            title_norm = _normalize_for_hash(it.get("title", ""))
-            venue_norm = _normalize_for_hash(it.get("venue", ""))
-            date_part = it.get("date", "")
-            time_part = it.get("time") or ""
-            
-            key = f"{date_part}|{title_norm}|{venue_norm}"
-            h = sha1(key)
+
+        hashes = hash_events(filtered_games, profile="legacy", include_time=False)
+        for it, h in zip(filtered_games, hashes):
             if h in seen:
                 continue
             seen.add(h)
-            
+
             out.append({
                 "schema_version": SCHEMA_VERSION,
                 **it,
@@ -423,41 +381,60 @@ def main():
                 "hash": h,
                 "extracted_at": extracted_at,
             })
-        
-        # 5) 並び替え（date, time, title）
+    
+    # 5) 並び替え（date, time, title）
+    with stage("sort"):
         def _sort_key(ev: Dict):
             t = ev.get("time")
             tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
             return (ev.get("date", ""), tkey, ev.get("title", ""))
-        
+
         out.sort(key=_sort_key)
+    return out
+
+def main():
+    t0 = time.time()
+    
+    target_date = resolve_target_date()
+    
+    try:
+        log.info("target_date=%s", target_date)
+        
+        out = collect_events()
+        start_date, end_date = get_target_date_range()
         
         # 6) JSON保存（storage/{target_date}_f.json）— Ver.2.0: 全期間データを保存
-        path = _storage_path(target_date, "f")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(out, f, ensure_ascii=False, indent=2)
+        path = save_snapshot(out, target_date, "f")
         
-        # 7) Supabase投入（Ver.2.0用・新機能）
+        # 7) Supabase投入（共有クライアントの書き込みキュー経由）
         db_enabled = os.getenv("ENABLE_DB_SAVE", "0") == "1"
-        if db_enabled and SUPABASE_AVAILABLE:
-            save_to_supabase(out)
+        if db_enabled and db_writer.is_available():
+            db_writer.enqueue(out, META['name'])
+            db_writer.flush(META['name'])
         elif db_enabled:
-            print(f"[{META['name']}] DB投入スキップ: Supabase依存関係不足")
+            log.info("DB投入スキップ: Supabase依存関係不足")
         
         ms = int((time.time() - t0) * 1000)
-        print(f"[{META['name']}] date={target_date} items={len(out)} range={start_date}~{end_date} weeks=9 ms={ms} → {path}")
+        log.info("date=%s items=%d range=%s~%s weeks=9 ms=%s → %s", target_date, len(out), start_date, end_date, ms, path)
         
     except requests.RequestException as e:
-        print(f"[{META['name']}][ERROR] Network error: {e}")
+        log.error("Network error: %s", e)
     except Exception as e:
         msg = str(e).replace("\n", " ").strip()
-        print(f"[{META['name']}][ERROR] msg=\"{msg}\" url=\"{BASE_URL}\"")
+        log.error("msg=\"%s\" url=\"%s\"", msg, BASE_URL)
 
 if __name__ == "__main__":
+    # .env読み込み（単体実行時の SUPABASE_URL / SUPABASE_KEY 用・オプション）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
     try:
         main()
     except KeyboardInterrupt:
-        print(f"[{META['name']}] Interrupted by user")
+        log.info("Interrupted by user")
     except Exception as e:
-        print(f"[{META['name']}][ERROR] Unexpected error: {e}")
+        log.error("Unexpected error: %s", e)
         time.sleep(1)
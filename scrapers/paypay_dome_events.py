@@ -1,28 +1,21 @@
 ﻿# scrapers/paypay_dome_events.py Ver.2.0 + 年跨ぎ対応 + DB投入機能
 import os
-import json
 import time
 import re
-import unicodedata
 from datetime import datetime, timezone, timedelta
 from dateutil.relativedelta import relativedelta
 from typing import List, Dict
-from pathlib import Path
 
 import requests
-from bs4 import BeautifulSoup
 
 # parser.pyから必要な機能をインポート
 from utils.parser import split_and_normalize, JST
-
-# Supabase投入用（オプション）
-try:
-    from supabase import create_client, Client
-    from dotenv import load_dotenv
-    load_dotenv()
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+from utils import db_writer, http_cache
+from utils.storage import save_snapshot
+from utils.html import SoupStrainer, make_soup
+from utils.identity import hash_events
+from utils.stages import stage
+from utils.log import get_logger
 
 # ---- META / SELECTORS -------------------------------------------------------
 META = {
@@ -35,37 +28,19 @@ META = {
 VENUE = META["venue"]
 SCHEMA_VERSION = META["schema_version"]
 
+log = get_logger(META["name"])
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; EventBot/1.0; +https://example.com/contact)"
 }
 
+# 解析結果キャッシュのキー（parse_year_page の出力形式を変えたらバージョンを上げる）
+PARSER_KEY = "paypay_dome_events.year.v2"
+
+# 年間カレンダー本体（dl.temp_calendarList）だけを部分パースする
+CALENDAR_STRAINER = SoupStrainer("dl", class_="temp_calendarList")
+
 # ---- UTILS ------------------------------------------------------------------
-def _storage_path(date_str: str, code: str) -> Path:
-    """共通のストレージパス生成（他のスクレイパーと統一）"""
-    root = Path(__file__).resolve().parents[1]  # repo root (= event_notify/)
-    storage = root / "storage"
-    storage.mkdir(parents=True, exist_ok=True)
-    return storage / f"{date_str}_{code}.json"
-
-def sha1(s: str) -> str:
-    import hashlib
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-def _normalize_for_hash(s: str) -> str:
-    """
-    ハッシュ用の軽量正規化：
-      - NFKCで全角/半角を統一
-      - 引用符ゆれを統一
-      - 連続空白を1つに圧縮
-      - 前後空白削除
-    """
-    if s is None:
-        return ""
-    x = unicodedata.normalize("NFKC", s)
-    x = x.replace(""", '"').replace(""", '"').replace("‟", '"').replace("〝", '"').replace("〞", '"')
-    x = x.replace("'", "'").replace("'", "'").replace("＇", "'")
-    x = re.sub(r"\s+", " ", x).strip()
-    return x
 
 def resolve_target_date() -> str:
     """環境変数でターゲット日付を上書き可能（YYYY-MM-DD）。未指定ならJST今日"""
@@ -91,56 +66,6 @@ def filter_date_range(items: List[Dict], start_date: str, end_date: str) -> List
     """指定期間内のイベントのみ抽出"""
     return [e for e in items if start_date <= e.get("date", "") <= end_date]
 
-# ---- SUPABASE FUNCTIONS -----------------------------------------------------
-def get_supabase_client() -> Client:
-    """Supabaseクライアントを取得"""
-    if not SUPABASE_AVAILABLE:
-        raise RuntimeError("Supabase依存関係が不足: pip install supabase python-dotenv")
-    
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise RuntimeError("環境変数 SUPABASE_URL, SUPABASE_KEY が設定されていません")
-    
-    return create_client(url, key)
-
-def save_to_supabase(events: List[Dict]) -> None:
-    """イベントデータをSupabaseに保存"""
-    if not events:
-        print(f"[{META['name']}] DB投入: データなし")
-        return
-    
-    try:
-        supabase = get_supabase_client()
-        
-        # JSONからSupabase形式に変換
-        db_records = []
-        for event in events:
-            record = {
-                "date": event.get("date"),
-                "time": event.get("time"),  # NULLも許可
-                "title": event.get("title", ""),
-                "venue": event.get("venue", ""),
-                "source_url": event.get("source", ""),
-                "data_hash": event.get("hash", ""),
-                "event_type": "auto",
-                "notes": event.get("notes")  # NULLも許可
-            }
-            db_records.append(record)
-        
-        # バッチ挿入（重複は無視）
-        result = supabase.table('events').upsert(
-            db_records,
-            on_conflict="data_hash"  # 重複時は無視
-        ).execute()
-        
-        print(f"[{META['name']}] DB投入成功: {len(result.data)}件")
-        
-    except Exception as e:
-        print(f"[{META['name']}][ERROR] DB投入失敗: {e}")
-        # JSON保存は継続（DB失敗は致命的ではない）
-
 def parse_paypay_date(date_str: str) -> str:
     """
     "2025/9/13（土）" → "2025-09-13"
@@ -194,125 +119,122 @@ def extract_event_title(title_str: str) -> str:
 
 # ---- SCRAPING ---------------------------------------------------------------
 def fetch_year_events(url: str, year: int) -> List[Dict]:
-    """指定年のPayPayドームイベント情報を取得"""
+    """指定年のPayPayドームイベント情報を取得（ページ不変なら前回の解析結果を再利用）"""
     try:
-        print(f"[{META['name']}] Fetching {year} from {url}")
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        log.debug("Fetching %s from %s", year, url)
+        return http_cache.fetch_parsed(
+            url,
+            lambda html: parse_year_page(html, year),
+            PARSER_KEY,
+            headers=HEADERS,
+            timeout=15,
+            name=META['name'],
+        )
+        
+    except requests.RequestException as e:
+        log.warn("Failed to fetch %s: HTTP error: %s", year, e)
+        return []
+    except Exception as e:
+        log.warn("Failed to fetch %s: %s", year, e)
+        import traceback
+        log.debug(traceback.format_exc)
+        return []
 
-        print(f"[DEBUG] HTTP Status: {r.status_code}")
-        print(f"[DEBUG] Content length: {len(r.text)}")
+def parse_year_page(html: str, year: int) -> List[Dict]:
+    """年間イベントカレンダーページのHTMLからイベント情報を抽出"""
+    soup = make_soup(html, parse_only=CALENDAR_STRAINER)
+    log.debug("Content length: %d", len(html))
+    
+    events = []
+    
+    # 正しいHTML構造に基づく抽出
+    calendar_lists = soup.find_all('dl', class_='temp_calendarList')
+    log.debug("Found %d calendar lists for %d", len(calendar_lists), year)
+    
+    for calendar_idx, calendar in enumerate(calendar_lists):
+        log.debug("===== Calendar List %d =====", calendar_idx + 1)
         
-        events = []
+        # dt（日付）とdd（詳細）のペアを処理
+        dt_elements = calendar.find_all('dt')
+        dd_elements = calendar.find_all('dd')
         
-        # 正しいHTML構造に基づく抽出
-        calendar_lists = soup.find_all('dl', class_='temp_calendarList')
-        print(f"[DEBUG] Found {len(calendar_lists)} calendar lists for {year}")
+        log.debug("Found %d dates and %d details", len(dt_elements), len(dd_elements))
         
-        for calendar_idx, calendar in enumerate(calendar_lists):
-            print(f"\n[DEBUG] ===== Calendar List {calendar_idx + 1} =====")
+        # dtとddのペアを処理
+        for pair_idx, (dt, dd) in enumerate(zip(dt_elements, dd_elements)):
+            date_text = dt.get_text().strip()
+            log.debug("----- Pair %d: %s -----", pair_idx + 1, date_text)
             
-            # dt（日付）とdd（詳細）のペアを処理
-            dt_elements = calendar.find_all('dt')
-            dd_elements = calendar.find_all('dd')
+            # 日付パターンの確認
+            if not re.match(r'\d{4}/\d{1,2}/\d{1,2}（.+）', date_text):
+                log.debug("[SKIP] Date pattern not matched: %s", date_text)
+                continue
+            log.debug("[OK] Date pattern matched")
             
-            print(f"[DEBUG] Found {len(dt_elements)} dates and {len(dd_elements)} details")
+            # table内からイベント情報を抽出
+            table = dd.find('table')
+            if not table:
+                log.debug("[SKIP] No table found")
+                log.debug(lambda: f"DD HTML preview: {str(dd)[:200]}...")
+                continue
+            log.debug("[OK] Table found")
             
-            # dtとddのペアを処理
-            for pair_idx, (dt, dd) in enumerate(zip(dt_elements, dd_elements)):
-                date_text = dt.get_text().strip()
-                print(f"\n[DEBUG] ----- Pair {pair_idx + 1}: {date_text} -----")
-                
-                # 日付パターンの確認
-                if not re.match(r'\d{4}/\d{1,2}/\d{1,2}（.+）', date_text):
-                    print(f"[DEBUG] [SKIP] Date pattern not matched: {date_text}")
-                    continue
-                else:
-                    print(f"[DEBUG] [OK] Date pattern matched")
+            event_title = None
+            event_time = None
+            
+            # tableの行を解析
+            rows = table.find_all('tr')
+            log.debug("Table has %d rows", len(rows))
+            
+            for row_idx, row in enumerate(rows):
+                th = row.find('th')
+                td = row.find('td')
                 
-                # table内からイベント情報を抽出
-                table = dd.find('table')
-                if not table:
-                    print(f"[DEBUG] [SKIP] No table found")
-                    print(f"[DEBUG] DD HTML preview: {str(dd)[:200]}...")
+                if not th or not td:
+                    log.debug("  Row %d: Missing th or td", row_idx)
                     continue
-                else:
-                    print(f"[DEBUG] [OK] Table found")
                 
-                event_title = None
-                event_time = None
+                th_text = th.get_text().strip()
+                td_text = td.get_text().strip()
                 
-                # tableの行を解析
-                rows = table.find_all('tr')
-                print(f"[DEBUG] Table has {len(rows)} rows")
+                log.debug("  Row %d: th='%s', td preview='%s...'", row_idx, th_text, td_text[:50])
                 
-                for row_idx, row in enumerate(rows):
-                    th = row.find('th')
-                    td = row.find('td')
-                    
-                    if not th or not td:
-                        print(f"[DEBUG]   Row {row_idx}: Missing th or td")
-                        continue
-                    
-                    th_text = th.get_text().strip()
-                    td_text = td.get_text().strip()
-                    
-                    print(f"[DEBUG]   Row {row_idx}: th='{th_text}', td preview='{td_text[:50]}...'")
-                    
-                    if th_text == 'イベント':
-                        print(f"[DEBUG]   *** Found 'Event' row ***")
-                        print(f"[DEBUG]   TD full HTML:")
-                        print(td.prettify()[:500])
-                        
-                        # aタグの確認
+                if th_text == 'イベント':
+                    # 調査用の詳細出力（DEBUG時のみ: prettify や a/span の列挙は重いので通常は実行しない）
+                    if log.debug_enabled():
+                        log.debug("  *** Found 'Event' row ***")
+                        log.debug("  TD full HTML:\n%s", td.prettify()[:500])
                         links = td.find_all('a')
-                        print(f"[DEBUG]   Found {len(links)} <a> tags:")
+                        log.debug("  Found %d <a> tags:", len(links))
                         for i, link in enumerate(links):
-                            link_class = link.get('class', [])
-                            link_text = link.get_text().strip()
-                            print(f"[DEBUG]     Link {i}: class={link_class}, text='{link_text}'")
-                        
-                        # spanタグの確認
+                            log.debug("    Link %d: class=%s, text='%s'", i, link.get('class', []), link.get_text().strip())
                         spans = td.find_all('span')
-                        print(f"[DEBUG]   Found {len(spans)} <span> tags:")
+                        log.debug("  Found %d <span> tags:", len(spans))
                         for i, span in enumerate(spans):
-                            span_text = span.get_text().strip()
-                            print(f"[DEBUG]     Span {i}: text='{span_text}'")
-                        
-                        # 既存のロジック
-                        span = td.find('span')
-                        event_title = span.get_text().strip() if span else td_text
-                        print(f"[DEBUG]   Extracted title: '{event_title}'")
-                        
-                    elif th_text in ['開催時間', '開演時間']:
-                        event_time = td_text
-                        print(f"[DEBUG]   Extracted time: '{event_time}'")
-                
-                if event_title:
-                    print(f"[DEBUG] [SUCCESS] EVENT FOUND: {date_text} | {event_title} | {event_time}")
-                    events.append({
-                        "date_raw": date_text,
-                        "title_raw": event_title,
-                        "time_raw": event_time or "",
-                        "source_year": year
-                    })
-                else:
-                    print(f"[DEBUG] [SKIP] No event title found for this date")
-        
-        print(f"\n[DEBUG] ========================================")
-        print(f"[DEBUG] Total events extracted from {year}: {len(events)}")
-        print(f"[DEBUG] ========================================\n")
-        return events
-        
-    except requests.RequestException as e:
-        print(f"[{META['name']}] Failed to fetch {year}: HTTP error: {e}")
-        return []
-    except Exception as e:
-        print(f"[{META['name']}] Failed to fetch {year}: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+                            log.debug("    Span %d: text='%s'", i, span.get_text().strip())
+                    
+                    # 既存のロジック
+                    span = td.find('span')
+                    event_title = span.get_text().strip() if span else td_text
+                    log.debug("  Extracted title: '%s'", event_title)
+                    
+                elif th_text in ['開催時間', '開演時間']:
+                    event_time = td_text
+                    log.debug("  Extracted time: '%s'", event_time)
+            
+            if event_title:
+                log.debug("[SUCCESS] EVENT FOUND: %s | %s | %s", date_text, event_title, event_time)
+                events.append({
+                    "date_raw": date_text,
+                    "title_raw": event_title,
+                    "time_raw": event_time or "",
+                    "source_year": year
+                })
+            else:
+                log.debug("[SKIP] No event title found for this date")
+    
+    log.info("Total events extracted from %d: %d", year, len(events))
+    return events
 
 def fetch_multi_year_events() -> List[Dict]:
     """年跨ぎ対応: 必要に応じて複数年のイベント情報を取得"""
@@ -322,7 +244,7 @@ def fetch_multi_year_events() -> List[Dict]:
     start_year = int(start_date[:4])
     end_year = int(end_date[:4])
     
-    print(f"[{META['name']}] Target range: {start_date} ~ {end_date} (years: {start_year}~{end_year})")
+    log.debug("Target range: %s ~ %s (years: %s~%s)", start_date, end_date, start_year, end_year)
     
     all_events = []
     
@@ -361,85 +283,95 @@ def normalize_events(raw_events: List[Dict]) -> List[Dict]:
     return normalized
 
 # ---- MAIN -------------------------------------------------------------------
-def main():
-    t0 = time.time()
-
-    target_date = resolve_target_date()
-    
-    print(f"[{META['name']}] target_date={target_date}")
-
+def collect_events() -> List[Dict]:
+    """全期間を取得し、重複排除・ソート済みのイベントリストを返す（保存はしない）"""
     # 1) 全期間データ取得（年跨ぎ対応）
     raw = fetch_multi_year_events()
-    print(f"[{META['name']}] scraped {len(raw)} total events")
+    log.debug("scraped %d total events", len(raw))
 
     # 2) 正規化
-    normalized = normalize_events(raw)
-    print(f"[{META['name']}] normalized to {len(normalized)} events")
+    with stage("normalize"):
+        normalized = normalize_events(raw)
+    log.debug("normalized to %d events", len(normalized))
 
     # 期間範囲計算（当月1日～翌月末日）
     start_date, end_date = get_target_date_range()
-    print(f"[{META['name']}] Target range: {start_date} ~ {end_date}")
+    log.debug("Target range: %s ~ %s", start_date, end_date)
 
     # 3) 期間フィルタリング（当月1日～翌月末日）
-    items = filter_date_range(normalized, start_date, end_date)
-    print(f"[{META['name']}] filtered to {len(items)} events for {start_date} ~ {end_date}")
+    with stage("filter"):
+        items = filter_date_range(normalized, start_date, end_date)
+    log.info("filtered to %d events for %s ~ %s", len(items), start_date, end_date)
 
     # 4) 重複排除＆メタ付与（全期間データ - Ver.2.0用）
-    seen = set()
-    out: List[Dict] = []
-    extracted_at = datetime.now(JST).isoformat()
-
-    for it in items:
-        title_norm = _normalize_for_hash(it.get("title", ""))
-        venue_norm = _normalize_for_hash(it.get("venue", ""))
-        date_part = it.get("date", "")
-        time_part = it.get("time") or ""
-
-        key = f"{date_part}|{time_part}|{title_norm}|{venue_norm}"
-        h = sha1(key)
-        if h in seen:
-            continue
-        seen.add(h)
-
-        # 年跨ぎ対応でsource URLを動的生成
-        event_year = int(date_part[:4])
-        source_url = META["url_template"].format(year=event_year)
-
-        out.append({
-            "schema_version": SCHEMA_VERSION,
-            **it,
-            "source": source_url,
-            "hash": h,
-            "extracted_at": extracted_at,
-        })
+    with stage("dedupe"):
+        seen = set()
+        out: List[Dict] = []
+        extracted_at = datetime.now(JST).isoformat()
+
+        hashes = hash_events(items, profile="legacy")
+        for it, h in zip(items, hashes):
+            if h in seen:
+                continue
+            seen.add(h)
+
+            # 年跨ぎ対応でsource URLを動的生成
+            event_year = int(it.get("date", "")[:4])
+            source_url = META["url_template"].format(year=event_year)
+
+            out.append({
+                "schema_version": SCHEMA_VERSION,
+                **it,
+                "source": source_url,
+                "hash": h,
+                "extracted_at": extracted_at,
+            })
 
     # 5) 並び替え
-    def _sort_key(ev: Dict):
-        t = ev.get("time")
-        tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
-        return (ev.get("date", ""), tkey, ev.get("title", ""))
+    with stage("sort"):
+        def _sort_key(ev: Dict):
+            t = ev.get("time")
+            tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
+            return (ev.get("date", ""), tkey, ev.get("title", ""))
+
+        out.sort(key=_sort_key)
+    return out
+
+def main():
+    t0 = time.time()
+
+    target_date = resolve_target_date()
+    
+    log.info("target_date=%s", target_date)
 
-    out.sort(key=_sort_key)
+    out = collect_events()
+    start_date, end_date = get_target_date_range()
 
     # 6) JSON保存（storage/{target_date}_f_event.json）— Ver.2.0: 全期間データを保存
-    path = _storage_path(target_date, "f_event")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    path = save_snapshot(out, target_date, "f_event")
 
-    # 7) Supabase投入（Ver.2.0用・新機能）
+    # 7) Supabase投入（共有クライアントの書き込みキュー経由）
     db_enabled = os.getenv("ENABLE_DB_SAVE", "0") == "1"
-    if db_enabled and SUPABASE_AVAILABLE:
-        save_to_supabase(out)
+    if db_enabled and db_writer.is_available():
+        db_writer.enqueue(out, META['name'])
+        db_writer.flush(META['name'])
     elif db_enabled:
-        print(f"[{META['name']}] DB投入スキップ: Supabase依存関係不足")
+        log.info("DB投入スキップ: Supabase依存関係不足")
 
     ms = int((time.time() - t0) * 1000)
-    print(f"[{META['name']}] date={target_date} items={len(out)} range={start_date}~{end_date} ms={ms} → {path}")
+    log.info("date=%s items=%d range=%s~%s ms=%s → %s", target_date, len(out), start_date, end_date, ms, path)
 
 if __name__ == "__main__":
+    # .env読み込み（単体実行時の SUPABASE_URL / SUPABASE_KEY 用・オプション）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
     try:
         main()
     except Exception as e:
         msg = str(e).replace("\n", " ").strip()
-        print(f"[{META['name']}][ERROR] msg=\"{msg}\"")
+        log.error("msg=\"%s\"", msg)
         time.sleep(1)
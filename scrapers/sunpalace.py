@@ -2,27 +2,20 @@
 import os
 import re
 import sys
-import json
 import time
-import hashlib
 import unicodedata
 import requests
 from datetime import datetime, timezone, timedelta
 from dateutil.relativedelta import relativedelta
 from typing import List, Dict, Any, Optional
-from pathlib import Path
-from bs4 import BeautifulSoup
 
 from utils.parser import JST
-
-# Supabase投入用（オプション）
-try:
-    from supabase import create_client, Client
-    from dotenv import load_dotenv
-    load_dotenv()
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+from utils import db_writer, http_cache
+from utils.storage import save_snapshot
+from utils.html import SoupStrainer, make_soup
+from utils.identity import hash_events
+from utils.stages import stage
+from utils.log import get_logger
 
 # --- 設定 ---------------------------------------------------------------
 META = {
@@ -37,22 +30,23 @@ VENUE_CODE = META["code"]
 SCHEMA_VERSION = META["schema_version"]
 BASE_URL = META["base_url"]
 
+log = get_logger(META["name"])
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
+# 解析結果キャッシュのキー（parse_month_page の出力形式を変えたらバージョンを上げる）
+PARSER_KEY = "sunpalace.month.v2"
+
+# スケジュール一覧（ul.schedule_table）だけを部分パースする
+SCHEDULE_STRAINER = SoupStrainer("ul", class_="schedule_table")
+
 # 開演時刻を抽出する正規表現（「開演HH:MM」「開演★HH:MM」など）
 _TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
 
 # --- ユーティリティ ------------------------------------------------------
-def _storage_path(date_str: str, code: str) -> Path:
-    """共通のストレージパス生成（他のスクレイパーと統一）"""
-    root = Path(__file__).resolve().parents[1]  # repo root (= event_notify/)
-    storage = root / "storage"
-    storage.mkdir(parents=True, exist_ok=True)
-    return storage / f"{date_str}_{code}.json"
-
 
 def resolve_target_date() -> str:
     """環境変数でターゲット日付を上書き可能（YYYY-MM-DD）。未指定ならJST今日"""
@@ -76,22 +70,6 @@ def filter_date_range(items: List[Dict], start_date: str, end_date: str) -> List
     return [e for e in items if start_date <= e.get("date", "") <= end_date]
 
 
-def _normalize_for_hash(s: str) -> str:
-    """ハッシュ用の軽量正規化"""
-    if s is None:
-        return ""
-    x = unicodedata.normalize("NFKC", s)
-    x = x.replace("\u201c", '"').replace("\u201d", '"').replace("\u201f", '"')
-    x = x.replace("\u2018", "'").replace("\u2019", "'")
-    x = x.replace('〜', '～').replace('－', '−').replace('―', '−')
-    x = re.sub(r"\s+", " ", x).strip()
-    return x
-
-
-def sha1(s: str) -> str:
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-
 def _normalize_title(text: str) -> str:
     """タイトルテキストの正規化（改行→スペース、連続空白圧縮）"""
     if not text:
@@ -121,44 +99,6 @@ def _extract_start_times(starting_text: str) -> List[Optional[str]]:
     return times if times else [None]
 
 
-# --- Supabase -----------------------------------------------------------
-def get_supabase_client() -> Client:
-    if not SUPABASE_AVAILABLE:
-        raise RuntimeError("Supabase依存関係が不足: pip install supabase python-dotenv")
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    if not url or not key:
-        raise RuntimeError("環境変数 SUPABASE_URL, SUPABASE_KEY が設定されていません")
-    return create_client(url, key)
-
-
-def save_to_supabase(events: List[Dict]) -> None:
-    if not events:
-        print(f"[{META['name']}] DB投入: データなし")
-        return
-    try:
-        supabase = get_supabase_client()
-        db_records = []
-        for event in events:
-            record = {
-                "date": event.get("date"),
-                "time": event.get("time"),
-                "title": event.get("title", ""),
-                "venue": event.get("venue", ""),
-                "source_url": event.get("source", ""),
-                "data_hash": event.get("hash", ""),
-                "event_type": "auto",
-                "notes": event.get("notes"),
-            }
-            db_records.append(record)
-        result = supabase.table('events').upsert(
-            db_records, on_conflict="data_hash"
-        ).execute()
-        print(f"[{META['name']}] DB投入成功: {len(result.data)}件")
-    except Exception as e:
-        print(f"[{META['name']}][ERROR] DB投入失敗: {e}")
-
-
 # --- スクレイピング（新HTML構造対応）--------------------------------------
 def build_month_url(year: int, month: int) -> str:
     """月別スケジュールページURLを生成"""
@@ -168,41 +108,54 @@ def build_month_url(year: int, month: int) -> str:
 def fetch_month_events(year: int, month: int) -> List[Dict]:
     """
     指定月のスケジュールページを取得し、イベントを抽出。
-    新HTML構造: ul.schedule_table > li
+    ページが前回から変わっていなければ、保存済みの解析結果を再利用する（utils/http_cache）。
     """
     url = build_month_url(year, month)
-    print(f"[{META['name']}] Fetching {year}-{month:02d} from {url}")
+    log.info("Fetching %s-%02d from %s", year, month, url)
 
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        r.encoding = 'utf-8'
-        soup = BeautifulSoup(r.text, 'html.parser')
+        return http_cache.fetch_parsed(
+            url,
+            lambda html: parse_month_page(html, year, month),
+            PARSER_KEY,
+            headers=HEADERS,
+            encoding='utf-8',
+            timeout=15,
+            name=META['name'],
+        )
     except requests.RequestException as e:
-        print(f"[{META['name']}][ERROR] Failed to fetch {url}: {e}")
+        log.error("Failed to fetch %s: %s", url, e)
         return []
 
+
+def parse_month_page(html: str, year: int, month: int) -> List[Dict]:
+    """
+    月別スケジュールページのHTMLからイベントを抽出。
+    新HTML構造: ul.schedule_table > li
+    """
+    soup = make_soup(html, parse_only=SCHEDULE_STRAINER)
+
     events = []
     schedule_list = soup.select('ul.schedule_table > li')
 
     if not schedule_list:
-        print(f"[{META['name']}][WARN] No schedule items found for {year}-{month:02d}")
+        log.warn("No schedule items found for %s-%02d", year, month)
         return []
 
-    print(f"[{META['name']}] Found {len(schedule_list)} schedule items for {year}-{month:02d}")
+    log.info("Found %d schedule items for %s-%02d", len(schedule_list), year, month)
 
     for idx, li in enumerate(schedule_list):
         try:
             # --- 日付 ---
             date_el = li.select_one('p.date span.en')
             if not date_el:
-                print(f"[{META['name']}] Item {idx}: Skipping - no date element")
+                log.debug("Item %d: Skipping - no date element", idx)
                 continue
 
             day_text = date_el.get_text(strip=True)
             day_match = re.match(r'(\d+)', day_text)
             if not day_match:
-                print(f"[{META['name']}] Item {idx}: Skipping - invalid day '{day_text}'")
+                log.debug("Item %d: Skipping - invalid day '%s'", idx, day_text)
                 continue
 
             day = int(day_match.group(1))
@@ -211,18 +164,18 @@ def fetch_month_events(year: int, month: int) -> List[Dict]:
                 # 日付の妥当性チェック
                 datetime.strptime(event_date, "%Y-%m-%d")
             except ValueError:
-                print(f"[{META['name']}] Item {idx}: Skipping - invalid date {event_date}")
+                log.debug("Item %d: Skipping - invalid date %s", idx, event_date)
                 continue
 
             # --- タイトル ---
             name_el = li.select_one('p.name')
             if not name_el:
-                print(f"[{META['name']}] Item {idx}: Skipping - no name element")
+                log.debug("Item %d: Skipping - no name element", idx)
                 continue
 
             title = _normalize_title(name_el.get_text())
             if not title:
-                print(f"[{META['name']}] Item {idx}: Skipping - empty title")
+                log.debug("Item %d: Skipping - empty title", idx)
                 continue
 
             # --- 開演時刻 ---
@@ -239,13 +192,13 @@ def fetch_month_events(year: int, month: int) -> List[Dict]:
                     "source_month": f"{year}-{month:02d}",
                 })
 
-            print(f"[{META['name']}] Item {idx}: {event_date} {start_times} - {title[:40]}")
+            log.debug("Item %d: %s %s - %s", idx, event_date, start_times, title[:40])
 
         except Exception as e:
-            print(f"[{META['name']}][WARN] Failed to parse item {idx}: {e}")
+            log.warn("Failed to parse item %s: %s", idx, e)
             continue
 
-    print(f"[{META['name']}] Extracted {len(events)} events from {year}-{month:02d}")
+    log.info("Extracted %d events from %s-%02d", len(events), year, month)
     return events
 
 
@@ -263,84 +216,94 @@ def fetch_multi_month_events() -> List[Dict]:
 
 
 # --- メイン処理 ---------------------------------------------------------
-def main():
-    t0 = time.time()
-
-    target_date = resolve_target_date()
-    print(f"[{META['name']}] target_date={target_date}")
-
+def collect_events() -> List[Dict]:
+    """2ヶ月分を取得し、重複排除・ソート済みのイベントリストを返す（保存はしない）"""
     # 1) スクレイピング（2ヶ月分）
     raw = fetch_multi_month_events()
-    print(f"[{META['name']}] scraped {len(raw)} total events")
+    log.info("scraped %d total events", len(raw))
 
     # 2) 期間範囲計算（当月1日～翌月末日）
     start_date, end_date = get_target_date_range()
-    print(f"[{META['name']}] Target range: {start_date} ~ {end_date}")
+    log.debug("Target range: %s ~ %s", start_date, end_date)
 
     # 3) 期間フィルタリング
-    filtered = filter_date_range(raw, start_date, end_date)
-    print(f"[{META['name']}] filtered to {len(filtered)} events for {start_date} ~ {end_date}")
+    with stage("filter"):
+        filtered = filter_date_range(raw, start_date, end_date)
+    log.info("filtered to %d events for %s ~ %s", len(filtered), start_date, end_date)
 
     # 4) 重複排除＆メタ付与
-    seen = set()
-    out: List[Dict] = []
-    extracted_at = datetime.now(JST).isoformat()
-
-    for it in filtered:
-        title_norm = _normalize_for_hash(it.get("title", ""))
-        venue_norm = _normalize_for_hash(VENUE)
-        date_part = it.get("date", "")
-        time_part = it.get("time") or ""
-
-        key = f"{date_part}|{time_part}|{title_norm}|{venue_norm}"
-        h = sha1(key)
-        if h in seen:
-            continue
-        seen.add(h)
+    with stage("dedupe"):
+        seen = set()
+        out: List[Dict] = []
+        extracted_at = datetime.now(JST).isoformat()
+
+        hashes = hash_events(filtered, profile="sunpalace", venue=VENUE)
+        for it, h in zip(filtered, hashes):
+            if h in seen:
+                continue
+            seen.add(h)
 
-        out.append({
-            "schema_version": SCHEMA_VERSION,
-            "date": it["date"],
-            "time": it.get("time"),
-            "title": it["title"],
-            "venue": VENUE,
-            "source": BASE_URL,
-            "hash": h,
-            "extracted_at": extracted_at,
-        })
+            out.append({
+                "schema_version": SCHEMA_VERSION,
+                "date": it["date"],
+                "time": it.get("time"),
+                "title": it["title"],
+                "venue": VENUE,
+                "source": BASE_URL,
+                "hash": h,
+                "extracted_at": extracted_at,
+            })
 
-    print(f"[{META['name']}] after deduplication: {len(out)} events")
+    log.info("after deduplication: %d events", len(out))
 
     # 5) 並び替え（date, time(欠損は"99:99"で末尾), title）
-    def _sort_key(ev: Dict):
-        t = ev.get("time")
-        tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
-        return (ev.get("date", ""), tkey, ev.get("title", ""))
+    with stage("sort"):
+        def _sort_key(ev: Dict):
+            t = ev.get("time")
+            tkey = t if (t and re.fullmatch(r"\d{2}:\d{2}", t)) else "99:99"
+            return (ev.get("date", ""), tkey, ev.get("title", ""))
+
+        out.sort(key=_sort_key)
+    return out
 
-    out.sort(key=_sort_key)
+
+def main():
+    t0 = time.time()
+
+    target_date = resolve_target_date()
+    log.info("target_date=%s", target_date)
+
+    out = collect_events()
+    start_date, end_date = get_target_date_range()
 
     # 6) JSON保存（storage/{target_date}_e.json）
-    path = _storage_path(target_date, VENUE_CODE)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    path = save_snapshot(out, target_date, VENUE_CODE)
 
-    print(f"[{META['name']}] Saved {len(out)} events to {path}")
+    log.info("Saved %d events to %s", len(out), path)
 
-    # 7) Supabase投入
+    # 7) Supabase投入（共有クライアントの書き込みキュー経由）
     db_enabled = os.getenv("ENABLE_DB_SAVE", "0") == "1"
-    if db_enabled and SUPABASE_AVAILABLE:
-        save_to_supabase(out)
+    if db_enabled and db_writer.is_available():
+        db_writer.enqueue(out, META['name'])
+        db_writer.flush(META['name'])
     elif db_enabled:
-        print(f"[{META['name']}] DB投入スキップ: Supabase依存関係不足")
+        log.info("DB投入スキップ: Supabase依存関係不足")
 
     ms = int((time.time() - t0) * 1000)
-    print(f"[{META['name']}] date={target_date} items={len(out)} range={start_date}~{end_date} ms={ms} → {path}")
+    log.info("date=%s items=%d range=%s~%s ms=%s → %s", target_date, len(out), start_date, end_date, ms, path)
 
 
 if __name__ == "__main__":
+    # .env読み込み（単体実行時の SUPABASE_URL / SUPABASE_KEY 用・オプション）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
     try:
         main()
     except Exception as e:
         msg = str(e).replace("\n", " ").strip()
-        print(f"[{META['name']}][ERROR] msg=\"{msg}\" url=\"{BASE_URL}\"")
+        log.error("msg=\"%s\" url=\"%s\"", msg, BASE_URL)
         time.sleep(1)
@@ -1,7 +1,8 @@
 import os
 import sys
-import json
+import time
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from pathlib import Path
@@ -10,11 +11,11 @@ from pathlib import Path
 repo_root = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(repo_root))
 
-# .env自動読み込み
-from dotenv import load_dotenv
-load_dotenv()  # ← これだけで.envが読み込まれる
-
-from supabase import create_client
+from utils import api_snapshot, change_detect, db_sync, db_writer, event_store, http_client, http_replay, metrics
+from utils.env import env_int
+from utils.stages import recording
+from utils.log import get_logger
+from utils.storage import snapshot_enabled, storage_format, write_compact, write_snapshot
 
 # スクレイパーのインポート
 from scrapers import (
@@ -28,81 +29,159 @@ from scrapers import (
     best_denki_stadium
 )
 
+log = get_logger("refresh")
+
 JST = ZoneInfo("Asia/Tokyo")
 
+# 並列実行設定（REFRESH_MAX_WORKERS=1 で従来の逐次実行）
+# 同一ホストへの同時リクエスト数は utils.http_client 側で制限する（HTTP_PER_HOST_LIMIT）
+DEFAULT_MAX_WORKERS = 8
+
+# スクレイパー → 会場コード（storage/{date}_{code}.json と dispatch の件数集計で使用）
+SCRAPER_CODES = {
+    "marinemesse_a": "a",
+    "marinemesse_b": "b",
+    "kokusai_center": "c",
+    "congress_b": "d",
+    "sunpalace": "e",
+    "paypay_dome": "f",
+    "paypay_dome_events": "f_event",
+    "best_denki_stadium": "g",
+}
+VENUE_CODES = list(SCRAPER_CODES.values())
+
+def _scraper_name(scraper_module) -> str:
+    return scraper_module.__name__.split('.')[-1]
+
 def run_scraper_safe(scraper_module):
-    """スクレイパーを安全に実行"""
-    try:
-        scraper_module.main()
-        return True, None
-    except Exception as e:
-        err_msg = str(e)
-        print(f"[refresh][WARN] {scraper_module.__name__} failed: {err_msg}")
-        return False, err_msg
+    """
+    スクレイパーを安全に実行し、(success, err_msg, events) を返す。
+    段階別の所要時間（utils.stages）はスクレイパー名をスコープとして utils.metrics に登録する。
+    """
+    name = _scraper_name(scraper_module)
+    t0 = time.perf_counter()
+    with recording() as rec:
+        try:
+            events = scraper_module.collect_events()
+            result = (True, None, events)
+        except Exception as e:
+            err_msg = str(e)
+            log.warn("%s failed: %s", scraper_module.__name__, err_msg)
+            metrics.incr("scraper_failures", scope=name)
+            result = (False, err_msg, [])
+    wall = time.perf_counter() - t0
+    metrics.add_stages(name, rec, wall=wall)
+    metrics.incr("events_scraped", len(result[2]), scope=name)
+    stages = " ".join(f"{stage}={int(s * 1000)}" for stage, s in rec.totals().items())
+    log.info("[metrics] %s items=%d ms=%d %s", name, len(result[2]), int(wall * 1000), stages)
+    return result
+
+def run_scrapers(scrapers, max_workers: int):
+    """
+    全スクレイパーを実行し、(success, err_msg, events) を scrapers と同じ順序で返す。
+    max_workers=1 の場合は従来通り逐次実行。同一ホストへの同時リクエスト数は http_client が制限する。
+    """
+    if max_workers <= 1:
+        return [run_scraper_safe(s) for s in scrapers]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper") as pool:
+        futures = [pool.submit(run_scraper_safe, s) for s in scrapers]
+        return [f.result() for f in futures]
 
 def generate_hash(event: dict) -> str:
     """イベントのハッシュを生成（フォールバック用）"""
     key = f"{event['date']}|{event.get('time', '')}|{event['title']}|{event['venue']}"
     return hashlib.sha1(key.encode('utf-8')).hexdigest()
 
-def collect_scraped_events(today: str):
-    """storage/からスクレイピング結果を収集し、件数も集計する"""
+def to_db_event(event: dict) -> dict:
+    """スクレイパー出力1件をDB投入用の形式に変換（元のdictは変更しない）"""
+    record = dict(event)
+    # event_type = 'auto' を明示
+    record['event_type'] = 'auto'
+
+    # source → source_url のマッピング変換
+    if 'source' in record and 'source_url' not in record:
+        record['source_url'] = record.pop('source')
+
+    # hash → data_hash の変換（後方互換性）
+    if 'hash' in record and 'data_hash' not in record:
+        record['data_hash'] = record.pop('hash')
+
+    # data_hashがない場合は生成（フォールバック）
+    if not record.get('data_hash'):
+        record['data_hash'] = generate_hash(record)
+        log.info("Generated missing hash for: %s", record['title'])
+
+    return record
+
+def collect_scraped_events(scraped: dict):
+    """
+    スクレイパーから受け取った結果（code → イベントリスト）をDB形式に変換し、件数も集計する。
+    storage/ の再読込は行わない（メモリ上で直接受け渡し）。
+    """
     events = []
     venue_counts = {}
-    
-    venue_codes = ['a', 'b', 'c', 'd', 'e', 'f', 'f_event', 'g']
-    storage_dir = Path(__file__).resolve().parents[1] / "storage"
-    
-    print(f"[refresh] Looking for storage at: {storage_dir}")
-    
-    for code in venue_codes:
-        storage_file = storage_dir / f"{today}_{code}.json"
-        
-        if storage_file.exists():
-            try:
-                with open(storage_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    for event in data:
-                        # event_type = 'auto' を明示
-                        event['event_type'] = 'auto'
-                        
-                        # ★★★ source → source_url のマッピング変換を追加 ★★★
-                        if 'source' in event and 'source_url' not in event:
-                            event['source_url'] = event.pop('source')
-                        
-                        # ★★★ hash → data_hash の変換（後方互換性） ★★★
-                        if 'hash' in event and 'data_hash' not in event:
-                            event['data_hash'] = event.pop('hash')
-                        
-                        # ★★★ data_hashがない場合は生成（フォールバック） ★★★
-                        if 'data_hash' not in event or not event.get('data_hash'):
-                            event['data_hash'] = generate_hash(event)
-                            print(f"[refresh] Generated missing hash for: {event['title']}")
-                    
-                    events.extend(data)
-                    venue_counts[code] = len(data)
-                    print(f"[refresh] Loaded {len(data)} events from {code}")
-            except Exception as e:
-                print(f"[refresh][ERROR] Failed to load {code}: {e}")
-                venue_counts[code] = 0
-        else:
-            print(f"[refresh][WARN] Not found: {storage_file}")
-            venue_counts[code] = 0
-    
+
+    for code in VENUE_CODES:
+        data = scraped.get(code, [])
+        events.extend(to_db_event(ev) for ev in data)
+        venue_counts[code] = len(data)
+        log.info("Collected %d events from %s", len(data), code)
+
     return events, venue_counts
 
+def write_snapshots_behind(scraped: dict, target_date: str):
+    """
+    storage/ スナップショットをバックグラウンドで書き出す（write-behind）。
+    戻り値のExecutorは main() の最後で shutdown(wait=True) して書き込み完了を待つ。
+    """
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+    fmt = storage_format()
+
+    def _write(code, events):
+        try:
+            with recording() as rec:
+                path = write_snapshot(events, target_date, code)
+            metrics.add_stages("storage", rec)
+            log.info("Snapshot saved: %s", path)
+        except Exception as e:
+            log.warn("Snapshot failed for %s: %s", code, e)
+
+    def _write_compact():
+        try:
+            with recording() as rec:
+                path = write_compact(scraped, target_date)
+            metrics.add_stages("storage", rec)
+            log.info("Compact snapshot saved: %s", path)
+        except Exception as e:
+            log.warn("Compact snapshot failed: %s", e)
+
+    if fmt in ("json", "both"):
+        for code, events in scraped.items():
+            writer.submit(_write, code, events)
+    if fmt in ("ndjson", "both"):
+        writer.submit(_write_compact)
+    return writer
+
 def main():
-    print("[refresh] === Future Events Refresh Start ===")
+    # .env読み込み（python-dotenv が無ければ環境変数のみ）
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    log.info("=== Future Events Refresh Start ===")
+    metrics.start("refresh")
     
     # 1. 今日の日付取得（JST）
     today = datetime.now(JST).strftime("%Y-%m-%d")
-    print(f"[refresh] Today (JST): {today}")
-    print(f"[refresh] Strategy: DELETE date >= {today} AND event_type = 'auto'")
-    print(f"[refresh] Protected: date < {today} OR event_type = 'manual'")
+    log.info("Today (JST): %s", today)
+    log.info("Strategy: diff sync by data_hash (date >= %s AND event_type = 'auto')", today)
+    log.info("Protected: date < %s OR event_type = 'manual'", today)
     
     # 2. 全スクレイパー実行
-    print("[refresh] Running all scrapers...")
+    log.info("Running all scrapers...")
     scrapers = [
         marinemesse_a,
         marinemesse_b,
@@ -114,19 +193,82 @@ def main():
         best_denki_stadium
     ]
     
+    max_workers = env_int("REFRESH_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+    log.info("Concurrency: workers=%s per_host=%s", max_workers, http_client.per_host_limit())
+
+    t_scrape = time.time()
+    with metrics.phase("scrape"):
+        results = run_scrapers(scrapers, max_workers)
+
     success_count = 0
     errors = []
-    for scraper in scrapers:
-        success, err_msg = run_scraper_safe(scraper)
+    scraped = {}
+    for scraper, (success, err_msg, events) in zip(scrapers, results):
+        name = _scraper_name(scraper)
         if success:
             success_count += 1
+            scraped[SCRAPER_CODES[name]] = events
         else:
-            errors.append(f"{scraper.__name__.split('.')[-1]}: {err_msg}")
-    
-    print(f"[refresh] Scrapers: {success_count}/{len(scrapers)} succeeded")
+            errors.append(f"{name}: {err_msg}")
     
-    # 3. スクレイピング結果と件数を収集
-    all_events, venue_counts = collect_scraped_events(today)
+    scrape_ms = int((time.time() - t_scrape) * 1000)
+    log.info("Scrapers: %s/%d succeeded ms=%s", success_count, len(scrapers), scrape_ms)
+    http_client.log_stats_summary()
+    http_replay.log_summary()
+
+    # 2.5 storage/ スナップショット（任意・write-behind）
+    snapshot_writer = None
+    if snapshot_enabled():
+        snapshot_date = os.getenv("SCRAPER_TARGET_DATE") or today
+        log.info("Storage format: %s", storage_format())
+        snapshot_writer = write_snapshots_behind(scraped, snapshot_date)
+    else:
+        log.info("ENABLE_STORAGE_SNAPSHOT=0, skipping storage snapshots")
+
+    # 2.55 ローカル履歴ストア（SQLite）へ追記（任意・失敗してもDB同期は続行）
+    if event_store.event_store_enabled():
+        try:
+            t_store = time.time()
+            with metrics.phase("event_store"):
+                stored = event_store.record_run(scraped)
+            log.info("Event store: %s events recorded ms=%d", stored, int((time.time() - t_store) * 1000))
+        except Exception as e:
+            log.warn("Failed to record event store: %s", e)
+
+    # 2.6 カレンダー向けAPIスナップショット（任意・失敗してもDB同期は続行）
+    if api_snapshot.snapshot_enabled():
+        try:
+            with metrics.phase("api_snapshot"):
+                api_snapshot.write_api_snapshots(scraped)
+        except Exception as e:
+            log.warn("Failed to write API snapshots: %s", e)
+
+    try:
+        _refresh_database(today, scraped, errors)
+    finally:
+        if snapshot_writer is not None:
+            snapshot_writer.shutdown(wait=True)
+        # 6. ランレポート（JSON / OpenMetrics）。DB同期失敗で終了する場合も書き出す
+        _write_run_report()
+
+    log.info("=== Future Events Refresh Complete ===")
+
+def _write_run_report():
+    """utils.metrics のランレポートを書き出し、遅い段階をログに残す（失敗しても処理は続行）"""
+    try:
+        report = metrics.build_report()
+        slowest = " ".join(f"{scope}.{stage}={ms}" for scope, stage, ms in metrics.slowest_stages(report, 5))
+        log.info("[metrics] wall_ms=%s phases=%s slowest: %s", report['wall_ms'], report['phases_ms'], slowest)
+        paths = metrics.write_report(report)
+        if paths:
+            log.info("Run report saved: %s %s", paths[0], paths[1])
+    except Exception as e:
+        log.warn("Failed to write run report: %s", e)
+
+def _refresh_database(today: str, scraped: dict, errors: list):
+    """収集結果をSupabaseへ差分同期し、件数・差分を通知する"""
+    # 3. スクレイピング結果と件数を収集（メモリ上）
+    all_events, venue_counts = collect_scraped_events(scraped)
     
     # ★ 3.5 0件警告対象会場（常時イベントがある会場）の判定
     zero_warnings = []
@@ -140,44 +282,94 @@ def main():
     for code, name in critical_venues.items():
         if venue_counts.get(code, 0) == 0:
             zero_warnings.append(f"{name} ({code})")
-            print(f"[refresh][WARN] Zero events detected for critical venue: {name}")
+            log.warn("Zero events detected for critical venue: %s", name)
+
+    log.info("Collected %d total events", len(all_events))
 
-    # ★ 4. Slack/LINEに件数・異常ログを送信
+    # 3.6 前回実行からの変更検知（data_hash 集合の差分・保存は通知の後）
+    changes = None
+    if change_detect.change_detect_enabled():
+        try:
+            changes = change_detect.detect_changes(scraped, today)
+            log.info("Changes since last run: %s baseline=%s", changes.counts(), changes.baseline)
+        except Exception as e:
+            log.warn("Change detection failed: %s", e)
+
+    # 4. DB同期（通知に差分件数・DB件数を載せるため、通知より先に実行）
+    sync_stats = None
+    db_failed = False
+    try:
+        with metrics.phase("db_sync"):
+            sync_stats = _sync_database(today, all_events)
+        for kind, count in (sync_stats or {}).items():
+            metrics.incr("db_rows", count, scope=kind)
+    except Exception as e:
+        log.error("Database sync failed: %s", e)
+        errors.append(f"db_sync: {e}")
+        db_failed = True
+
+    # ★ 5. Slack/LINEに件数・差分・異常ログを送信
     try:
         from notify import dispatch
-        dispatch.send_log(venue_counts, errors, zero_warnings)
+        with metrics.phase("dispatch"):
+            dispatch.send_log(venue_counts, errors, zero_warnings, sync_stats=sync_stats, changes=changes,
+                              run_report=metrics.build_report())
     except Exception as e:
-        print(f"[refresh][WARN] Failed to send dispatch log: {e}")
-    
-    print(f"[refresh] Collected {len(all_events)} total events")
-    
+        log.warn("Failed to send dispatch log: %s", e)
+
+    # 5.5 次回の比較基準を保存（DRY_RUN では基準を進めない）
+    if changes is not None and os.getenv("DRY_RUN") != "1":
+        try:
+            change_detect.save_state(changes)
+        except Exception as e:
+            log.warn("Failed to save change state: %s", e)
+
+    if db_failed:
+        sys.exit(1)
+
+def _sync_database(today: str, all_events: list):
+    """
+    未来のautoイベントをDBに反映し、差分件数を返す（DB操作をしない場合は None）。
+    通常は data_hash による差分同期。失敗時は従来の全削除→全挿入で整合性を回復する。
+    失敗した場合は例外を送出する。
+    """
     if not all_events:
-        print("[refresh][WARN] No events collected, skipping refresh")
-        return
+        log.warn("No events collected, skipping refresh")
+        return None
     
-    # 4. DB保存の有効/無効チェック
+    # DB保存の有効/無効チェック
     enable_db_save = os.getenv("ENABLE_DB_SAVE", "0") == "1"
     
     if not enable_db_save:
-        print("[refresh] ENABLE_DB_SAVE=0, skipping database operations")
-        print(f"[refresh] ✅ Collected {len(all_events)} events and saved to JSON files")
-        print("[refresh] === Future Events Refresh Complete ===")
-        return
+        log.info("ENABLE_DB_SAVE=0, skipping database operations")
+        log.info("✅ Collected %d events", len(all_events))
+        return None
     
-    # 5. Supabase接続（.envから自動読み込み）
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
+    # Supabase接続（.envから自動読み込み・プロセス共有クライアント）
+    if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_KEY"):
+        log.error("Missing SUPABASE credentials in .env")
+        log.info("Set ENABLE_DB_SAVE=0 to skip database operations")
+        raise RuntimeError("Missing SUPABASE credentials")
     
-    if not supabase_url or not supabase_key:
-        print("[refresh][ERROR] Missing SUPABASE credentials in .env")
-        print("[refresh][INFO] Set ENABLE_DB_SAVE=0 to skip database operations")
-        sys.exit(1)
+    supabase = db_writer.get_client()
     
-    supabase = create_client(supabase_url, supabase_key)
+    # 差分同期（追加・更新・削除のみ送信）
+    try:
+        log.info("Executing diff sync...")
+        t_sync = time.time()
+        stats = db_sync.sync_future_events(supabase, today, all_events)
+        sync_ms = int((time.time() - t_sync) * 1000)
+        log.info(
+            "Diff sync success: inserted %d, updated %d, deleted %d, unchanged %d ms=%d",
+            stats['inserted'], stats['updated'], stats['deleted'], stats['unchanged'], sync_ms,
+        )
+        return stats
+    except Exception as e:
+        log.error("Diff sync failed: %s", e)
+        log.info("Attempting full refresh (transaction)...")
     
-    # 6. トランザクション実行
+    # フォールバック1: 全削除→全挿入（トランザクション）
     try:
-        print("[refresh] Executing transaction...")
         result = supabase.rpc('refresh_future_auto_events', {
             'today_date': today,
             'new_events': all_events
@@ -186,34 +378,36 @@ def main():
         if result.data:
             deleted = result.data[0].get('deleted_count', 0)
             inserted = result.data[0].get('inserted_count', 0)
-            print(f"[OK] [refresh] Transaction success: deleted {deleted}, inserted {inserted}")
+            log.info("Transaction success: deleted %s, inserted %s", deleted, inserted)
         else:
-            print(f"[OK] [refresh] Transaction success: inserted {len(all_events)} events")
+            deleted = 0
+            inserted = len(all_events)
+            log.info("Transaction success: inserted %d events", len(all_events))
+        return {"inserted": inserted, "updated": 0, "deleted": deleted, "unchanged": 0}
             
     except Exception as e:
-        print(f"[FAIL] [refresh] Transaction failed: {e}")
-        print("[refresh] Attempting fallback (no transaction)...")
-        
-        # フォールバック（トランザクションなし）
-        try:
-            # 削除
-            del_result = supabase.table('events').delete()\
-                .gte('date', today)\
-                .eq('event_type', 'auto')\
-                .execute()
-            
-            deleted_count = len(del_result.data) if del_result.data else 0
-            print(f"[DELETE] [refresh] Fallback: deleted {deleted_count} events")
-            
-            # 挿入
-            supabase.table('events').insert(all_events).execute()
-            print(f"[OK] [refresh] Fallback: inserted {len(all_events)} events")
-            
-        except Exception as fe:
-            print(f"[FAIL] [refresh] Fallback failed: {fe}")
-            sys.exit(1)
+        log.error("Transaction failed: %s", e)
+        log.info("Attempting fallback (no transaction)...")
     
-    print("[refresh] === Future Events Refresh Complete ===")
+    # フォールバック2: 全削除→全挿入（トランザクションなし）
+    try:
+        # 削除
+        del_result = supabase.table('events').delete()\
+            .gte('date', today)\
+            .eq('event_type', 'auto')\
+            .execute()
+        
+        deleted_count = len(del_result.data) if del_result.data else 0
+        log.info("Fallback: deleted %s events", deleted_count)
+        
+        # 挿入
+        supabase.table('events').insert(all_events).execute()
+        log.info("Fallback: inserted %d events", len(all_events))
+        return {"inserted": len(all_events), "updated": 0, "deleted": deleted_count, "unchanged": 0}
+        
+    except Exception as fe:
+        log.error("Fallback failed: %s", fe)
+        raise
 
 if __name__ == "__main__":
     main()
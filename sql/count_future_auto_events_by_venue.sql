@@ -0,0 +1,18 @@
+-- dispatch の健全性チェック用: 未来の auto イベント件数を会場ごとにサーバー側で集計する
+-- （行データを転送せず、会場数ぶんの行だけを返す）
+-- Supabase SQL Editor で一度実行しておくこと。未導入の場合 dispatch は会場ごとの count クエリにフォールバックする。
+CREATE OR REPLACE FUNCTION count_future_auto_events_by_venue(today_date DATE)
+RETURNS TABLE (venue VARCHAR, count BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT e.venue, COUNT(*) AS count
+  FROM events AS e
+  WHERE e.event_type = 'auto'
+    AND e.date >= today_date
+  GROUP BY e.venue;
+$$;
+
+-- 集計を索引だけで済ませるための複合インデックス
+CREATE INDEX IF NOT EXISTS idx_events_type_date_venue
+  ON events (event_type, date, venue);
@@ -0,0 +1,160 @@
+# utils/api_snapshot.py
+"""
+カレンダー（calendar/ の Next.js）向けの静的JSONスナップショット。
+
+refresh_future_events.py がメモリ上に持っている全会場の正規化済みイベントから、
+月別・会場別のJSONを書き出す。CDN（GitHub Pages 等）から配信すれば、ページ表示のたびにDBへ問い合わせずに済む。
+ENABLE_API_SNAPSHOT=1 で有効（デフォルト無効）。出力先は API_SNAPSHOT_DIR（デフォルト site/api）。
+
+出力:
+  months/YYYY-MM.json  その月のイベント（日付・時刻順）
+  venues/{code}.json   会場ごとのイベント（日付・時刻順）
+  *.json.gz            gzip 圧縮版
+  *.json.br            brotli 圧縮版（brotli パッケージがインストールされている場合のみ）
+  manifest.json        各ファイルの sha256・件数・バイト数と生成日時
+
+行の形式は events テーブルと同じ列（db_sync.to_db_row）。手動イベント（manual）はDBにのみ存在するため含まない。
+内容（sha256）が前回の manifest と同じファイルは書き直さない。
+"""
+import os
+import gzip
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.db_sync import to_db_row
+from utils.log import get_logger
+from utils.parser import JST
+from utils.paths import BASE_DIR
+from utils.storage import atomic_write
+
+# brotli は任意（無ければ gzip のみ）
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = get_logger("api_snapshot")
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_enabled() -> bool:
+    """APIスナップショット書き出しの有効/無効（デフォルト無効）"""
+    return os.getenv("ENABLE_API_SNAPSHOT", "0") == "1"
+
+
+def snapshot_dir() -> Path:
+    """出力先ディレクトリ（API_SNAPSHOT_DIR > site/api）"""
+    override = os.getenv("API_SNAPSHOT_DIR")
+    return Path(override) if override else BASE_DIR / "site" / "api"
+
+
+def _sort_key(row: Dict):
+    return (row.get("date") or "", row.get("time") or "99:99", row.get("title", ""), row.get("venue", ""))
+
+
+def build_snapshots(scraped: Dict[str, List[Dict]]) -> Tuple[Dict[str, List[Dict]], Dict[str, str]]:
+    """
+    会場コード → イベントリスト から (相対パス → 行リスト, 会場コード → 会場名) を作る。
+    """
+    files: Dict[str, List[Dict]] = {}
+    venues: Dict[str, str] = {}
+    for code, events in scraped.items():
+        rows = sorted((to_db_row(ev) for ev in events), key=_sort_key)
+        files[f"venues/{code}.json"] = rows
+        venues[code] = rows[0]["venue"] if rows else ""
+        for row in rows:
+            month = (row.get("date") or "")[:7]
+            if month:
+                files.setdefault(f"months/{month}.json", []).append(row)
+    for path, rows in files.items():
+        if path.startswith("months/"):
+            rows.sort(key=_sort_key)
+    return files, venues
+
+
+def _encode(rows: List[Dict]) -> bytes:
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _variants(data: bytes) -> Dict[str, bytes]:
+    """拡張子 → 圧縮済みバイト列（gzip は mtime=0 で内容が同じなら同一バイト列）"""
+    out = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out[".br"] = brotli.compress(data)
+    return out
+
+
+def _load_manifest(out_dir: Path) -> Dict:
+    try:
+        with open(out_dir / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_api_snapshots(scraped: Dict[str, List[Dict]], out_dir: Optional[Path] = None) -> bool:
+    """
+    スナップショットと manifest.json を書き出し、何か書き換えたかを返す。
+    前回の manifest に無くなったファイル（過ぎた月など）は削除する。
+    """
+    out_dir = out_dir or snapshot_dir()
+    files, venues = build_snapshots(scraped)
+    previous = _load_manifest(out_dir).get("files", {})
+
+    entries: Dict[str, Dict] = {}
+    written = 0
+    for rel, rows in sorted(files.items()):
+        data = _encode(rows)
+        digest = hashlib.sha256(data).hexdigest()
+        variants = _variants(data)
+        entry = {
+            "sha256": digest,
+            "count": len(rows),
+            "bytes": len(data),
+            **{f"{ext[1:]}_bytes": len(blob) for ext, blob in variants.items()},
+        }
+        entries[rel] = entry
+
+        target = out_dir / rel
+        up_to_date = (
+            previous.get(rel) == entry
+            and target.exists()
+            and all(target.with_name(target.name + ext).exists() for ext in variants)
+        )
+        if up_to_date:
+            continue
+        atomic_write(target, data)
+        for ext, blob in variants.items():
+            atomic_write(target.with_name(target.name + ext), blob)
+        written += 1
+
+    removed = 0
+    for rel in set(previous) - set(entries):
+        for suffix in ("", ".gz", ".br"):
+            stale = out_dir / (rel + suffix)
+            if stale.exists():
+                stale.unlink()
+        removed += 1
+
+    changed = bool(written or removed) or not (out_dir / MANIFEST_NAME).exists()
+    if changed:
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "generated_at": datetime.now(JST).isoformat(timespec="seconds"),
+            "encodings": ["identity", "gzip"] + (["br"] if brotli is not None else []),
+            "months": sorted(rel[len("months/"):-len(".json")] for rel in entries if rel.startswith("months/")),
+            "venues": venues,
+            "files": entries,
+        }
+        atomic_write(out_dir / MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    log.info(
+        "files=%d written=%d removed=%d unchanged=%d → %s",
+        len(entries), written, removed, len(entries) - written, out_dir,
+    )
+    return changed
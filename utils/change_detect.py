@@ -0,0 +1,151 @@
+# utils/change_detect.py
+"""
+前回実行からのイベント変更検知（会場ごとの data_hash 集合の差分）。
+
+前回実行時の {会場コード: {data_hash: [date, time, title, 指紋]}} を storage/change_state/last_events.json に保存し、
+今回のスクレイプ結果と集合演算で突き合わせる（件数に対して O(n)）:
+  - 今回だけにある hash              → 追加
+  - 前回だけにある hash              → 削除（日付が今日より前のものは「終了」なので数えない）
+  - 同じ hash で指紋が違うもの       → 変更（source_url / notes など hash に含まれない列）
+
+スクレイプに失敗した会場は比較せず、前回の状態をそのまま引き継ぐ（全件削除と誤検知しない）。
+状態ファイルが無い初回は基準の保存のみ行い、差分は報告しない。
+ENABLE_CHANGE_DETECT=0 で無効（デフォルト有効）。
+"""
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.db_sync import comparable_values, to_db_row
+from utils.parser import JST
+from utils.paths import STORAGE_DIR
+from utils.storage import atomic_write
+
+STATE_DIR = STORAGE_DIR / "change_state"
+STATE_FILE = STATE_DIR / "last_events.json"
+STATE_VERSION = 1
+
+# 状態1件: [date, time, title, 指紋]
+_DATE, _TIME, _TITLE, _FP = range(4)
+
+
+@dataclass
+class VenueChanges:
+    """1会場分の差分（各要素は [date, time, title]）"""
+    added: List[List] = field(default_factory=list)
+    removed: List[List] = field(default_factory=list)
+    changed: List[List] = field(default_factory=list)
+
+    def total(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+
+@dataclass
+class ChangeSet:
+    """今回の変更検知結果。state は save_state() で保存する次回の基準"""
+    venues: Dict[str, VenueChanges] = field(default_factory=dict)
+    state: Dict[str, Dict[str, List]] = field(default_factory=dict)
+    baseline: bool = False   # 前回の状態が無かった（初回）
+
+    def total(self) -> int:
+        return sum(v.total() for v in self.venues.values())
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "added": sum(len(v.added) for v in self.venues.values()),
+            "removed": sum(len(v.removed) for v in self.venues.values()),
+            "changed": sum(len(v.changed) for v in self.venues.values()),
+        }
+
+
+def change_detect_enabled() -> bool:
+    """変更検知の有効/無効（デフォルト有効）"""
+    return os.getenv("ENABLE_CHANGE_DETECT", "1") == "1"
+
+
+def _fingerprint(row: Dict) -> str:
+    key = "\x1f".join("" if v is None else str(v) for v in comparable_values(row))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def build_venue_state(events: List[Dict], today: str) -> Dict[str, List]:
+    """イベントリストから {data_hash: [date, time, title, 指紋]} を作る（今日より前は除外）"""
+    state: Dict[str, List] = {}
+    for ev in events:
+        row = to_db_row(ev)
+        h = row["data_hash"]
+        if not h or (row.get("date") or "") < today:
+            continue
+        state[h] = [row.get("date"), row.get("time"), row.get("title", ""), _fingerprint(row)]
+    return state
+
+
+def diff_venue(previous: Dict[str, List], current: Dict[str, List], today: str) -> VenueChanges:
+    """1会場分の前回/今回の状態を比較する"""
+    prev_keys = previous.keys()
+    cur_keys = current.keys()
+    changes = VenueChanges()
+    changes.added = [current[h][:_FP] for h in cur_keys - prev_keys]
+    changes.removed = [
+        previous[h][:_FP] for h in prev_keys - cur_keys
+        if (previous[h][_DATE] or "") >= today
+    ]
+    changes.changed = [
+        current[h][:_FP] for h in cur_keys & prev_keys
+        if current[h][_FP] != previous[h][_FP]
+    ]
+    for items in (changes.added, changes.removed, changes.changed):
+        items.sort(key=lambda e: (e[_DATE] or "", e[_TIME] or "99:99", e[_TITLE]))
+    return changes
+
+
+def load_state(path: Path = STATE_FILE) -> Optional[Dict[str, Dict[str, List]]]:
+    """前回の状態（無い・壊れている場合は None）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != STATE_VERSION:
+        return None
+    return data.get("venues", {})
+
+
+def save_state(changes: ChangeSet, path: Path = STATE_FILE) -> None:
+    """次回の基準となる状態を書き出す"""
+    payload = {
+        "version": STATE_VERSION,
+        "saved_at": datetime.now(JST).isoformat(timespec="seconds"),
+        "venues": changes.state,
+    }
+    atomic_write(path, json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+
+
+def detect_changes(scraped: Dict[str, List[Dict]], today: str, path: Path = STATE_FILE) -> ChangeSet:
+    """
+    会場コード → イベントリスト（成功した会場のみ）と前回の状態を比較する。
+    保存は呼び出し側が通知の後に save_state() で行う。
+    """
+    previous = load_state(path)
+    result = ChangeSet(baseline=previous is None)
+    previous = previous or {}
+
+    # 失敗した会場は前回の状態を引き継ぐ（過ぎた日付は落とす）
+    for code, prev_state in previous.items():
+        if code not in scraped:
+            result.state[code] = {h: e for h, e in prev_state.items() if (e[_DATE] or "") >= today}
+
+    for code, events in scraped.items():
+        current = build_venue_state(events, today)
+        result.state[code] = current
+        if result.baseline:
+            continue
+        venue_changes = diff_venue(previous.get(code, {}), current, today)
+        if venue_changes.total():
+            result.venues[code] = venue_changes
+
+    return result
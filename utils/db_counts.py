@@ -0,0 +1,84 @@
+# utils/db_counts.py
+"""
+未来のautoイベント件数（会場別）の取得。
+
+dispatch の健全性チェックは8会場分の件数だけが必要なので、行データは転送せずDB側で集計する。
+  1. RPC count_future_auto_events_by_venue（sql/count_future_auto_events_by_venue.sql）で GROUP BY
+  2. RPC未導入なら会場ごとの count='exact', head=True クエリ（行は返らない）
+どちらも保存件数に関係なく一定コスト。
+
+LocalCountsClient はテスト・オフライン確認用の代替（RPCと同じ結果を行リストから計算する）。
+"""
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from utils.log import get_logger
+
+log = get_logger("db_counts")
+
+RPC_NAME = "count_future_auto_events_by_venue"
+
+
+def count_rows_by_venue(rows: Iterable[Dict], today: str) -> Dict[str, int]:
+    """RPC と同じ条件（event_type='auto' かつ date >= today）で venue 名ごとに数える"""
+    return dict(Counter(
+        r["venue"] for r in rows
+        if r.get("event_type") == "auto" and r.get("date", "") >= today
+    ))
+
+
+def _count_via_rpc(client, today: str) -> Dict[str, int]:
+    result = client.rpc(RPC_NAME, {"today_date": today}).execute()
+    return {row["venue"]: int(row["count"]) for row in (result.data or [])}
+
+
+def _count_via_head_queries(client, today: str, venue_names: List[str]) -> Dict[str, int]:
+    counts = {}
+    for name in venue_names:
+        result = client.table('events')\
+            .select('id', count='exact', head=True)\
+            .eq('event_type', 'auto')\
+            .eq('venue', name)\
+            .gte('date', today)\
+            .execute()
+        if result.count:
+            counts[name] = result.count
+    return counts
+
+
+def count_future_by_venue(client, today: str, venue_names: List[str]) -> Dict[str, int]:
+    """venue名 → 未来autoイベント件数。RPCが使えなければ会場ごとの count クエリで代替"""
+    try:
+        return _count_via_rpc(client, today)
+    except Exception as e:
+        log.warn("RPC %s unavailable, falling back to per-venue counts: %s", RPC_NAME, e)
+    return _count_via_head_queries(client, today, venue_names)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Call:
+    def __init__(self, data):
+        self._data = data
+
+    def execute(self):
+        return _Result(self._data)
+
+
+class LocalCountsClient:
+    """
+    count_future_by_venue() に渡せるローカル代替クライアント（RPCのみ対応）。
+    例: count_future_by_venue(LocalCountsClient(rows), "2025-01-01", names)
+    """
+
+    def __init__(self, rows: Iterable[Dict]):
+        self.rows = list(rows)
+
+    def rpc(self, name: str, params: Dict):
+        if name != RPC_NAME:
+            raise ValueError(f"unknown rpc: {name}")
+        counts = count_rows_by_venue(self.rows, params["today_date"])
+        return _Call([{"venue": v, "count": c} for v, c in counts.items()])
@@ -0,0 +1,165 @@
+# utils/db_sync.py
+"""
+未来イベント（event_type='auto', date >= today）の差分同期エンジン。
+
+従来は「未来のautoイベントを全削除 → 全件挿入」していたため、書き込み量がカレンダー全体の件数に比例していた。
+ここでは DB の現状と今回のスクレイプ結果を data_hash で突き合わせ、
+  - DBに無いもの      → 追加
+  - DBにしか無いもの  → 削除
+  - 同じhashで中身が違うもの（source_url / notes 等） → 更新
+だけを送信する。書き込み量は「変わった件数」に比例する。
+
+保護ルールは従来通り: date < today の行と event_type='manual' の行には触れない。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+# DBの events テーブルに書き込む列
+DB_COLUMNS = ("date", "time", "title", "venue", "source_url", "data_hash", "event_type", "notes")
+# 同一hashの行で「更新」と判定するために比較する列（date/time/title/venue は hash に含まれる）
+COMPARE_COLUMNS = ("date", "time", "title", "venue", "source_url", "notes")
+
+FETCH_PAGE_SIZE = 1000   # PostgREST の既定上限に合わせる
+WRITE_CHUNK_SIZE = 500   # 1リクエストあたりの upsert 件数
+# 1リクエストあたりの delete 件数（data_hash の in フィルタはURLに載るため、URL長の上限に収まる件数に抑える）
+DELETE_CHUNK_SIZE = 100
+
+
+@dataclass
+class SyncPlan:
+    """差分同期の計画（送信前）"""
+    inserts: List[Dict] = field(default_factory=list)
+    updates: List[Dict] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)   # data_hash のリスト
+    unchanged: int = 0
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "inserted": len(self.inserts),
+            "updated": len(self.updates),
+            "deleted": len(self.deletes),
+            "unchanged": self.unchanged,
+        }
+
+
+def _build_notes(event: Dict) -> Optional[str]:
+    """notes列の値。PayPayドーム(野球)は試合状況をnotesに格納（html_export が読み戻す）"""
+    if event.get("notes") is not None:
+        return event["notes"]
+    if "game_status" in event:
+        return f"game_status: {event.get('game_status', '')}, score: {event.get('score', '')}"
+    return None
+
+
+def to_db_row(event: Dict) -> Dict:
+    """
+    イベントを events テーブルの列だけに絞る。
+    DB形式（source_url / data_hash）とスクレイパー出力（source / hash）のどちらも受け付ける。
+    """
+    return {
+        "date": event.get("date"),
+        "time": event.get("time"),
+        "title": event.get("title", ""),
+        "venue": event.get("venue", ""),
+        "source_url": event.get("source_url", event.get("source", "")),
+        "data_hash": event.get("data_hash") or event.get("hash", ""),
+        "event_type": "auto",
+        "notes": _build_notes(event),
+    }
+
+
+def _normalize_time(value) -> Optional[str]:
+    """PostgreSQLのTIME型 "18:00:00" と "18:00" を同一視する"""
+    if not value:
+        return None
+    return str(value)[:5]
+
+
+def comparable_values(row: Dict) -> tuple:
+    """更新判定に使う列の値（utils/change_detect の指紋にも使用）"""
+    values = []
+    for col in COMPARE_COLUMNS:
+        v = row.get(col)
+        if col == "time":
+            v = _normalize_time(v)
+        elif v == "":
+            v = None
+        values.append(v)
+    return tuple(values)
+
+
+def compute_diff(current_rows: Iterable[Dict], new_rows: Iterable[Dict]) -> SyncPlan:
+    """DBの現状（current_rows）と今回の結果（new_rows）を data_hash で比較して SyncPlan を作る"""
+    current = {r["data_hash"]: r for r in current_rows if r.get("data_hash")}
+    desired: Dict[str, Dict] = {}
+    for r in new_rows:
+        desired[r["data_hash"]] = r   # 同一hashは後勝ち（従来のupsertと同じ）
+
+    plan = SyncPlan()
+    for h, row in desired.items():
+        old = current.get(h)
+        if old is None:
+            plan.inserts.append(row)
+        elif comparable_values(old) != comparable_values(row):
+            plan.updates.append(row)
+        else:
+            plan.unchanged += 1
+    plan.deletes = [h for h in current if h not in desired]
+    return plan
+
+
+def fetch_current_rows(supabase, today: str) -> List[Dict]:
+    """
+    DB上の未来autoイベントを取得（ページング対応）。
+    順序指定のない .range() はページ間で行が重複・欠落しうる（読めなかった行は削除対象から漏れる）ため、
+    一意キーの data_hash で並べてからページングする。
+    """
+    rows: List[Dict] = []
+    offset = 0
+    while True:
+        result = supabase.table('events')\
+            .select(",".join(DB_COLUMNS))\
+            .eq('event_type', 'auto')\
+            .gte('date', today)\
+            .order('data_hash')\
+            .range(offset, offset + FETCH_PAGE_SIZE - 1)\
+            .execute()
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < FETCH_PAGE_SIZE:
+            break
+        offset += FETCH_PAGE_SIZE
+    return rows
+
+
+def _chunks(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply_plan(supabase, plan: SyncPlan, today: str, chunk_size: int = WRITE_CHUNK_SIZE,
+               delete_chunk_size: int = DELETE_CHUNK_SIZE) -> None:
+    """SyncPlan をDBに反映（追加・更新は upsert、削除は data_hash 指定）"""
+    for chunk in _chunks(plan.deletes, delete_chunk_size):
+        supabase.table('events').delete()\
+            .eq('event_type', 'auto')\
+            .gte('date', today)\
+            .in_('data_hash', chunk)\
+            .execute()
+
+    writes = plan.inserts + plan.updates
+    for chunk in _chunks(writes, chunk_size):
+        supabase.table('events').upsert(chunk, on_conflict="data_hash").execute()
+
+
+def sync_future_events(supabase, today: str, events: List[Dict]) -> Dict[str, int]:
+    """
+    未来のautoイベントを差分同期し、件数 {"inserted","updated","deleted","unchanged"} を返す。
+    events は refresh_future_events の DB形式（source_url / data_hash 付き）。
+    date < today の行は同期対象外（過去は確定・保護）。
+    """
+    new_rows = [to_db_row(e) for e in events if e.get("date", "") >= today]
+    current_rows = fetch_current_rows(supabase, today)
+    plan = compute_diff(current_rows, new_rows)
+    apply_plan(supabase, plan, today)
+    return plan.counts()
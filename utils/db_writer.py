@@ -0,0 +1,110 @@
+# utils/db_writer.py
+"""
+プロセス全体で共有する Supabase クライアントと書き込みキュー。
+
+- クライアントは1プロセス1つ（初回利用時に生成して使い回す）
+  scripts/refresh_future_events.py の差分同期、notify/dispatch.py の件数取得、
+  各スクレイパーの単体実行時のDB投入がすべて同じクライアントを使う
+- スクレイパーは enqueue() でイベントを積むだけ。flush() で data_hash 重複を除いた上で
+  チャンク単位の upsert にまとめて送信する
+"""
+import os
+import atexit
+import importlib.util
+import threading
+from typing import Dict, List
+
+from utils import metrics
+from utils.db_sync import to_db_row
+from utils.log import get_logger
+
+WRITE_CHUNK_SIZE = 500   # 1リクエストあたりの upsert 件数
+
+_client = None
+_client_lock = threading.Lock()
+
+_queue: Dict[str, Dict] = {}   # data_hash → DB行（同一hashは後勝ち）
+_queue_lock = threading.Lock()
+
+
+def is_available() -> bool:
+    """supabase パッケージが使えるか（import はせず、インストール有無だけを見る）"""
+    return importlib.util.find_spec("supabase") is not None
+
+
+def get_client():
+    """共有クライアントを取得（初回呼び出し時に生成）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    from supabase import create_client
+                except ImportError:
+                    raise RuntimeError("Supabase依存関係が不足: pip install supabase python-dotenv")
+                url = os.getenv("SUPABASE_URL")
+                key = os.getenv("SUPABASE_KEY")
+                if not url or not key:
+                    raise RuntimeError("環境変数 SUPABASE_URL, SUPABASE_KEY が設定されていません")
+                # HTTP_REPLAY=record/replay のときは記録・再生用の httpx クライアントを使う
+                from utils import http_replay
+                _client = create_client(url, key, options=http_replay.supabase_options())
+    return _client
+
+
+def enqueue(events: List[Dict], name: str = "db_writer") -> int:
+    """スクレイパー出力（source / hash キー）をDB行に変換してキューに積む。積んだ件数を返す"""
+    log = get_logger(name)
+    rows = [to_db_row(ev) for ev in events]
+    with _queue_lock:
+        for row in rows:
+            _queue[row["data_hash"]] = row
+    log.info("DB投入キュー: %d件", len(rows))
+    return len(rows)
+
+
+def pending() -> int:
+    with _queue_lock:
+        return len(_queue)
+
+
+def upsert_rows(rows: List[Dict], chunk_size: int = WRITE_CHUNK_SIZE) -> int:
+    """events テーブルへ data_hash をキーにチャンク単位で upsert し、送信件数を返す"""
+    client = get_client()
+    sent = 0
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        client.table('events').upsert(chunk, on_conflict="data_hash").execute()
+        sent += len(chunk)
+        metrics.incr("db_rows_upserted", len(chunk))
+    return sent
+
+
+def flush(name: str = "db_writer") -> int:
+    """
+    キューの内容をまとめて送信する。送信件数を返す。
+    DB失敗は致命的ではない扱い（JSON保存は済んでいる）ため、例外は出さずにログに残す。
+    """
+    log = get_logger(name)
+    with _queue_lock:
+        rows = list(_queue.values())
+        _queue.clear()
+    if not rows:
+        log.info("DB投入: データなし")
+        return 0
+    try:
+        sent = upsert_rows(rows)
+        log.info("DB投入成功: %s件", sent)
+        return sent
+    except Exception as e:
+        log.error("DB投入失敗: %s", e)
+        return 0
+
+
+def _flush_at_exit() -> None:
+    # flush() を呼び忘れた単体実行でもキューを捨てない
+    if pending():
+        flush()
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,19 @@
+# utils/env.py
+"""
+環境変数の数値設定の読み取り（refresh_future_events / html_export / http_client 共通）。
+"""
+import os
+
+from utils.log import get_logger
+
+log = get_logger("env")
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """環境変数を整数として読む（不正値はデフォルト、minimum 未満は minimum に切り上げ）"""
+    try:
+        value = int(os.getenv(name, str(default)))
+    except ValueError:
+        log.warn("Invalid %s, using default %s", name, default)
+        return default
+    return max(minimum, value)
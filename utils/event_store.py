@@ -0,0 +1,150 @@
+# utils/event_store.py
+"""
+ローカルのイベント履歴ストア（SQLite・標準ライブラリのみ）。
+
+refresh_future_events.py が毎回のスクレイプ結果を追記する。data_hash ごとに1行で、
+初めて見た日時（first_seen）・最後に見た日時（last_seen）・観測回数（seen_count）を持つ。
+DB（Supabase）の過去行保護とは独立に、ローカルだけで履歴を引ける:
+  events_in_range("マリンメッセA館", "2026-01-01", "2026-01-31")   # 会場×期間
+  first_seen(data_hash)                                            # いつ初めて掲載されたか
+
+インデックス: (date) / (venue, date) / data_hash（主キー）。
+保存先は EVENT_STORE_PATH（デフォルト storage/events.sqlite3）。ENABLE_EVENT_STORE=0 で無効。
+"""
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.db_sync import to_db_row
+from utils.parser import JST
+from utils.paths import STORAGE_DIR
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    data_hash  TEXT PRIMARY KEY,
+    code       TEXT NOT NULL,
+    venue      TEXT NOT NULL,
+    date       TEXT NOT NULL,
+    time       TEXT,
+    title      TEXT NOT NULL,
+    source_url TEXT,
+    notes      TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen  TEXT NOT NULL,
+    seen_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events (date);
+CREATE INDEX IF NOT EXISTS idx_events_venue_date ON events (venue, date);
+CREATE TABLE IF NOT EXISTS runs (
+    run_at TEXT NOT NULL,
+    code   TEXT NOT NULL,
+    count  INTEGER NOT NULL,
+    PRIMARY KEY (run_at, code)
+);
+"""
+
+# 同じ data_hash の行は DB（db_sync の update）と同じく最新のスクレイプ結果で列を上書きし、first_seen は保持する
+_UPSERT = """
+INSERT INTO events (data_hash, code, venue, date, time, title, source_url, notes, first_seen, last_seen)
+VALUES (:data_hash, :code, :venue, :date, :time, :title, :source_url, :notes, :seen_at, :seen_at)
+ON CONFLICT (data_hash) DO UPDATE SET
+    code       = excluded.code,
+    venue      = excluded.venue,
+    date       = excluded.date,
+    time       = excluded.time,
+    title      = excluded.title,
+    source_url = excluded.source_url,
+    notes      = excluded.notes,
+    last_seen  = excluded.last_seen,
+    seen_count = events.seen_count + 1
+"""
+
+_COLUMNS = ("data_hash", "code", "venue", "date", "time", "title", "source_url", "notes",
+            "first_seen", "last_seen", "seen_count")
+
+
+def event_store_enabled() -> bool:
+    """履歴ストアへの追記の有効/無効（デフォルト有効）"""
+    return os.getenv("ENABLE_EVENT_STORE", "1") == "1"
+
+
+def store_path() -> Path:
+    """SQLiteファイルのパス（EVENT_STORE_PATH > storage/events.sqlite3）"""
+    override = os.getenv("EVENT_STORE_PATH")
+    return Path(override) if override else STORAGE_DIR / "events.sqlite3"
+
+
+def connect(path: Optional[Path] = None) -> sqlite3.Connection:
+    """スキーマを作成済みの接続を返す（呼び出し側で close する）"""
+    path = path or store_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def record_run(scraped: Dict[str, List[Dict]], path: Optional[Path] = None,
+               seen_at: Optional[str] = None) -> int:
+    """
+    会場コード → イベントリスト を1トランザクションで追記し、書き込んだ件数を返す。
+    失敗した会場（scraped に無いコード）は何も書かない。
+    """
+    seen_at = seen_at or datetime.now(JST).isoformat(timespec="seconds")
+    rows = []
+    for code, events in scraped.items():
+        for ev in events:
+            row = to_db_row(ev)
+            if not row["data_hash"] or not row["date"]:
+                continue
+            row["code"] = code
+            row["seen_at"] = seen_at
+            rows.append(row)
+
+    with closing(connect(path)) as conn, conn:
+        conn.executemany(_UPSERT, rows)
+        conn.executemany(
+            "INSERT OR REPLACE INTO runs (run_at, code, count) VALUES (?, ?, ?)",
+            [(seen_at, code, len(events)) for code, events in scraped.items()],
+        )
+    return len(rows)
+
+
+def _to_dicts(cursor) -> List[Dict]:
+    return [{col: row[col] for col in _COLUMNS} for row in cursor]
+
+
+def events_in_range(venue: str, start: str, end: str, path: Optional[Path] = None) -> List[Dict]:
+    """会場名 venue の start〜end（両端含む・YYYY-MM-DD）のイベントを日付・時刻順に返す"""
+    with closing(connect(path)) as conn:
+        return _to_dicts(conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM events"
+            " WHERE venue = ? AND date BETWEEN ? AND ?"
+            " ORDER BY date, COALESCE(time, '99:99'), title",
+            (venue, start, end),
+        ))
+
+
+def events_on(date: str, path: Optional[Path] = None) -> List[Dict]:
+    """指定日の全会場のイベントを返す"""
+    with closing(connect(path)) as conn:
+        return _to_dicts(conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM events WHERE date = ?"
+            " ORDER BY COALESCE(time, '99:99'), venue, title",
+            (date,),
+        ))
+
+
+def first_seen(data_hash: str, path: Optional[Path] = None) -> Optional[str]:
+    """data_hash のイベントを初めて取得した日時（未登録なら None）"""
+    with closing(connect(path)) as conn:
+        row = conn.execute("SELECT first_seen FROM events WHERE data_hash = ?", (data_hash,)).fetchone()
+    return row["first_seen"] if row else None
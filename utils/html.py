@@ -0,0 +1,66 @@
+# utils/html.py
+"""
+スクレイパー共通のHTMLパース処理。
+
+- ツリービルダー: lxml がインストールされていれば lxml（C実装で高速）、なければ標準の html.parser
+  HTML_PARSER=html.parser などで明示的に切り替え可能
+- 部分パース: SoupStrainer を渡すと、該当要素のサブツリーだけを構築する
+  （ヘッダー/フッター/スクリプト等を含むページ全体のツリーを作らない）
+- bs4 は make_soup の初回呼び出しまで import しない。http_cache の解析結果キャッシュが
+  当たった実行（ページ未更新）では bs4 を読み込まずに済む
+"""
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+__all__ = ["SoupStrainer", "best_parser", "make_soup"]
+
+
+class SoupStrainer:
+    """
+    bs4.SoupStrainer の遅延版。引数を保持し、make_soup で使うときに本物を生成する。
+    スクレイパーのモジュール定数（CALENDAR_STRAINER など）を import 時に作っても bs4 を読み込まない。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._strainer = None
+
+    def resolve(self):
+        if self._strainer is None:
+            from bs4 import SoupStrainer as _BS4Strainer
+            self._strainer = _BS4Strainer(*self._args, **self._kwargs)
+        return self._strainer
+
+
+@lru_cache(maxsize=1)
+def _lxml_available() -> bool:
+    try:
+        import lxml  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def best_parser() -> str:
+    """使用するツリービルダー名（HTML_PARSER > lxml > html.parser）"""
+    override = os.getenv("HTML_PARSER")
+    if override:
+        return override
+    return "lxml" if _lxml_available() else "html.parser"
+
+
+def make_soup(html: str, parse_only=None) -> "BeautifulSoup":
+    """
+    HTMLをパースして BeautifulSoup を返す。
+    parse_only 指定時は一致した要素（とその子孫）だけのツリーになる（bs4.SoupStrainer も可）。
+    """
+    from bs4 import BeautifulSoup
+
+    if isinstance(parse_only, SoupStrainer):
+        parse_only = parse_only.resolve()
+    return BeautifulSoup(html, best_parser(), parse_only=parse_only)
@@ -0,0 +1,141 @@
+# utils/http_cache.py
+"""
+スクレイピング対象ページの条件付きGET＋解析結果キャッシュ（URL単位・ディスク保存）。
+
+- 前回の ETag / Last-Modified を If-None-Match / If-Modified-Since で送信
+- 304 Not Modified なら保存済みの本文を再利用（ダウンロードなし）
+- 200 でも本文ハッシュが前回と同じなら、保存済みの解析結果を再利用（BeautifulSoupを回さない）
+
+1日に何度リフレッシュしても、ページが変わっていなければほぼコストゼロになる。
+解析ロジックを変更したときは parser_key のバージョンを上げて古い解析結果を無効化すること。
+HTTP_CACHE=0 で無効化（常に全取得・全解析）。
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from utils import http_client
+from utils.log import get_logger
+from utils.paths import STORAGE_DIR
+from utils.stages import stage
+from utils.storage import atomic_write
+
+DEFAULT_CACHE_DIR = STORAGE_DIR / "http_cache"
+
+
+def cache_enabled() -> bool:
+    return os.getenv("HTTP_CACHE", "1") == "1"
+
+
+def _cache_dir() -> Path:
+    d = Path(os.getenv("HTTP_CACHE_DIR") or DEFAULT_CACHE_DIR)
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def _paths(url: str) -> Dict[str, Path]:
+    base = _cache_dir() / _sha1(url)
+    return {
+        "meta": base.with_suffix(".meta.json"),
+        "body": base.with_suffix(".body"),
+    }
+
+
+def _parsed_path(url: str, parser_key: str) -> Path:
+    return _cache_dir() / f"{_sha1(url)}.{_sha1(parser_key)[:12]}.parsed.json"
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def fetch_text(url: str, headers: Optional[Dict[str, str]] = None,
+               encoding: Optional[str] = None, timeout: float = http_client.DEFAULT_TIMEOUT,
+               name: str = "http_cache") -> Dict[str, Any]:
+    """
+    条件付きGETで本文を取得。
+    戻り値: {"text": 本文, "body_hash": 本文SHA1, "status": HTTPステータス, "not_modified": 304か}
+    HTTPエラーは requests の例外として送出（呼び出し側の従来のエラー処理がそのまま効く）。
+    """
+    log = get_logger(name)
+    paths = _paths(url)
+    meta = _read_json(paths["meta"]) if paths["body"].exists() else None
+
+    req_headers = dict(headers or {})
+    if meta:
+        if meta.get("etag"):
+            req_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            req_headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = http_client.get(url, headers=req_headers, timeout=timeout)
+
+    if r.status_code == 304 and meta:
+        with open(paths["body"], "r", encoding="utf-8") as f:
+            text = f.read()
+        log.debug("304 Not Modified: %s", url)
+        return {"text": text, "body_hash": meta["body_hash"], "status": 304, "not_modified": True}
+
+    r.raise_for_status()
+    if encoding:
+        r.encoding = encoding
+    text = r.text
+    body_hash = _sha1(text)
+
+    if not meta or meta.get("body_hash") != body_hash:
+        atomic_write(paths["body"], text)
+    atomic_write(paths["meta"], json.dumps({
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "body_hash": body_hash,
+    }, ensure_ascii=False))
+
+    return {"text": text, "body_hash": body_hash, "status": r.status_code, "not_modified": False}
+
+
+def fetch_parsed(url: str, parse: Callable[[str], Any], parser_key: str,
+                 headers: Optional[Dict[str, str]] = None, encoding: Optional[str] = None,
+                 timeout: float = http_client.DEFAULT_TIMEOUT, name: str = "http_cache") -> Any:
+    """
+    URLを取得して parse(text) の結果を返す。本文が前回と同じなら保存済みの解析結果を返す。
+    parse の戻り値はJSON化できる値（list/dict）であること。
+    """
+    log = get_logger(name)
+    if not cache_enabled():
+        r = http_client.get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        if encoding:
+            r.encoding = encoding
+        with stage("parse"):
+            return parse(r.text)
+
+    fetched = fetch_text(url, headers=headers, encoding=encoding, timeout=timeout, name=name)
+
+    parsed_path = _parsed_path(url, parser_key)
+    cached = _read_json(parsed_path)
+    if cached and cached.get("body_hash") == fetched["body_hash"] and cached.get("parser_key") == parser_key:
+        log.debug("Unchanged content, reusing parsed result: %s", url)
+        return cached["result"]
+
+    with stage("parse"):
+        result = parse(fetched["text"])
+    try:
+        atomic_write(parsed_path, json.dumps({
+            "parser_key": parser_key,
+            "body_hash": fetched["body_hash"],
+            "result": result,
+        }, ensure_ascii=False))
+    except (OSError, TypeError, ValueError) as e:
+        log.warn("Failed to cache parsed result for %s: %s", url, e)
+    return result
@@ -0,0 +1,171 @@
+# utils/http_client.py
+"""
+全スクレイパー共通のHTTPクライアント。
+
+- プロセス全体で1つの requests.Session を共有（コネクションプール・keep-alive）
+- 429/5xx・接続エラー時は指数バックオフでリトライ
+- ホストごとの同時リクエスト数を制限（マリンメッセ系4会場は同じCMSホストに集中するため）
+- リクエスト単位の所要時間を記録し、実行の最後に集計ログを出せるようにする
+"""
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import http_replay
+from utils.env import env_int
+from utils.log import get_logger
+from utils.stages import stage
+
+log = get_logger("http_client")
+
+DEFAULT_TIMEOUT = 15
+
+# 同一ホストへの同時リクエスト数（HTTP_PER_HOST_LIMIT で上書き可）
+# 並列スクレイパー（refresh_future_events）の同一ホスト制限もこの値だけで行う
+DEFAULT_PER_HOST_LIMIT = 2
+# 接続プールの大きさ（ホスト数・ホストあたり接続数）
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
+# リトライ設定（HTTP_RETRIES で回数を上書き可）
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class RequestStat:
+    """1リクエスト分の計測結果"""
+    method: str
+    url: str
+    host: str
+    status: Optional[int]
+    elapsed_ms: int
+    bytes: int
+    error: Optional[str] = None
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+_stats: List[RequestStat] = []
+_stats_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=env_int("HTTP_RETRIES", DEFAULT_RETRIES, minimum=0),
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,  # 最終的なステータスは呼び出し側の raise_for_status() に任せる
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    if http_replay.mode() is not None:
+        # HTTP_REPLAY=record/replay: 実通信の記録・アーカイブからの再生（utils/http_replay.py）
+        adapter = http_replay.ReplayAdapter(adapter, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """共有セッションを取得（初回呼び出し時に生成）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def per_host_limit() -> int:
+    """同一ホストへの同時リクエスト数の上限"""
+    return env_int("HTTP_PER_HOST_LIMIT", DEFAULT_PER_HOST_LIMIT)
+
+
+def _host_slot(host: str) -> threading.BoundedSemaphore:
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(per_host_limit())
+            _host_slots[host] = slot
+        return slot
+
+
+def _record(stat: RequestStat) -> None:
+    with _stats_lock:
+        _stats.append(stat)
+
+
+def request(method: str, url: str, timeout: float = DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """共有セッション経由でリクエストを送信し、所要時間を記録する"""
+    host = urlparse(url).netloc
+    with stage("fetch"), _host_slot(host):
+        t0 = time.perf_counter()
+        try:
+            r = get_session().request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            elapsed_ms = int((time.perf_counter() - t0) * 1000)
+            _record(RequestStat(method, url, host, None, elapsed_ms, 0, str(e)))
+            raise
+        elapsed_ms = int((time.perf_counter() - t0) * 1000)
+    _record(RequestStat(method, url, host, r.status_code, elapsed_ms, len(r.content)))
+    return r
+
+
+def get(url: str, timeout: float = DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """requests.get 互換のGET"""
+    return request("GET", url, timeout=timeout, **kwargs)
+
+
+# ---- 計測結果 ----------------------------------------------------------------
+def get_stats() -> List[RequestStat]:
+    with _stats_lock:
+        return list(_stats)
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def summarize_stats() -> Dict[str, Dict[str, int]]:
+    """ホスト別に リクエスト数 / エラー数 / 合計・最大所要時間 / 受信バイト数 を集計"""
+    summary: Dict[str, Dict[str, int]] = {}
+    for s in get_stats():
+        h = summary.setdefault(s.host, {"requests": 0, "errors": 0, "total_ms": 0, "max_ms": 0, "bytes": 0})
+        h["requests"] += 1
+        if s.error or (s.status is not None and s.status >= 400):
+            h["errors"] += 1
+        h["total_ms"] += s.elapsed_ms
+        h["max_ms"] = max(h["max_ms"], s.elapsed_ms)
+        h["bytes"] += s.bytes
+    return summary
+
+
+def log_stats_summary() -> None:
+    """ホスト別集計を所要時間の大きい順にログ出力"""
+    summary = summarize_stats()
+    if not summary:
+        log.info("no requests recorded")
+        return
+    for host, h in sorted(summary.items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+        log.info(
+            "host=%s requests=%d errors=%d total_ms=%d max_ms=%d bytes=%d",
+            host, h["requests"], h["errors"], h["total_ms"], h["max_ms"], h["bytes"],
+        )
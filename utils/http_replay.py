@@ -0,0 +1,334 @@
+# utils/http_replay.py
+"""
+外部HTTP通信の記録・再生（オフライン実行・負荷試験・障害日の再現用）。
+
+HTTP_REPLAY=record : 実際に通信し、応答をアーカイブに保存する
+HTTP_REPLAY=replay : 通信せず、アーカイブの応答を返す（遅延・エラーを注入可能）
+未設定 / off       : 何もしない（通常実行）
+
+対象は utils.http_client の共有セッション（全スクレイパー・Slack/LINE通知）と、
+utils.db_writer / notify.html_export の Supabase クライアント（httpx）。
+
+アーカイブ（HTTP_REPLAY_DIR、デフォルト storage/http_replay/）:
+  blobs/<sha256>            応答本文（内容のハッシュで保存。同じ本文は1つだけ）
+  entries/<url鍵>/<本文鍵>.json  リクエスト（メソッド＋URL＋リクエスト本文）→ ステータス・ヘッダ・本文ハッシュ・所要時間
+再生時はリクエスト本文まで一致する記録を優先し、なければ同じメソッド＋URLの最新の記録を返す
+（upsert のように毎回本文が変わるリクエスト用）。該当なしは 404 を返す。
+リクエストヘッダ（APIキー・トークン）は保存しない。Slack Webhook のURLはホスト名のみ保存する。
+
+再生時の注入（HTTP_REPLAY=replay のときのみ）:
+  HTTP_REPLAY_LATENCY_MS  未設定=記録時の所要時間 / "0"=遅延なし / "80"=固定 / "50-300"=一様乱数
+  HTTP_REPLAY_ERROR_RATE  エラーを返す確率（0〜1、デフォルト0）
+  HTTP_REPLAY_ERROR       注入するエラー: timeout / connection / 5xx のステータス（デフォルト 503）
+  HTTP_REPLAY_SEED        乱数シード（同じ値なら同じ順序で遅延・エラーが起きる）
+注入したエラーにも http_client のリトライ設定（GET/HEAD、502/503/504 等）を適用する。
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from utils.log import get_logger
+from utils.paths import STORAGE_DIR
+from utils.storage import atomic_write
+
+log = get_logger("http_replay")
+
+MODES = ("record", "replay")
+DEFAULT_ERROR = "503"
+
+# 保存する応答ヘッダ（本文のデコード・http_cache の条件付きGET・Supabase の件数取得に必要なものだけ。
+# 本文は展開済みで保存するため content-encoding は持たない）
+KEPT_HEADERS = ("content-type", "etag", "last-modified", "content-range")
+
+# URLにシークレットを含むホスト（アーカイブにはホスト名のみ保存）
+REDACTED_HOSTS = ("hooks.slack.com",)
+
+# 記録時に外すリクエストヘッダ（条件付きGETの304ではなく、常に本文付きの応答を保存する）
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+_rng_lock = threading.Lock()
+_rng: Optional[random.Random] = None
+
+_counts: Dict[str, int] = {}
+_counts_lock = threading.Lock()
+
+
+def mode() -> Optional[str]:
+    """HTTP_REPLAY の値（record / replay）。無効なら None"""
+    value = os.getenv("HTTP_REPLAY", "").strip().lower()
+    if value in ("", "0", "off"):
+        return None
+    if value not in MODES:
+        log.warn("Invalid HTTP_REPLAY=%s, disabled", value)
+        return None
+    return value
+
+
+def archive_dir() -> Path:
+    override = os.getenv("HTTP_REPLAY_DIR")
+    return Path(override) if override else STORAGE_DIR / "http_replay"
+
+
+def _count(key: str) -> None:
+    with _counts_lock:
+        _counts[key] = _counts.get(key, 0) + 1
+
+
+def summary() -> Dict[str, int]:
+    """record / hit / fallback / miss / injected_error の件数"""
+    with _counts_lock:
+        return dict(_counts)
+
+
+def log_summary() -> None:
+    current = mode()
+    if current is None:
+        return
+    counts = summary()
+    detail = " ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "no requests"
+    log.info("mode=%s dir=%s %s", current, archive_dir(), detail)
+
+
+# ------------------------------------------------------------
+# アーカイブ
+# ------------------------------------------------------------
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_dir(root: Path, method: str, url: str) -> Path:
+    return root / "entries" / _sha256(f"{method.upper()} {url}".encode("utf-8"))[:32]
+
+
+def _display_url(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.netloc in REDACTED_HOSTS:
+        return f"{parsed.scheme}://{parsed.netloc}/<redacted>"
+    return url
+
+
+def store(method: str, url: str, body: Optional[bytes], status: int,
+          headers, content: bytes, elapsed_ms: int) -> None:
+    """1リクエスト分の応答をアーカイブに保存する"""
+    root = archive_dir()
+    blob = _sha256(content)
+    blob_path = root / "blobs" / blob
+    if not blob_path.exists():
+        atomic_write(blob_path, content)
+
+    kept = {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS}
+    entry = {
+        "method": method.upper(),
+        "url": _display_url(url),
+        "status": status,
+        "headers": kept,
+        "blob": blob,
+        "elapsed_ms": elapsed_ms,
+        "recorded_at": time.time(),
+    }
+    path = _entry_dir(root, method, url) / f"{_sha256(body or b'')[:32]}.json"
+    atomic_write(path, json.dumps(entry, ensure_ascii=False, indent=1).encode("utf-8"))
+    _count("record")
+
+
+def lookup(method: str, url: str, body: Optional[bytes]) -> Optional[Tuple[Dict, bytes]]:
+    """記録済みの (entry, 本文) を返す。なければ None"""
+    root = archive_dir()
+    entries = _entry_dir(root, method, url)
+    path = entries / f"{_sha256(body or b'')[:32]}.json"
+    if path.exists():
+        _count("hit")
+    else:
+        candidates = sorted(entries.glob("*.json"), key=lambda p: p.stat().st_mtime) if entries.exists() else []
+        if not candidates:
+            _count("miss")
+            return None
+        path = candidates[-1]
+        _count("fallback")
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    return entry, (root / "blobs" / entry["blob"]).read_bytes()
+
+
+# ------------------------------------------------------------
+# 遅延・エラーの注入
+# ------------------------------------------------------------
+def _random() -> random.Random:
+    global _rng
+    with _rng_lock:
+        if _rng is None:
+            seed = os.getenv("HTTP_REPLAY_SEED")
+            _rng = random.Random(seed)
+        return _rng
+
+
+def _latency_seconds(recorded_ms: int) -> float:
+    spec = os.getenv("HTTP_REPLAY_LATENCY_MS")
+    if spec is None or not spec.strip():
+        return recorded_ms / 1000
+    try:
+        if "-" in spec:
+            lo, hi = (float(x) for x in spec.split("-", 1))
+            return _random().uniform(lo, hi) / 1000
+        return float(spec) / 1000
+    except ValueError:
+        log.warn("Invalid HTTP_REPLAY_LATENCY_MS=%s, using recorded latency", spec)
+        return recorded_ms / 1000
+
+
+def _injected_error() -> Optional[str]:
+    """注入するエラー種別（timeout / connection / ステータス文字列）。注入しないなら None"""
+    try:
+        rate = float(os.getenv("HTTP_REPLAY_ERROR_RATE", "0"))
+    except ValueError:
+        rate = 0.0
+    if rate <= 0 or _random().random() >= rate:
+        return None
+    _count("injected_error")
+    return os.getenv("HTTP_REPLAY_ERROR", DEFAULT_ERROR).strip().lower()
+
+
+def replay(method: str, url: str, body: Optional[bytes]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    再生: (ステータス, ヘッダ, 本文) を返す。注入エラーが timeout / connection の場合は
+    TimeoutError / ConnectionError を送出する（呼び出し側で各クライアントの例外に変換する）。
+    """
+    found = lookup(method, url, body)
+    if found is None:
+        time.sleep(_latency_seconds(0))
+        return 404, {"Content-Type": "text/plain"}, b"not recorded"
+    entry, content = found
+    time.sleep(_latency_seconds(entry.get("elapsed_ms", 0)))
+
+    error = _injected_error()
+    if error == "timeout":
+        raise TimeoutError(f"injected timeout: {_display_url(url)}")
+    if error == "connection":
+        raise ConnectionError(f"injected connection error: {_display_url(url)}")
+    if error and error.isdigit():
+        return int(error), {"Content-Type": "text/plain"}, b"injected error"
+    return entry["status"], entry["headers"], content
+
+
+# ------------------------------------------------------------
+# requests 用アダプタ（utils.http_client の共有セッションにマウント）
+# ------------------------------------------------------------
+class ReplayAdapter(BaseAdapter):
+    """record: 実アダプタで送信して保存 / replay: アーカイブから応答を組み立てる"""
+
+    def __init__(self, delegate: BaseAdapter, max_retries=None):
+        super().__init__()
+        self.delegate = delegate
+        self.max_retries = max_retries
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        if mode() == "record":
+            for name in CONDITIONAL_HEADERS:
+                request.headers.pop(name, None)
+            t0 = time.perf_counter()
+            r = self.delegate.send(request, stream=False, timeout=timeout, verify=verify,
+                                   cert=cert, proxies=proxies)
+            elapsed_ms = int((time.perf_counter() - t0) * 1000)
+            store(request.method, request.url, body, r.status_code, r.headers, r.content, elapsed_ms)
+            return r
+        return self._send_replay(request, body)
+
+    def _send_replay(self, request, body):
+        retry = self.max_retries
+        attempts = (retry.total or 0) if retry is not None else 0
+        retryable = retry is not None and request.method.upper() in (retry.allowed_methods or ())
+        for attempt in range(attempts + 1):
+            last = attempt >= attempts or not retryable
+            try:
+                status, headers, content = replay(request.method, request.url, body)
+            except TimeoutError as e:
+                if last:
+                    raise requests.Timeout(str(e), request=request)
+            except ConnectionError as e:
+                if last:
+                    raise requests.ConnectionError(str(e), request=request)
+            else:
+                if last or status not in (retry.status_forcelist or ()):
+                    return self._build_response(request, status, headers, content)
+            time.sleep(retry.backoff_factor * (2 ** attempt))
+
+    def _build_response(self, request, status, headers, content) -> requests.Response:
+        r = requests.Response()
+        r.status_code = status
+        r.headers = CaseInsensitiveDict(headers)
+        r.encoding = get_encoding_from_headers(r.headers)
+        r._content = content
+        r.url = request.url
+        r.request = request
+        r.reason = "Replayed"
+        r.connection = self
+        return r
+
+    def close(self):
+        self.delegate.close()
+
+
+# ------------------------------------------------------------
+# httpx 用トランスポート（Supabase クライアント）
+# ------------------------------------------------------------
+def httpx_client():
+    """記録・再生が有効なら、そのトランスポートを使う httpx.Client を返す。無効なら None"""
+    if mode() is None:
+        return None
+    import httpx
+
+    class ReplayTransport(httpx.BaseTransport):
+        def __init__(self):
+            self.delegate = httpx.HTTPTransport()
+
+        def handle_request(self, request):
+            body = request.read()
+            url = str(request.url)
+            if mode() == "record":
+                t0 = time.perf_counter()
+                response = self.delegate.handle_request(request)
+                content = response.read()
+                elapsed_ms = int((time.perf_counter() - t0) * 1000)
+                store(request.method, url, body, response.status_code, response.headers, content, elapsed_ms)
+                headers = [(k, v) for k, v in response.headers.items()
+                           if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+                return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+            try:
+                status, headers, content = replay(request.method, url, body)
+            except TimeoutError as e:
+                raise httpx.ReadTimeout(str(e), request=request)
+            except ConnectionError as e:
+                raise httpx.ConnectError(str(e), request=request)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+        def close(self):
+            self.delegate.close()
+
+    return httpx.Client(transport=ReplayTransport(), follow_redirects=True)
+
+
+def supabase_options():
+    """
+    create_client(url, key, options=...) に渡す ClientOptions（記録・再生が無効なら None）。
+    httpx_client を受け付けない古い supabase では警告して通常通信に戻す。
+    """
+    client = httpx_client()
+    if client is None:
+        return None
+    from supabase import ClientOptions
+    try:
+        return ClientOptions(httpx_client=client)
+    except TypeError:
+        log.warn("supabase does not accept httpx_client; Supabase calls are not recorded")
+        return None
@@ -0,0 +1,103 @@
+# utils/identity.py
+"""
+イベントの同一性（hash）を決める正規化とSHA1計算の共通処理。
+
+各スクレイパーにコピーされていた _normalize_for_hash をまとめたもの。
+既存の hash 値（DBの data_hash）を変えないため、会場ごとに異なっていた置換内容を
+プロファイルとしてそのまま残している:
+  standard : “ ” ‟ 〝 〞 → "  ／  ‘ ’ ＇ → '          （マリンメッセ系 utils/marinemesse_api）
+  legacy   : ‟ 〝 〞 → "  ／  ＇ → '                  （paypay_dome / paypay_dome_events / best_denki_stadium）
+             旧実装は “ ” ‘ ’ の置換が文字化けで無効になっていたため、それに合わせて置換しない
+  sunpalace: “ ” ‟ → "  ／  ‘ ’ → '  ／  〜 → ～, －/― → −（scrapers/sunpalace）
+いずれも NFKC → 置換 → 空白圧縮 → trim の順で、置換は str.translate の1パスで行う。
+
+正規化結果は LRU でキャッシュする（会場名は毎回同じ、タイトルも同じ公演が日付ごとに並ぶ）。
+"""
+import re
+import hashlib
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+# 正規化結果のキャッシュ件数（タイトルの種類数より十分大きく）
+TITLE_CACHE_SIZE = 8192
+
+_WS = re.compile(r"\s+")
+
+_PROFILES: Dict[str, dict] = {
+    "standard": str.maketrans({
+        "“": '"', "”": '"', "‟": '"', "〝": '"', "〞": '"',
+        "‘": "'", "’": "'", "＇": "'",
+    }),
+    "legacy": str.maketrans({
+        "‟": '"', "〝": '"', "〞": '"',
+        "＇": "'",
+    }),
+    "sunpalace": str.maketrans({
+        "“": '"', "”": '"', "‟": '"',
+        "‘": "'", "’": "'",
+        "〜": "～", "－": "−", "―": "−",
+    }),
+}
+PROFILES = tuple(_PROFILES)
+
+
+def _normalize(s: str, profile: str) -> str:
+    x = unicodedata.normalize("NFKC", s).translate(_PROFILES[profile])
+    return _WS.sub(" ", x).strip()
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def _normalize_title(s: str, profile: str) -> str:
+    return _normalize(s, profile)
+
+
+@lru_cache(maxsize=64)
+def _normalize_venue(s: str, profile: str) -> str:
+    return _normalize(s, profile)
+
+
+def normalize_for_hash(s: Optional[str], profile: str = "standard") -> str:
+    """ハッシュ用の軽量正規化（None は空文字）"""
+    if s is None:
+        return ""
+    return _normalize_title(s, profile)
+
+
+def sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def event_hash(date: str, time: Optional[str], title: Optional[str], venue: Optional[str],
+               profile: str = "standard", include_time: bool = True) -> str:
+    """
+    1件分の hash。キーは "date|time|title|venue"（include_time=False なら "date|title|venue"）。
+    """
+    title_norm = normalize_for_hash(title, profile)
+    venue_norm = "" if venue is None else _normalize_venue(venue, profile)
+    if include_time:
+        key = f"{date}|{time or ''}|{title_norm}|{venue_norm}"
+    else:
+        key = f"{date}|{title_norm}|{venue_norm}"
+    return sha1(key)
+
+
+def hash_events(items: Iterable[Dict], profile: str = "standard", include_time: bool = True,
+                venue: Optional[str] = None) -> List[str]:
+    """
+    イベントdictの列に対する event_hash のバッチ版（items と同じ順序）。
+    venue 指定時は各イベントの venue の代わりに使う（会場固定のスクレイパー用）。
+    """
+    return [
+        event_hash(
+            it.get("date", ""), it.get("time"), it.get("title", ""),
+            venue if venue is not None else it.get("venue", ""),
+            profile, include_time,
+        )
+        for it in items
+    ]
+
+
+def cache_info() -> Dict[str, object]:
+    """正規化キャッシュの統計（ベンチマーク・調査用）"""
+    return {"title": _normalize_title.cache_info(), "venue": _normalize_venue.cache_info()}
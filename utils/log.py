@@ -0,0 +1,84 @@
+# utils/log.py
+"""
+スクレイパー・通知・オーケストレーター共通のログ出力（レベル付き・遅延フォーマット）。
+
+出力形式は従来の print と同じ "[name] ..." / "[name][WARN] ..." 形式（GitHub Actions のログでそのまま読める）。
+LOG_LEVEL=DEBUG|INFO|WARN|ERROR でしきい値を指定（デフォルト INFO）。
+
+しきい値未満のメッセージはフォーマット自体を行わない:
+  log.debug("row %d: %s", i, text)          # % 展開は DEBUG 有効時のみ
+  log.debug(lambda: td.prettify()[:500])    # 関数は DEBUG 有効時のみ呼ばれる
+  if log.debug_enabled(): ...               # まとまった調査用処理はブロックごとスキップ
+"""
+import os
+from typing import Any, Callable, Dict, Optional, Union
+
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+_LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "WARNING": WARN, "ERROR": ERROR}
+_LEVEL_TAGS = {DEBUG: "[DEBUG]", INFO: "", WARN: "[WARN]", ERROR: "[ERROR]"}
+
+_threshold: Optional[int] = None
+_loggers: Dict[str, "Logger"] = {}
+
+Message = Union[str, Callable[[], Any]]
+
+
+def get_level() -> int:
+    """現在のしきい値（初回に LOG_LEVEL を読む）"""
+    global _threshold
+    if _threshold is None:
+        _threshold = _LEVEL_NAMES.get(os.getenv("LOG_LEVEL", "INFO").strip().upper(), INFO)
+    return _threshold
+
+
+def set_level(level: Union[int, str, None]) -> None:
+    """しきい値を変更（None で LOG_LEVEL の再読込）"""
+    global _threshold
+    if isinstance(level, str):
+        level = _LEVEL_NAMES.get(level.strip().upper(), INFO)
+    _threshold = level
+
+
+class Logger:
+    """名前付きロガー。出力は "[name]" プレフィックス付きの print"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= get_level()
+
+    def debug_enabled(self) -> bool:
+        return self.is_enabled_for(DEBUG)
+
+    def log(self, level: int, msg: Message, *args: Any) -> None:
+        if level < get_level():
+            return
+        if callable(msg):
+            msg = msg()
+        text = str(msg) % args if args else str(msg)
+        print(f"[{self.name}]{_LEVEL_TAGS[level]} {text}")
+
+    def debug(self, msg: Message, *args: Any) -> None:
+        self.log(DEBUG, msg, *args)
+
+    def info(self, msg: Message, *args: Any) -> None:
+        self.log(INFO, msg, *args)
+
+    def warn(self, msg: Message, *args: Any) -> None:
+        self.log(WARN, msg, *args)
+
+    def error(self, msg: Message, *args: Any) -> None:
+        self.log(ERROR, msg, *args)
+
+
+def get_logger(name: str) -> Logger:
+    """名前ごとに1つのロガーを返す"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
@@ -0,0 +1,207 @@
+# utils/metrics.py
+"""
+1回の実行（refresh / html_export）の計測値を集めて、ランレポートとして書き出す。
+
+- 段階別時間: utils.stages の StageRecorder をスコープ（スクレイパー名など）ごとに add_stages() で登録
+- フェーズ時間: with phase("db_sync"): のように実行の区切りごとに計測
+- カウンタ: incr("db_rows_upserted", n) / incr("events_scraped", n, scope="sunpalace")
+- HTTP: utils.http_client の計測結果（ホスト別のリクエスト数・エラー数・受信バイト数）を取り込む
+
+write_report() が METRICS_DIR（デフォルト storage/metrics/）に
+  {job}_run.json  … 機械可読のランレポート
+  {job}.prom      … OpenMetrics テキスト（Prometheus の textfile collector などで読める形式）
+を出力する（前回分は上書き）。ENABLE_METRICS=0 で書き出しのみ無効化（集計は常に行う）。
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.paths import STORAGE_DIR
+from utils.stages import STAGES, StageRecorder
+from utils.storage import atomic_write
+
+JST = timezone(timedelta(hours=9))
+METRIC_PREFIX = "event_notify"
+
+_lock = threading.Lock()
+_job = "run"
+_started_at: Optional[datetime] = None
+_t0 = time.perf_counter()
+_stages: Dict[str, Dict[str, List[float]]] = {}   # スコープ → 段階 → [秒, 回数]
+_walls: Dict[str, float] = {}                     # スコープ → 所要時間（秒）
+_phases: Dict[str, float] = {}                    # フェーズ → 所要時間（秒）
+_counters: Dict[str, Dict[str, float]] = {}       # カウンタ名 → スコープ → 値
+
+
+def metrics_enabled() -> bool:
+    """ランレポートの書き出しの有効/無効（デフォルト有効）"""
+    return os.getenv("ENABLE_METRICS", "1") == "1"
+
+
+def metrics_dir() -> Path:
+    override = os.getenv("METRICS_DIR")
+    return Path(override) if override else STORAGE_DIR / "metrics"
+
+
+def start(job: str) -> None:
+    """新しい実行として計測をリセットする（HTTP の計測結果は http_client 側でそのまま保持）"""
+    global _job, _started_at, _t0
+    with _lock:
+        _job = job
+        _started_at = datetime.now(JST)
+        _t0 = time.perf_counter()
+        _stages.clear()
+        _walls.clear()
+        _phases.clear()
+        _counters.clear()
+
+
+def add_stages(scope: str, recorder: StageRecorder, wall: Optional[float] = None) -> None:
+    """StageRecorder の結果をスコープに加算する（同じスコープへの複数回の登録は合算）"""
+    totals = recorder.totals()
+    calls = recorder.calls()
+    with _lock:
+        per_scope = _stages.setdefault(scope, {})
+        for name, seconds in totals.items():
+            entry = per_scope.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls.get(name, 0)
+        if wall is not None:
+            _walls[scope] = _walls.get(scope, 0.0) + wall
+
+
+@contextmanager
+def phase(name: str):
+    """ブロックの所要時間をフェーズ name に加算する"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _lock:
+            _phases[name] = _phases.get(name, 0.0) + elapsed
+
+
+def incr(name: str, value: float = 1, scope: str = "run") -> None:
+    with _lock:
+        per_scope = _counters.setdefault(name, {})
+        per_scope[scope] = per_scope.get(scope, 0) + value
+
+
+def wall_seconds() -> float:
+    return time.perf_counter() - _t0
+
+
+# ------------------------------------------------------------
+# レポート
+# ------------------------------------------------------------
+def _ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
+
+def slowest_stages(report: Dict, top: int = 3) -> List[Tuple[str, str, int]]:
+    """(スコープ, 段階, ms) を所要時間の大きい順に top 件"""
+    rows = [
+        (scope, name, ms)
+        for scope, per_scope in report.get("stages_ms", {}).items()
+        for name, ms in per_scope.items()
+    ]
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return rows[:top]
+
+
+def build_report() -> Dict:
+    """現時点までの計測値をランレポート（JSON化できる dict）にまとめる"""
+    # http_client（requests）を読み込んでいない実行（html_export）では HTTP の計測結果はない
+    http_client = sys.modules.get("utils.http_client")
+    http = http_client.summarize_stats() if http_client is not None else {}
+    with _lock:
+        stage_totals: Dict[str, List[float]] = {}
+        for per_scope in _stages.values():
+            for name, (seconds, calls) in per_scope.items():
+                entry = stage_totals.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+        order = list(STAGES) + sorted(set(stage_totals) - set(STAGES))
+        report = {
+            "job": _job,
+            "started_at": _started_at.isoformat() if _started_at else None,
+            "wall_ms": _ms(wall_seconds()),
+            "phases_ms": {name: _ms(s) for name, s in _phases.items()},
+            "scopes_ms": {scope: _ms(s) for scope, s in _walls.items()},
+            "stages_ms": {
+                scope: {name: _ms(v[0]) for name, v in per_scope.items()}
+                for scope, per_scope in _stages.items()
+            },
+            "stage_totals_ms": {name: _ms(stage_totals[name][0]) for name in order if name in stage_totals},
+            "stage_calls": {name: int(stage_totals[name][1]) for name in order if name in stage_totals},
+            "counters": {name: dict(per_scope) for name, per_scope in _counters.items()},
+        }
+    report["http"] = {
+        "requests": sum(h["requests"] for h in http.values()),
+        "errors": sum(h["errors"] for h in http.values()),
+        "bytes": sum(h["bytes"] for h in http.values()),
+        "hosts": http,
+    }
+    return report
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_openmetrics(report: Dict) -> str:
+    """ランレポートを OpenMetrics テキスト形式に変換する（秒単位・# EOF で終端）"""
+    job = report["job"]
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str, samples):
+        full = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# TYPE {full} {kind}")
+        lines.append(f"# HELP {full} {help_text}")
+        suffix = "_total" if kind == "counter" else ""
+        for labels, value in samples:
+            text = ",".join(f'{k}="{_label(str(v))}"' for k, v in (("job", job), *labels))
+            lines.append(f"{full}{suffix}{{{text}}} {value}")
+
+    family("run_wall_seconds", "gauge", "Wall time of the run.",
+           [((), report["wall_ms"] / 1000)])
+    family("phase_seconds", "gauge", "Wall time per run phase.",
+           [((("phase", p),), ms / 1000) for p, ms in report["phases_ms"].items()])
+    family("scope_seconds", "gauge", "Wall time per scraper or writer.",
+           [((("scope", s),), ms / 1000) for s, ms in report["scopes_ms"].items()])
+    family("stage_seconds", "gauge", "Exclusive time per pipeline stage.",
+           [((("scope", s), ("stage", n)), ms / 1000)
+            for s, per_scope in report["stages_ms"].items() for n, ms in per_scope.items()])
+    family("stage_calls", "counter", "Number of pipeline stage executions.",
+           [((("stage", n),), c) for n, c in report["stage_calls"].items()])
+    family("http_requests", "counter", "HTTP requests per host.",
+           [((("host", h),), v["requests"]) for h, v in report["http"]["hosts"].items()])
+    family("http_errors", "counter", "HTTP errors per host.",
+           [((("host", h),), v["errors"]) for h, v in report["http"]["hosts"].items()])
+    family("http_received_bytes", "counter", "HTTP response bytes per host.",
+           [((("host", h),), v["bytes"]) for h, v in report["http"]["hosts"].items()])
+    for name, per_scope in sorted(report["counters"].items()):
+        family(name, "counter", f"Run counter {name}.",
+               [((("scope", s),), v) for s, v in per_scope.items()])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report: Optional[Dict] = None) -> Optional[Tuple[Path, Path]]:
+    """ランレポートを JSON と OpenMetrics で書き出し、(json, prom) のパスを返す（無効なら None）"""
+    if not metrics_enabled():
+        return None
+    report = report or build_report()
+    out_dir = metrics_dir()
+    json_path = out_dir / f"{report['job']}_run.json"
+    prom_path = out_dir / f"{report['job']}.prom"
+    atomic_write(json_path, json.dumps(report, ensure_ascii=False, indent=2))
+    atomic_write(prom_path, to_openmetrics(report))
+    return json_path, prom_path
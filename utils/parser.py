@@ -1,6 +1,8 @@
 # utils/parser.py
 import re
 from datetime import date, time as dtime, datetime, timezone, timedelta
+from functools import lru_cache
+from typing import Callable, Iterable
 
 JST = timezone(timedelta(hours=9))
 
@@ -17,6 +19,21 @@ _RANGE_PAT = re.compile(
 # 時刻は「～」の有無や後続文字を気にせず拾えるように（例: 10:00 / 10:00～18:00）
 _TIME_ANY = re.compile(r'(?P<h>\d{1,2}):(?P<mi>\d{2})')
 
+# parse_many の展開結果キャッシュ件数（日程文字列の種類数より十分大きく）
+PARSE_CACHE_SIZE = 4096
+
+# 全角/半角の揺れを1パスで標準化する変換表（〜→～, －→-, —→–）
+_DASH_TABLE = str.maketrans({'〜': '～', '－': '-', '—': '–'})
+
+def parse_context(now: datetime | None = None) -> tuple[int, int]:
+    """
+    自動年推定に使う「現在」の (年, 月)。
+    バッチ処理では呼び出し側で1回だけ計算し、split_and_normalize(context=...) に渡す。
+    """
+    if now is None:
+        now = datetime.now(JST)
+    return now.year, now.month
+
 def _expand_dates(y: int, m1: int, d1: int, m2: int, d2: int):
     """年 y で [m1/d1 .. m2/d2] を両端含めて日ごと展開。
     年跨ぎ対応: m2 < m1 の場合は終了日を翌年として展開する。
@@ -50,31 +67,19 @@ def _infer_year(base_year: int, month: int, current_month: int) -> int:
         return base_year + 1
     return base_year
 
-def split_and_normalize(dt_text: str, title: str, venue: str, year: int | None = None):
-    """
-    '8.29(金) 10:30～ 14:00～ 8.30(土) 10:00～'
-      → [{'date':'YYYY-MM-DD','time':'HH:MM','title':..., 'venue':...}, ...]
+def _normalize_text(dt_text: str) -> str:
+    """'|' 以降の施設備考を落とし、全角/半角の揺れを軽く標準化する（展開結果のキャッシュキーにもなる）"""
+    return dt_text.split('|', 1)[0].strip().translate(_DASH_TABLE)
 
-    '8.13(水)～8.31(日) 10:00～18:00'
-      → 8/13〜8/31 を日ごと展開（時間は先頭の 10:00 を採用）
-      
-    '9.3(水)～7(日)'  ← 月省略パターンに対応
-      → 9/3〜9/7 を日ごと展開（開始月を終了日にも適用）
-      
-    '12.30(火)～1.2(金)' ← 年跨ぎ対応
-      → 12/30〜翌年1/2 を日ごと展開
-    """
+def _expand_slots(left: str, year: int | None, context: tuple[int, int]) -> list[tuple[str, str | None]]:
+    """正規化済み日程文字列を (date, time) のリストに展開する（タイトル・会場は付けない）"""
+    _current_year, _current_month = context
     # year=None → 自動推定モード（年跨ぎ補正あり）
     _auto_infer = (year is None)
     if year is None:
-        year = datetime.now(JST).year
-    _current_month = datetime.now(JST).month
+        year = _current_year
 
     out = []
-    # '|' 以降に施設備考が来ることがあるので手前だけ使う
-    left = dt_text.split('|', 1)[0].strip()
-    # 全角/半角の揺れを軽く標準化
-    left = left.replace('〜', '～').replace('－', '-').replace('—', '–')
 
     # 1) 期間表記（レンジ）を先に処理
     rm = _RANGE_PAT.search(left)
@@ -94,17 +99,11 @@ def split_and_normalize(dt_text: str, title: str, venue: str, year: int | None =
                 pass
         use_time = times[0] if times else None
 
-        for d in _expand_dates(year, m1, d1, m2, d2):
-            out.append({
-                "date": d.strftime("%Y-%m-%d"),
-                "time": use_time,     # 展示などは開始時刻のみ。方針次第で None や終日にも可。
-                "title": title,
-                "venue": venue
-            })
-        return out
+        # 展示などは開始時刻のみ。方針次第で None や終日にも可。
+        return [(d.isoformat(), use_time) for d in _expand_dates(year, m1, d1, m2, d2)]
 
     # 2) 単日＋複数時刻など、従来ロジック
-    tokens = re.split(r'\s+', left)
+    tokens = left.split()
     current_date = None
     for tok in tokens:
         # 日付トークン？
@@ -124,12 +123,7 @@ def split_and_normalize(dt_text: str, title: str, venue: str, year: int | None =
             if tm:
                 try:
                     hh = int(tm.group('h')); mi = int(tm.group('mi'))
-                    out.append({
-                        "date": current_date.strftime("%Y-%m-%d"),
-                        "time": f"{hh:02d}:{mi:02d}",
-                        "title": title,
-                        "venue": venue
-                    })
+                    out.append((current_date.isoformat(), f"{hh:02d}:{mi:02d}"))
                 except ValueError:
                     pass
 
@@ -139,14 +133,62 @@ def split_and_normalize(dt_text: str, title: str, venue: str, year: int | None =
             mm = int(dm.group('m')); dd = int(dm.group('d'))
             try:
                 use_year = _infer_year(year, mm, _current_month) if _auto_infer else year
-                d = date(use_year, mm, dd)
-                out.append({
-                    "date": d.strftime("%Y-%m-%d"),
-                    "time": None,
-                    "title": title,
-                    "venue": venue
-                })
+                out.append((date(use_year, mm, dd).isoformat(), None))
             except ValueError:
                 pass
 
     return out
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _expand_slots_cached(left: str, year: int | None, context: tuple[int, int]) -> tuple:
+    # context（年・月）もキーに含めるので、月を跨いで動くプロセスでも古い推定年を返さない
+    return tuple(_expand_slots(left, year, context))
+
+def split_and_normalize(dt_text: str, title: str, venue: str, year: int | None = None,
+                        context: tuple[int, int] | None = None):
+    """
+    '8.29(金) 10:30～ 14:00～ 8.30(土) 10:00～'
+      → [{'date':'YYYY-MM-DD','time':'HH:MM','title':..., 'venue':...}, ...]
+
+    '8.13(水)～8.31(日) 10:00～18:00'
+      → 8/13〜8/31 を日ごと展開（時間は先頭の 10:00 を採用）
+      
+    '9.3(水)～7(日)'  ← 月省略パターンに対応
+      → 9/3〜9/7 を日ごと展開（開始月を終了日にも適用）
+      
+    '12.30(火)～1.2(金)' ← 年跨ぎ対応
+      → 12/30〜翌年1/2 を日ごと展開
+
+    context: parse_context() の結果。省略時はその場で現在時刻から計算する。
+    """
+    if context is None:
+        context = parse_context()
+    return [
+        {"date": d, "time": t, "title": title, "venue": venue}
+        for d, t in _expand_slots(_normalize_text(dt_text), year, context)
+    ]
+
+def parse_many(items: Iterable[tuple[str, str, str]], year: int | None = None,
+               context: tuple[int, int] | None = None,
+               on_error: Callable[[str, Exception], None] | None = None) -> list[list[dict]]:
+    """
+    (dt_text, title, venue) のタプル列をまとめて正規化する。戻り値は入力と同じ順序のリストのリスト。
+
+    日付・時刻の展開は正規化後の日程文字列ごとに LRU キャッシュ（PARSE_CACHE_SIZE 件）するため、
+    同じ日程の展示会が複数並ぶ場合や毎日の再実行で同じ文字列が来る場合は展開が1回で済む。
+    タイトル・会場は展開後に付ける。
+    展開に失敗した項目は空リストとし、on_error(dt_text, 例外) が指定されていれば呼ぶ。
+    """
+    if context is None:
+        context = parse_context()
+    results = []
+    for dt_text, title, venue in items:
+        try:
+            slots = _expand_slots_cached(_normalize_text(dt_text), year, context)
+        except Exception as e:
+            if on_error is not None:
+                on_error(dt_text, e)
+            results.append([])
+            continue
+        results.append([{"date": d, "time": t, "title": title, "venue": venue} for d, t in slots])
+    return results
@@ -0,0 +1,85 @@
+# utils/stages.py
+"""
+パイプラインの段階別（fetch / parse / normalize / filter / dedupe / sort / serialize）所要時間の計測。
+
+各処理は `with stage("parse"):` で区切るだけ。計測は recording() で有効にしたスレッドでのみ行い、
+無効なスレッドでは何もしない（通常実行のオーバーヘッドはほぼゼロ）。
+段階は入れ子にでき、外側の段階には内側の段階を除いた時間（排他時間）だけを加算する:
+
+  with recording() as rec:
+      events = scraper.collect_events()
+  rec.totals()   # {"fetch": 秒, "parse": 秒, ...}
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+STAGES = ("fetch", "parse", "normalize", "filter", "dedupe", "sort", "serialize")
+
+_local = threading.local()
+
+
+class StageRecorder:
+    """1スレッド分の段階別の排他時間（秒）と呼び出し回数"""
+
+    def __init__(self):
+        self._seconds: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._stack: List[list] = []   # [段階名, 開始時刻, 内側の段階の合計時間]
+
+    def _enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self) -> None:
+        name, t0, inner = self._stack.pop()
+        elapsed = time.perf_counter() - t0
+        self._seconds[name] = self._seconds.get(name, 0.0) + elapsed - inner
+        self._calls[name] = self._calls.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def totals(self) -> Dict[str, float]:
+        """段階名 → 排他時間（秒）。STAGES の順、未知の段階はその後ろ"""
+        order = list(STAGES) + sorted(set(self._seconds) - set(STAGES))
+        return {name: self._seconds[name] for name in order if name in self._seconds}
+
+    def calls(self) -> Dict[str, int]:
+        return dict(self._calls)
+
+    def _merge(self, other: "StageRecorder") -> None:
+        """入れ子の recording() の結果を加算する（実行中の段階からはその分を除く）"""
+        for name, seconds in other._seconds.items():
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+        for name, count in other._calls.items():
+            self._calls[name] = self._calls.get(name, 0) + count
+        if self._stack:
+            self._stack[-1][2] += sum(other._seconds.values())
+
+
+@contextmanager
+def stage(name: str):
+    """現在のスレッドで計測が有効なら、ブロックの所要時間を段階 name に加算する"""
+    rec = getattr(_local, "recorder", None)
+    if rec is None:
+        yield
+        return
+    rec._enter(name)
+    try:
+        yield
+    finally:
+        rec._exit()
+
+
+@contextmanager
+def recording(recorder: StageRecorder = None):
+    """このスレッドで段階別計測を有効にし、StageRecorder を返す（入れ子の場合は終了時に外側へ加算）"""
+    rec = recorder or StageRecorder()
+    previous = getattr(_local, "recorder", None)
+    _local.recorder = rec
+    try:
+        yield rec
+    finally:
+        _local.recorder = previous
+        if previous is not None:
+            previous._merge(rec)
@@ -0,0 +1,250 @@
+# utils/storage.py
+"""
+storage/ スナップショットの読み書き共通処理。
+
+スクレイパーの結果はオーケストレーター（refresh_future_events.py）がメモリ上で直接受け取る。
+storage/ のスナップショットは html_export のフォールバックや手動確認用として、
+必要な場合だけ書き出す（ENABLE_STORAGE_SNAPSHOT=0 で無効化）。
+
+保存形式（STORAGE_FORMAT）:
+  json   : 会場ごとの storage/{date}_{code}.json（indent=2・従来形式、デフォルト）
+  ndjson : 1日1ファイルの storage/{date}_events.ndjson（日付インデックス付きのコンパクト形式）
+  both   : 両方を書き出す
+
+ndjson 形式:
+  1行目   : ヘッダー {"format", "counts": {会場コード: 件数}, "dates": {イベント日付: [offset, length]}}
+  2行目以降: ["会場コード", {イベント}] を1行1件、イベント日付順に格納
+  offset/length はヘッダー行の直後を0としたバイト位置。特定日付の行だけを seek して読める。
+
+json 形式にも書き込み時に日付インデックス storage/{date}_{code}.idx.json を併せて出力する:
+  {"size": JSONファイルのバイト数, "dates": {イベント日付: [[offset, length], ...]}}
+  同じ日付が連続するレコードは1つの範囲にまとめる（"[" + 範囲 + "]" で配列としてパースできる）。
+  size が一致しない（インデックス非対応の旧コードで上書きされた）場合は使わず全件読み込みに戻す。
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+
+from utils.log import get_logger
+from utils.paths import STORAGE_DIR
+from utils.stages import stage
+
+log = get_logger("storage")
+
+STORAGE_FORMATS = ("json", "ndjson", "both")
+COMPACT_FORMAT = "ndjson-v1"
+
+
+def snapshot_enabled() -> bool:
+    """スナップショット書き出しの有効/無効（デフォルト有効）"""
+    return os.getenv("ENABLE_STORAGE_SNAPSHOT", "1") == "1"
+
+
+def storage_format() -> str:
+    """保存形式（STORAGE_FORMAT=json|ndjson|both、不正値は json）"""
+    fmt = os.getenv("STORAGE_FORMAT", "json").strip().lower()
+    if fmt not in STORAGE_FORMATS:
+        log.warn("Invalid STORAGE_FORMAT=%s, using json", fmt)
+        return "json"
+    return fmt
+
+
+def storage_path(date_str: str, code: str) -> Path:
+    """storage/{date}_{code}.json のパス（各スクレイパーの _storage_path と同一規則）"""
+    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    return STORAGE_DIR / f"{date_str}_{code}.json"
+
+
+def compact_path(date_str: str) -> Path:
+    """storage/{date}_events.ndjson のパス"""
+    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    return STORAGE_DIR / f"{date_str}_events.ndjson"
+
+
+def index_path(json_path: Path) -> Path:
+    """storage/{date}_{code}.json に対応する日付インデックスのパス"""
+    return json_path.with_name(json_path.stem + ".idx.json")
+
+
+def atomic_write(path: Path, data: Union[str, bytes]) -> None:
+    """
+    書き込み途中のファイルを読まないよう、同じディレクトリの一時ファイル経由で置き換える。
+    str は UTF-8 で書き込む。失敗時は一時ファイルを消して例外を送出する。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp_" + path.name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _dump_indexed(events: List[Dict]) -> Tuple[bytes, Dict[str, List[List[int]]]]:
+    """
+    json.dump(events, indent=2, ensure_ascii=False) と同一のバイト列を生成し、
+    各レコードのバイト範囲をイベント日付ごとに記録する。
+    """
+    if not events:
+        return b"[]", {}
+    buf = bytearray(b"[\n")
+    dates: Dict[str, List[List[int]]] = {}
+    for i, event in enumerate(events):
+        if i:
+            buf += b",\n"
+        # 文字列中の改行は \n にエスケープされるため、行頭インデントの付与は置換で十分
+        record = ("  " + json.dumps(event, ensure_ascii=False, indent=2).replace("\n", "\n  ")).encode("utf-8")
+        spans = dates.setdefault(event.get("date") or "", [])
+        if spans and spans[-1][0] + spans[-1][1] + 2 == len(buf):
+            spans[-1][1] = len(buf) + len(record) - spans[-1][0]  # 直前と連続 → 範囲を延長
+        else:
+            spans.append([len(buf), len(record)])
+        buf += record
+    buf += b"\n]"
+    return bytes(buf), dates
+
+
+def write_snapshot(events: List[Dict], date_str: str, code: str) -> Path:
+    """
+    イベントリストをスクレイパー出力と同じ形式（indent=2）で保存し、日付インデックスも出力。
+    どちらも一時ファイル経由で置き換えるため、途中で落ちても読み手は書きかけのファイルを見ない
+    （JSON だけ新しくなった場合はインデックスの size が合わず全件読み込みに戻る）。
+    """
+    path = storage_path(date_str, code)
+    with stage("serialize"):
+        data, dates = _dump_indexed(events)
+    atomic_write(path, data)
+    atomic_write(index_path(path), json.dumps({"size": len(data), "dates": dates}, ensure_ascii=False, separators=(",", ":")))
+    return path
+
+
+def read_snapshot_for_date(path: Path, event_date: str) -> Optional[List[Dict]]:
+    """
+    会場別JSONから event_date のレコードだけを日付インデックス経由で読む。
+    インデックスが無い・古い場合は None（呼び出し側で全件読み込みにフォールバック）。
+    """
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("size") != path.stat().st_size:
+            return None
+    except (OSError, ValueError):
+        return None
+
+    events: List[Dict] = []
+    with open(path, "rb") as f:
+        for offset, length in index["dates"].get(event_date, []):
+            f.seek(offset)
+            events.extend(json.loads(b"[" + f.read(length) + b"]"))
+    return events
+
+
+# ---- compact (ndjson) -------------------------------------------------------
+
+def _read_header(f) -> Dict:
+    header = json.loads(f.readline())
+    if header.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"Unsupported storage format: {header.get('format')}")
+    return header
+
+
+def _read_all_by_code(path: Path) -> Dict[str, List[Dict]]:
+    """ndjson ファイル全体を 会場コード → イベントリスト に戻す（書き込み時のマージ用）"""
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        by_code: Dict[str, List[Dict]] = {code: [] for code in header.get("counts", {})}
+        for line in f:
+            code, event = json.loads(line)
+            by_code.setdefault(code, []).append(event)
+    return by_code
+
+
+def write_compact(scraped: Dict[str, List[Dict]], date_str: str) -> Path:
+    """
+    会場コード → イベントリスト を1日1ファイルの ndjson に保存する。
+    既存ファイルがあれば、渡されなかった会場の行はそのまま残す（単体スクレイパーからの部分更新用）。
+    """
+    path = compact_path(date_str)
+    merged: Dict[str, List[Dict]] = {}
+    if path.exists():
+        try:
+            merged = _read_all_by_code(path)
+        except Exception as e:
+            log.warn("Ignoring unreadable %s: %s", path.name, e)
+    merged.update(scraped)
+
+    # イベント日付ごとに行が連続するよう並べる（同日内は会場順・元の順序を維持）
+    rows = []
+    for order, (code, events) in enumerate(merged.items()):
+        for i, event in enumerate(events):
+            rows.append((event.get("date") or "", order, i, code, event))
+    rows.sort(key=lambda r: r[:3])
+
+    body = bytearray()
+    dates: Dict[str, List[int]] = {}
+    with stage("serialize"):
+        for event_date, _, _, code, event in rows:
+            line = json.dumps([code, event], ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            span = dates.setdefault(event_date, [len(body), 0])
+            span[1] += len(line)
+            body += line
+
+    header = {
+        "format": COMPACT_FORMAT,
+        "counts": {code: len(events) for code, events in merged.items()},
+        "dates": dates,
+    }
+    atomic_write(path, json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n" + body)
+    return path
+
+
+def load_compact(date_str: str, event_date: Optional[str] = None) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    ndjson スナップショットを読み込み、(events, counts) を返す。
+    event_date 指定時はインデックスで該当日付の行だけを読む（他の日付はパースしない）。
+    counts は書き込まれた会場コード → 全件数（ファイルが無い会場の判定用）。
+    """
+    return read_compact(compact_path(date_str), event_date)
+
+
+def read_compact(path: Path, event_date: Optional[str] = None) -> Tuple[List[Dict], Dict[str, int]]:
+    """load_compact のパス指定版（storage/ 以外のディレクトリを読む場合）"""
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        base = f.tell()
+        if event_date is None:
+            chunk = f.read()
+        else:
+            span = header["dates"].get(event_date)
+            if not span:
+                return [], header.get("counts", {})
+            f.seek(base + span[0])
+            chunk = f.read(span[1])
+    events = [json.loads(line)[1] for line in chunk.splitlines() if line]
+    return events, header.get("counts", {})
+
+
+# ---- format dispatch --------------------------------------------------------
+
+def write_snapshots(scraped: Dict[str, List[Dict]], date_str: str) -> List[Path]:
+    """STORAGE_FORMAT に従ってスナップショットを書き出し、書いたパスを返す"""
+    fmt = storage_format()
+    paths = []
+    if fmt in ("json", "both"):
+        for code, events in scraped.items():
+            paths.append(write_snapshot(events, date_str, code))
+    if fmt in ("ndjson", "both"):
+        paths.append(write_compact(scraped, date_str))
+    return paths
+
+
+def save_snapshot(events: List[Dict], date_str: str, code: str) -> Path:
+    """単体実行のスクレイパー用: 1会場分を STORAGE_FORMAT に従って保存し、主な保存先を返す"""
+    return write_snapshots({code: events}, date_str)[0]